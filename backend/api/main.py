@@ -16,13 +16,19 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from backend.api.routes import projects, requirements, stories, criteria
-from backend.core.config import settings
+from backend.core.config import settings, APIConfig
+from backend.api.payload import CompressionMiddleware
+from backend.utils.fast_json import FastJSONResponse
+from backend.core.executors import executors, ExecutorSaturated
+from backend.core import tracing
+from backend.core.profiling import ProfilingMiddleware, request_profiler
 
 # Initialize FastAPI app
 app = FastAPI(
     title="BA Copilot API",
     description="AI-powered assistant for Business Analysts",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS configuration - Allow frontend to call API
@@ -34,6 +40,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# Negotiated Brotli/gzip compression for larger responses
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=APIConfig.COMPRESSION_MINIMUM_SIZE
+)
+
+# One root span per request when TRACING_EXPORTER is set
+app.add_middleware(tracing.TracingMiddleware)
+
+# Sampling profiles of slow or X-Profile-flagged requests
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
 # ========================================
 # HEALTH CHECK ENDPOINTS
 # ========================================
@@ -63,14 +81,38 @@ async def check_apis():
     """Check status of external APIs"""
     from backend.core.config import APIConfig
     
+    from backend.services.context_cache import context_cache
+    from backend.services.model_router import model_router
+    from backend.services.file_processing import file_waiter
+    from backend.services.transcript_cache import transcript_cache
+    from backend.services.scratch_space import scratch_space
+    from backend.core.circuit_breaker import circuit_breakers
+    
     status = APIConfig.get_status()
+    breakers = {name: breaker.status() for name, breaker in circuit_breakers.items()}
     
     return {
-        "status": status["status"],
+        # Open breakers mean Gemini calls are currently failing fast
+        "status": "degraded" if any(b["state"] != "closed" for b in breakers.values()) else status["status"],
         "apis": {
             "gemini": status["gemini"][0],
             "audio": status["audio"][0]
-        }
+        },
+        "circuit_breakers": breakers,
+        "model_routing": model_router.status(),
+        "context_cache": context_cache.status(),
+        "file_processing": file_waiter.status(),
+        "transcript_cache": transcript_cache.status(),
+        "scratch_space": scratch_space.status()
+    }
+
+
+@app.get("/api/health/executors")
+async def check_executors():
+    """Utilization of the worker pools"""
+    return {
+        "status": "healthy",
+        "pools": executors.metrics()
     }
 
 # ========================================
@@ -113,6 +155,14 @@ app.include_router(
     tags=["criteria"]
 )
 
+# Pipelined extraction -> stories -> criteria
+from backend.api.routes import pipeline
+app.include_router(
+    pipeline.router,
+    prefix="/api/pipeline",
+    tags=["pipeline"]
+)
+
 # Audio routes
 from backend.api.routes import audio
 app.include_router(
@@ -121,6 +171,22 @@ app.include_router(
     tags=["audio"]
 )
 
+# Full-text search routes
+from backend.api.routes import search
+app.include_router(
+    search.router,
+    prefix="/api/search",
+    tags=["search"]
+)
+
+# Request profiling admin routes
+from backend.api.routes import profiling
+app.include_router(
+    profiling.router,
+    prefix="/api/admin/profiling",
+    tags=["admin"]
+)
+
 # ========================================
 # ERROR HANDLERS
 # ========================================
@@ -130,7 +196,18 @@ async def http_exception_handler(request, exc):
     """Handle HTTP exceptions"""
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
+    )
+
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request, exc):
+    """Shed load when a worker pool's queue is full"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
     )
 
 
@@ -156,6 +233,10 @@ async def startup_event():
     from backend.core.database import db
     print("[OK] Database initialized")
     
+    # Delete temp files and Gemini uploads left behind by crashed workers
+    from backend.services.scratch_space import scratch_space
+    await executors.run('blocking', scratch_space.start, reject=False)
+    
     # Check API configuration
     from backend.core.config import APIConfig
     status = APIConfig.get_status()
@@ -174,4 +255,19 @@ async def startup_event():
     if status["status"] == "connected":
         print(">>> BA Copilot API ready! ✅")
     else:
-        print(">>> BA Copilot API started with warnings ⚠️")
\ No newline at end of file
+        print(">>> BA Copilot API started with warnings ⚠️")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release remote resources and worker pools on shutdown"""
+    from backend.services.context_cache import context_cache
+    context_cache.clear()
+    # Let in-flight work finish before the workers go away
+    executors.shutdown(wait=True)
+    from backend.services.scratch_space import scratch_space
+    scratch_space.stop()
+    from backend.core.database import db
+    db.close()
+    tracing.shutdown()
+    print(">>> BA Copilot API stopped")
\ No newline at end of file
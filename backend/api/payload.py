@@ -0,0 +1,243 @@
+"""
+Response Payload Size
+=====================
+Keeps responses small on slow client links:
+
+- CompressionMiddleware: negotiated Brotli/gzip compression of response
+  bodies above a size threshold (streamed exports included)
+- strip_raw_output: drops the duplicated raw model text from generation
+  responses unless the client asks for it
+"""
+
+import zlib
+
+from backend.core.config import APIConfig
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Formats that are already compressed; recompressing only costs CPU
+INCOMPRESSIBLE_TYPES = (
+    'application/zip',
+    'application/gzip',
+    'application/vnd.openxmlformats',
+    'image/',
+    'audio/',
+    'video/',
+)
+
+# Streams of incremental events; every chunk is flushed through the
+# compressor so clients see each event as soon as it is sent
+EVENT_STREAM_TYPES = (
+    'application/x-ndjson',
+    'text/event-stream',
+)
+
+
+def strip_raw_output(result, include_raw=None):
+    """
+    Remove raw_output from a generation result
+
+    Args:
+        result: Generation result dict (may be shared between coalesced
+                requests, so it is copied rather than modified)
+        include_raw: Keep raw_output; defaults to APIConfig.RESPONSE_INCLUDE_RAW_OUTPUT
+
+    Returns:
+        Result to return to the client
+    """
+    if include_raw is None:
+        include_raw = APIConfig.RESPONSE_INCLUDE_RAW_OUTPUT
+    if include_raw or not isinstance(result, dict) or 'raw_output' not in result:
+        return result
+    return {k: v for k, v in result.items() if k != 'raw_output'}
+
+
+def _accepted_encodings(header):
+    """Parse Accept-Encoding into the set of codings with q > 0"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class _Compressor:
+    """Uniform streaming interface over gzip and Brotli"""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._impl = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._impl.process(data)
+        return self._impl.compress(data)
+
+    def flush(self):
+        if self.encoding == 'br':
+            return self._impl.finish()
+        return self._impl.flush()
+
+    def sync(self):
+        """Emit everything compressed so far without ending the stream"""
+        if self.encoding == 'br':
+            return self._impl.flush()
+        return self._impl.flush(zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the best encoding the client accepts"""
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        """
+        Args:
+            app: ASGI app
+            minimum_size: Bodies smaller than this are sent uncompressed
+            gzip_level: zlib level (1-9)
+            brotli_quality: Brotli quality (0-11); 4 is close to gzip -6
+                            in speed with noticeably better ratios on JSON
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        accepted = _accepted_encodings(headers.get(b'accept-encoding', b'').decode('latin-1'))
+
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    """Wraps send() for one response"""
+
+    def __init__(self, middleware, encoding, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+        self.sync_chunks = False
+
+
+    async def __call__(self, message):
+        if message['type'] == 'http.response.start':
+            # Hold the headers until we know the body size
+            self.start_message = message
+            return
+
+        if message['type'] != 'http.response.body':
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.compressor is None:
+            if not self._should_compress(body, more_body):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            content_type = dict((k.lower(), v) for k, v in self.start_message['headers']).get(b'content-type', b'')
+            self.sync_chunks = content_type.decode('latin-1').startswith(EVENT_STREAM_TYPES)
+            self._rewrite_headers()
+
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.flush()
+                self._set_header(b'content-length', str(len(compressed)).encode())
+                await self.send(self.start_message)
+                await self.send({'type': 'http.response.body', 'body': compressed})
+                return
+
+            await self.send(self.start_message)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        elif self.sync_chunks:
+            chunk += self.compressor.sync()
+        if chunk or not more_body:
+            await self.send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+
+
+    def _should_compress(self, body, more_body):
+        """Decide from the first body chunk and the response headers"""
+        status = self.start_message['status']
+        if status < 200 or status in (204, 304):
+            return False
+
+        headers = {k.lower(): v for k, v in self.start_message['headers']}
+        if b'content-encoding' in headers:
+            return False
+
+        content_type = headers.get(b'content-type', b'').decode('latin-1')
+        if content_type.startswith(INCOMPRESSIBLE_TYPES):
+            return False
+
+        # Streams are compressed regardless of the first chunk's size
+        return more_body or len(body) >= self.middleware.minimum_size
+
+
+    def _rewrite_headers(self):
+        """Set Content-Encoding/Vary and weaken the ETag for the new representation"""
+        headers = [(k, v) for k, v in self.start_message['headers'] if k.lower() != b'content-length']
+
+        rewritten = []
+        for k, v in headers:
+            # The compressed bytes differ, so a strong validator must not carry over
+            if k.lower() == b'etag' and not v.startswith(b'W/'):
+                v = b'W/' + v
+            rewritten.append((k, v))
+
+        rewritten.append((b'content-encoding', self.encoding.encode()))
+
+        vary = [v for k, v in rewritten if k.lower() == b'vary']
+        if not vary:
+            rewritten.append((b'vary', b'Accept-Encoding'))
+        elif b'accept-encoding' not in vary[0].lower():
+            rewritten = [(k, v + b', Accept-Encoding' if k.lower() == b'vary' else v) for k, v in rewritten]
+
+        self.start_message = {**self.start_message, 'headers': rewritten}
+
+
+    def _set_header(self, name, value):
+        headers = [(k, v) for k, v in self.start_message['headers'] if k.lower() != name]
+        headers.append((name, value))
+        self.start_message = {**self.start_message, 'headers': headers}
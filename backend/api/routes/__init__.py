@@ -7,6 +7,6 @@ API Routes
 All endpoint definitions
 """
 
-from . import projects, input, requirements, stories, criteria
+from . import projects, input, requirements, stories, criteria, pipeline, search, profiling
 
-__all__ = ['projects', 'input', 'requirements', 'stories', 'criteria']
+__all__ = ['projects', 'input', 'requirements', 'stories', 'criteria', 'pipeline', 'search', 'profiling']
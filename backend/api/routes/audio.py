@@ -1,13 +1,20 @@
 """Audio recording and transcription routes"""
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 from backend.core.database import db
-from backend.services.audio_transcriber import audio_transcriber
+from backend.core.executors import executors, ExecutorSaturated
+from backend.services.audio_transcriber import audio_transcriber, AudioTranscriber
+from backend.services.file_processing import ClientDisconnected
+from backend.services.transcript_cache import transcript_cache
+from backend.services.live_transcriber import LiveTranscriptionSession, get_live_model
+import asyncio
+import base64
+import json
 
 router = APIRouter()
 
@@ -18,8 +25,42 @@ class AudioTranscription(BaseModel):
     audio_format: str = "wav"
 
 
+async def _transcribe(audio_bytes, audio_format, request):
+    """
+    Transcribe decoded audio, serving re-uploaded recordings from the cache
+    
+    Returns:
+        (transcript, preprocessing_stats, cached)
+    """
+    # Hash off the event loop (recordings can be hundreds of MB)
+    cache_key = await executors.run('blocking', AudioTranscriber.cache_key, audio_bytes)
+    transcript = transcript_cache.get(cache_key)
+    if transcript is not None:
+        print(f"⚡ Transcript cache hit: {len(transcript)} characters")
+        return transcript, None, True
+    
+    # Downmix/resample/trim off the event loop before upload; a thread pool,
+    # so the recording isn't pickled to a worker process and back
+    audio_bytes, audio_format, preprocessing = await executors.run(
+        'blocking',
+        AudioTranscriber.prepare_audio,
+        audio_bytes,
+        audio_format
+    )
+    
+    transcript = await audio_transcriber.transcribe_audio_async(
+        audio_bytes,
+        audio_format,
+        preprocess=False,
+        is_disconnected=request.is_disconnected
+    )
+    
+    transcript_cache.put(cache_key, transcript)
+    return transcript, preprocessing, False
+
+
 @router.post("/transcribe")
-async def transcribe_audio(data: AudioTranscription):
+async def transcribe_audio(data: AudioTranscription, request: Request):
     """
     Transcribe audio to text using MAIN Gemini API (gemini-2.0-flash)
     This uses your MAIN API KEY, not the audio API key
@@ -30,9 +71,10 @@ async def transcribe_audio(data: AudioTranscription):
         print(f"Audio data length: {len(data.audio_data)} characters (base64)")
         
         # Transcribe audio using MAIN API
-        transcript = audio_transcriber.transcribe_audio(
-            data.audio_data,
-            data.audio_format
+        transcript, preprocessing, cached = await _transcribe(
+            base64.b64decode(data.audio_data),
+            data.audio_format,
+            request
         )
         
         if not transcript or len(transcript) < 10:
@@ -52,9 +94,16 @@ async def transcribe_audio(data: AudioTranscription):
             "input_id": input_id,
             "transcript": transcript,
             "text_length": len(transcript),
+            "audio_preprocessing": preprocessing,
+            "cached": cached,
             "message": "Audio transcribed successfully"
         }
     
+    except ExecutorSaturated:
+        raise
+    except ClientDisconnected as e:
+        print(f"Transcription abandoned: {str(e)}")
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
         print(f"Transcription error: {str(e)}")
         import traceback
@@ -64,6 +113,7 @@ async def transcribe_audio(data: AudioTranscription):
 
 @router.post("/upload")
 async def upload_audio_file(
+    request: Request,
     file: UploadFile = File(...), 
     project_id: int = Form(...)
 ):
@@ -87,7 +137,7 @@ async def upload_audio_file(
             )
         
         # Transcribe using MAIN API
-        transcript = audio_transcriber.transcribe_audio(audio_data, audio_format)
+        transcript, preprocessing, cached = await _transcribe(audio_data, audio_format, request)
         
         if not transcript or len(transcript) < 10:
             raise Exception("Transcription resulted in empty or very short text")
@@ -106,11 +156,16 @@ async def upload_audio_file(
             "input_id": input_id,
             "transcript": transcript,
             "text_length": len(transcript),
-            "file_name": file.filename
+            "file_name": file.filename,
+            "audio_preprocessing": preprocessing,
+            "cached": cached
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorSaturated):
         raise
+    except ClientDisconnected as e:
+        print(f"Transcription abandoned: {str(e)}")
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
         print(f"Upload error: {str(e)}")
         import traceback
@@ -118,6 +173,134 @@ async def upload_audio_file(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.websocket("/live")
+async def live_transcription(
+    websocket: WebSocket,
+    project_id: int,
+    sample_rate: int = 16000,
+    channels: int = 1
+):
+    """
+    Transcribe audio incrementally while it is being recorded
+    
+    Protocol:
+    - Client sends binary frames of little-endian 16-bit PCM
+      (sample_rate/channels from the query string)
+    - Server pushes {"type": "partial", "window", "text", "transcript"}
+      as each rolling window is transcribed
+    - Client sends {"type": "stop"} (or just closes); the remaining audio
+      is transcribed, an inputs row is saved and {"type": "final",
+      "input_id", "transcript"} is sent
+    """
+    # Invalid formats would make the session cut empty windows forever
+    try:
+        session = LiveTranscriptionSession(sample_rate, channels)
+    except ValueError as e:
+        print(f"Live transcription rejected: {str(e)}")
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    
+    try:
+        model = get_live_model()
+    except Exception as e:
+        await _send(websocket, {"type": "error", "detail": f"Live transcription unavailable: {str(e)}"})
+        await websocket.close(code=1011)
+        return
+    
+    windows = asyncio.Queue()
+    print(f"🎙️ Live transcription started for project {project_id}")
+    
+    async def transcribe_windows():
+        """Transcribe windows in order while more audio keeps arriving"""
+        index = 0
+        while True:
+            window = await windows.get()
+            if window is None:
+                return
+            index += 1
+            
+            try:
+                wav_bytes = await executors.run('parsing', session.encode_window, window, reject=False)
+                if wav_bytes is None:
+                    continue
+                text = await executors.run('blocking', model.transcribe, wav_bytes, session.context(), reject=False)
+            except Exception as e:
+                print(f"⚠️ Live window {index} failed: {str(e)}")
+                await _send(websocket, {"type": "error", "window": index, "detail": str(e),
+                                        "retry_after": getattr(e, 'retry_after', None)})
+                continue
+            
+            await _send(websocket, {
+                "type": "partial",
+                "window": index,
+                "text": text,
+                "transcript": session.add_segment(text),
+                "seconds": round(session.received_seconds, 1)
+            })
+    
+    worker = asyncio.create_task(transcribe_windows())
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                for window in session.add_frame(message["bytes"]):
+                    windows.put_nowait(window)
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "stop":
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Transcribe the tail and finalize even if the client dropped
+        for window in session.flush():
+            windows.put_nowait(window)
+        windows.put_nowait(None)
+        await worker
+        
+        transcript = session.transcript()
+        input_id = None
+        if transcript:
+            input_id = await executors.run(
+                'blocking',
+                db.save_input,
+                project_id,
+                "voice",
+                transcript,
+                "live_recording.wav",
+                reject=False
+            )
+            print(f"✅ Live transcription saved with input_id: {input_id}")
+        
+        await _send(websocket, {
+            "type": "final",
+            "input_id": input_id,
+            "transcript": transcript,
+            "text_length": len(transcript),
+            "seconds": round(session.received_seconds, 1)
+        })
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+
+async def _send(websocket, payload):
+    """Send JSON, ignoring clients that already disconnected"""
+    try:
+        await websocket.send_json(payload)
+    except Exception:
+        pass
+
+
 @router.get("/check")
 async def check_audio_api():
     """Check if audio APIs are configured"""
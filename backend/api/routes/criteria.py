@@ -2,26 +2,88 @@
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from backend.core.database import db
+from backend.core.models import Scenario
+from backend.core.executors import ExecutorSaturated
+from backend.core.circuit_breaker import CircuitOpen
+from backend.utils.single_flight import single_flight
+from backend.api.payload import strip_raw_output
+from backend.utils.fast_json import FastJSONResponse
 from backend.services.criteria_generator import criteria_gen
 
 router = APIRouter()
 
 class CriteriaGenerate(BaseModel):
-    story_id: int
+    story_id: Optional[int] = None  # Saved story to attach the criteria to
     user_story: str
 
 @router.post("/generate")
-async def generate_criteria(data: CriteriaGenerate):
+async def generate_criteria(data: CriteriaGenerate, include_raw: bool = None):
     try:
-        criteria = criteria_gen.generate(data.user_story)
-        return criteria
+        # Identical concurrent requests share one computation
+        result = await single_flight.do(
+            ("criteria.generate", data.story_id, data.user_story),
+            _generate_and_save,
+            data
+        )
+        # raw_output duplicates the parsed items; only sent when asked for
+        return FastJSONResponse(strip_raw_output(result, include_raw))
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _saved_story(data):
+    """
+    The saved story the criteria belong to, or None when they are not to be saved
+
+    Saving replaces the story's whole scenario set, so criteria are only
+    attached to a story whose saved text is the text they were generated from.
+    """
+    if data.story_id is None:
+        return None
+
+    story = db.get_user_story(data.story_id)
+    if story is None:
+        raise HTTPException(status_code=404, detail=f"User story {data.story_id} not found")
+
+    if data.user_story.strip() not in (criteria_gen.story_text(story).strip(), (story.user_story or '').strip()):
+        print(f"Posted text doesn't match saved story {data.story_id}, criteria will not be saved")
+        return None
+    return story
+
+
+def _generate_and_save(data):
+    """Generate acceptance criteria for a story and save them to the database"""
+    story = _saved_story(data)
+
+    try:
+        criteria = criteria_gen.generate(data.user_story)
+    except CircuitOpen as e:
+        # Serve criteria saved by an earlier generation while Gemini's circuit is open
+        saved = db.get_acceptance_criteria(story.story_id) if story else []
+        if not saved:
+            raise e
+        print(f"Gemini circuit open, serving {len(saved)} saved scenarios for story_id: {story.story_id}")
+        return {'criteria': saved, 'total_scenarios': len(saved), 'cached': True}
+
+    # Save to database when the story was persisted by /api/stories/generate
+    try:
+        if criteria['criteria'] and story:
+            for scenario in criteria['criteria']:
+                scenario.story_id = story.story_id
+            db.save_acceptance_criteria(story.story_id, criteria['criteria'])
+    except Exception as db_error:
+        print(f"Database save error: {str(db_error)}")
+
+    return criteria
+
 @router.get("/{story_id}")
 async def get_criteria(story_id: int):
     # Implementation: retrieve from database
@@ -30,6 +92,7 @@ async def get_criteria(story_id: int):
 @router.post("/export/gherkin")
 async def export_gherkin(data: dict):
     criteria_data = data.get('criteria', {})
+    criteria_data = {**criteria_data, 'criteria': [Scenario.from_dict(c) for c in criteria_data.get('criteria', [])]}
     feature_name = data.get('feature_name', 'Feature')
     gherkin = criteria_gen.format_for_gherkin(criteria_data, feature_name)
     return {"gherkin": gherkin}
\ No newline at end of file
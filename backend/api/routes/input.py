@@ -7,7 +7,9 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 from backend.core.database import db
-from backend.services.document_parser import parser
+from backend.core.executors import executors, ExecutorSaturated
+from backend.core.tracing import span
+from backend.services.document_parser import parser, DocumentParser
 
 router = APIRouter()
 
@@ -19,8 +21,14 @@ class TextInput(BaseModel):
 @router.post("/upload")
 async def upload_document(file: UploadFile = File(...), project_id: int = Form(...)):
     try:
-        content = await file.read()
-        text = parser.parse_document(file.filename, content)
+        with span('upload.read', **{'file.name': file.filename}) as current:
+            content = await file.read()
+            current.set_attribute('file.bytes', len(content))
+        # PDF/DOCX parsing is CPU-bound; run it in the process pool (the
+        # parse_* spans of a worker process start their own trace)
+        with span('upload.parse', **{'file.name': file.filename, 'file.bytes': len(content)}) as current:
+            text = await executors.run('documents', DocumentParser.parse_document, file.filename, content)
+            current.set_attribute('output.characters', len(text))
         is_valid, message = parser.validate_text(text)
         
         if not is_valid:
@@ -28,6 +36,8 @@ async def upload_document(file: UploadFile = File(...), project_id: int = Form(.
         
         input_id = db.save_input(project_id, "document", text, file.filename)
         return {"input_id": input_id, "file_name": file.filename, "text_length": len(text), "message": "Document uploaded successfully"}
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
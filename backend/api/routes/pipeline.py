@@ -0,0 +1,39 @@
+"""Pipelined workflow routes - extraction, stories and criteria overlapped"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from backend.core.database import db
+from backend.utils.fast_json import dumps
+from backend.services.pipeline import pipeline
+
+router = APIRouter()
+
+class PipelineRun(BaseModel):
+    input_id: int
+    project_type: str = "General"
+    industry: str = "General"
+    prune: bool = False   # Delete saved requirements this extraction didn't return
+
+@router.post("/run")
+async def run_pipeline(data: PipelineRun):
+    """
+    Extract requirements, generate stories and acceptance criteria in one
+    overlapped run, saving each item as it is produced
+
+    Streams newline-delimited JSON events (see WorkflowPipeline.run) and
+    ends with a {"type": "done"} event holding counts and stage timings.
+    """
+    input_row = db.get_input(data.input_id)
+    if not input_row:
+        raise HTTPException(status_code=404, detail="Input not found")
+
+    async def events():
+        async for event in pipeline.run(input_row, data.project_type, data.industry, prune=data.prune):
+            yield dumps(event) + b"\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
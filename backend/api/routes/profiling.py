@@ -0,0 +1,69 @@
+"""Request profiling admin routes (require X-Admin-Token = PROFILING_ADMIN_TOKEN)"""
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel
+from typing import Optional
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from backend.core.profiling import request_profiler
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject callers without the profiling admin token (all callers when none is set)"""
+    if not request_profiler.token_matches(x_admin_token):
+        raise HTTPException(status_code=403, detail="Profiling admin token required (set PROFILING_ADMIN_TOKEN)")
+
+
+class ProfilingSettings(BaseModel):
+    slow_request_seconds: Optional[float] = None
+    sample_interval_ms: Optional[float] = None
+
+
+@router.get("", dependencies=[Depends(require_admin)])
+async def get_profiling():
+    """Current settings and the stored profiles, newest first"""
+    return {
+        **request_profiler.status(),
+        "profiles": request_profiler.store.list()
+    }
+
+
+@router.put("", dependencies=[Depends(require_admin)])
+async def update_profiling(settings: ProfilingSettings):
+    """Change the slow-request threshold (0 turns capture off) or sampling interval without a restart"""
+    if settings.sample_interval_ms is not None:
+        if not 1 <= settings.sample_interval_ms <= 1000:
+            raise HTTPException(status_code=400, detail="sample_interval_ms must be between 1 and 1000")
+        request_profiler.sampler.set_interval(settings.sample_interval_ms)
+    if settings.slow_request_seconds is not None:
+        request_profiler.set_slow_request_seconds(settings.slow_request_seconds)
+    return request_profiler.status()
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$")
+):
+    """
+    Download a profile: speedscope JSON (open at https://www.speedscope.app)
+    or collapsed stacks for flamegraph.pl
+    """
+    path = request_profiler.store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "collapsed":
+        document = json.loads(path.read_text(encoding='utf-8'))
+        return PlainTextResponse(
+            request_profiler.store.to_collapsed(document),
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+        )
+
+    return FileResponse(path, media_type="application/json", filename=path.name)
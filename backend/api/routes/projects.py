@@ -1,15 +1,22 @@
 """Project management routes"""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 from backend.core.database import db
+from backend.services.project_exporter import project_exporter
+from backend.utils.http_cache import make_etag, etag_matches, not_modified, cached_json
 
 router = APIRouter()
 
+# Project name/type/industry can't be edited through the API, so detail
+# responses may be reused briefly without revalidation
+PROJECT_DETAIL_CACHE = "private, max-age=60"
+
 class ProjectCreate(BaseModel):
     name: str
     type: str = "General"
@@ -25,19 +32,37 @@ async def create_project(project: ProjectCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("")
-async def get_projects():
+async def get_projects(request: Request):
     try:
+        # Version is read before the data, so a concurrent write can only cause an extra miss
+        etag = make_etag("projects", *db.get_projects_version())
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
         projects = db.get_all_projects()
-        return [{"project_id": p[0], "project_name": p[1], "project_type": p[2], "industry": p[3], "created_at": p[4]} for p in projects]
+        return cached_json(
+            [p.to_dict("project_id", "project_name", "project_type", "industry", "created_at") for p in projects],
+            etag
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{project_id}")
-async def get_project(project_id: int):
+async def get_project(project_id: int, request: Request):
+    version = db.get_project_version(project_id)
+    if version:
+        etag = make_etag("project", project_id, *version)
+        if etag_matches(request, etag):
+            return not_modified(etag, PROJECT_DETAIL_CACHE)
+    
     project = db.get_project(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return {"project_id": project[0], "project_name": project[1], "project_type": project[2], "industry": project[3]}
+    
+    content = project.to_dict("project_id", "project_name", "project_type", "industry")
+    if not version:
+        return content
+    return cached_json(content, etag, PROJECT_DETAIL_CACHE)
 
 @router.delete("/{project_id}")
 async def delete_project(project_id: int):
@@ -48,6 +73,42 @@ async def delete_project(project_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{project_id}/summary")
-async def get_project_summary(project_id: int):
-    summary = db.get_project_summary(project_id)
-    return summary
\ No newline at end of file
+async def get_project_summary(project_id: int, request: Request):
+    version = db.get_project_version(project_id)
+    if not version:
+        return db.get_project_summary(project_id)
+    
+    etag = make_etag("summary", project_id, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    return cached_json(db.get_project_summary(project_id), etag)
+
+# format -> (exporter method, media type, file extension)
+EXPORT_FORMATS = {
+    "jira": ("stream_jira_csv", "text/csv", "csv"),
+    "gherkin": ("stream_gherkin_zip", "application/zip", "zip"),
+    "xlsx": ("stream_xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+@router.get("/{project_id}/export/{export_format}")
+async def export_project(project_id: int, export_format: str):
+    """Stream all stories and criteria of a project as JIRA CSV, zipped Gherkin or XLSX"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format: {export_format}. Supported: {', '.join(EXPORT_FORMATS)}"
+        )
+
+    project = db.get_project(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    method, media_type, extension = EXPORT_FORMATS[export_format]
+    file_name = f"project_{project_id}_{export_format}.{extension}"
+
+    return StreamingResponse(
+        getattr(project_exporter, method)(project_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
@@ -1,13 +1,20 @@
 """Requirements extraction routes"""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 from backend.core.database import db
+from backend.core.executors import executors, ExecutorSaturated
+from backend.core.circuit_breaker import CircuitOpen
+from backend.utils.single_flight import single_flight
+from backend.api.payload import strip_raw_output
+from backend.utils.fast_json import FastJSONResponse
 from backend.services.requirements_extractor import extractor
+from backend.services.requirement_index import requirement_index
+from backend.utils.http_cache import make_etag, etag_matches, not_modified, cached_json
 
 router = APIRouter()
 
@@ -15,48 +22,20 @@ class RequirementsExtract(BaseModel):
     input_id: int
     project_type: str = "General"
     industry: str = "General"
+    prune: bool = False   # Delete saved requirements this extraction didn't return
 
 @router.post("/extract")
-async def extract_requirements(data: RequirementsExtract):
+async def extract_requirements(data: RequirementsExtract, include_raw: bool = None):
     try:
-        # Get input text
-        conn = db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT raw_text FROM inputs WHERE input_id = ?", (data.input_id,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if not result:
-            raise HTTPException(status_code=404, detail="Input not found")
-        
-        raw_text = result[0]
-        
-        print(f"Extracting requirements for input_id: {data.input_id}")
-        print(f"Text length: {len(raw_text)}")
-        
-        # Extract requirements
-        try:
-            requirements = extractor.extract(raw_text, data.project_type, data.industry)
-            print(f"Extracted {requirements['total_count']} requirements")
-        except Exception as extract_error:
-            print(f"Extraction failed: {str(extract_error)}")
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=500, detail=f"Requirements extraction error: {str(extract_error)}")
-        
-        # Save to database
-        try:
-            all_reqs = requirements['functional'] + requirements['non_functional']
-            if all_reqs:
-                db.save_requirements(data.input_id, all_reqs)
-                print(f"Saved {len(all_reqs)} requirements to database")
-        except Exception as db_error:
-            print(f"Database save error: {str(db_error)}")
-            # Continue even if saving fails
-        
-        return requirements
-    
-    except HTTPException:
+        # Identical concurrent requests share one computation
+        result = await single_flight.do(
+            ("requirements.extract", data.input_id, data.project_type, data.industry, data.prune),
+            _extract_and_save,
+            data
+        )
+        # raw_output duplicates the parsed items; only sent when asked for
+        return FastJSONResponse(strip_raw_output(result, include_raw))
+    except (HTTPException, ExecutorSaturated):
         raise
     except Exception as e:
         print(f"Unexpected error in extract_requirements: {str(e)}")
@@ -64,10 +43,155 @@ async def extract_requirements(data: RequirementsExtract):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _extract_and_save(data):
+    """Extract requirements for an input and save them to the database"""
+    # Get input text
+    input_row = db.get_input(data.input_id)
+
+    if not input_row:
+        raise HTTPException(status_code=404, detail="Input not found")
+
+    raw_text = input_row.raw_text
+
+    print(f"Extracting requirements for input_id: {data.input_id}")
+    print(f"Text length: {len(raw_text)}")
+
+    # Extract requirements
+    try:
+        requirements = extractor.extract(
+            raw_text,
+            data.project_type,
+            data.industry,
+            transcript=input_row.input_type == "voice"
+        )
+        print(f"Extracted {requirements['total_count']} requirements")
+    except CircuitOpen as e:
+        return _saved_requirements(data.input_id, e)
+    except Exception as extract_error:
+        print(f"Extraction failed: {str(extract_error)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Requirements extraction error: {str(extract_error)}")
+
+    # Save to database
+    try:
+        all_reqs = requirements['functional'] + requirements['non_functional']
+        if all_reqs:
+            req_ids = db.save_requirements(data.input_id, all_reqs, prune=data.prune)
+            for req, req_id in zip(all_reqs, req_ids):
+                req.req_id, req.input_id = req_id, data.input_id
+            print(f"Saved {len(all_reqs)} requirements to database")
+            requirement_index.sync(changed_ids=req_ids)
+    except Exception as db_error:
+        print(f"Database save error: {str(db_error)}")
+        # Continue even if saving fails
+
+    return requirements
+
+
+def _saved_requirements(input_id, error):
+    """
+    Requirements saved by an earlier extraction, served while Gemini's
+    circuit is open; raises the CircuitOpen error (503) when there are none
+    """
+    saved = db.get_requirements(input_id)
+    if not saved:
+        raise error
+    print(f"Gemini circuit open, serving {len(saved)} saved requirements for input_id: {input_id}")
+    return {
+        'functional': [r for r in saved if r.req_type == 'Functional'],
+        'non_functional': [r for r in saved if r.req_type != 'Functional'],
+        'total_count': len(saved),
+        'cached': True
+    }
+
+
+# input_id -> project_id; an input never moves between projects
+_input_projects = {}
+
+
+def _input_project_id(input_id):
+    """Resolve (and remember) the project an input belongs to"""
+    if input_id not in _input_projects:
+        project_id = db.get_input_project_id(input_id)
+        if project_id is None:
+            return None
+        if len(_input_projects) >= 10000:
+            _input_projects.clear()
+        _input_projects[input_id] = project_id
+    return _input_projects[input_id]
+
+
 @router.get("/{input_id}")
-async def get_requirements(input_id: int):
+async def get_requirements(input_id: int, request: Request):
     try:
+        # Requirements are versioned with the rest of their project
+        project_id = _input_project_id(input_id)
+        version = db.get_project_version(project_id) if project_id is not None else None
+        if version:
+            etag = make_etag("requirements", input_id, *version)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+        
         requirements = db.get_requirements(input_id)
-        return {"requirements": [{"req_code": r[1], "req_type": r[2], "description": r[3]} for r in requirements]}
+        content = {"requirements": [r.to_dict("req_code", "req_type", "description") for r in requirements]}
+        if not version:
+            return content
+        return cached_json(content, etag)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{input_id}/duplicates")
+async def get_duplicate_requirements(input_id: int, threshold: float = None):
+    """
+    Report near-duplicate requirements for an input: clusters within the
+    input itself and matches against other inputs of the same project
+    """
+    try:
+        # Index sync and scoring are CPU- and database-bound
+        result = await executors.run('blocking', _find_duplicates, input_id, threshold)
+        return FastJSONResponse(result)
+    except (HTTPException, ExecutorSaturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _find_duplicates(input_id, threshold):
+    """Cluster an input's requirements and match them against the rest of its project"""
+    input_row = db.get_input(input_id)
+    if not input_row:
+        raise HTTPException(status_code=404, detail="Input not found")
+
+    requirements = db.get_requirements(input_id)
+    kept, merged = requirement_index.dedupe(requirements, threshold)
+
+    # Cross-input matches within the same project
+    requirement_index.sync()
+    project_reqs = db.get_project_requirements(input_row.project_id)
+    other = {r.req_id: r for r in project_reqs if r.input_id != input_id}
+    matches = requirement_index.query(
+        [r.description for r in kept],
+        threshold=threshold,
+        candidate_ids=list(other)
+    ) if other else [[] for _ in kept]
+
+    existing = []
+    for req, req_matches in zip(kept, matches):
+        if req_matches:
+            existing.append({
+                "req_code": req.req_code,
+                "matches": [
+                    {**other[req_id].to_dict("req_id", "input_id", "req_code", "description"),
+                     "score": round(score, 3)}
+                    for req_id, score in req_matches
+                ]
+            })
+
+    return {
+        "total_count": len(requirements),
+        "unique_count": len(kept),
+        "merged": merged,
+        "existing_matches": existing
+    }
@@ -0,0 +1,47 @@
+"""Full-text search routes"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from backend.core.database import db
+from backend.utils.fast_json import FastJSONResponse
+
+router = APIRouter()
+
+
+@router.get("")
+async def search(
+    q: str = Query(..., min_length=1),
+    kind: Optional[str] = Query(None, alias="type", description="Comma-separated: input, requirement, story, criteria"),
+    project_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Search across inputs, requirements, user stories and acceptance criteria.
+    Results are ranked by BM25 and include highlighted snippets.
+    """
+    kinds = None
+    if kind:
+        kinds = [k.strip() for k in kind.split(',') if k.strip()]
+        unknown = [k for k in kinds if k not in db.SEARCH_SOURCES]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown search type: {', '.join(unknown)}. Supported: {', '.join(db.SEARCH_SOURCES)}"
+            )
+
+    try:
+        results, has_more = db.search(q, kinds, project_id, limit, offset)
+        return FastJSONResponse({
+            "query": q,
+            "results": results,
+            "limit": limit,
+            "offset": offset,
+            "has_more": has_more
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -6,8 +6,16 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from backend.core.config import APIConfig
 from backend.core.database import db
+from backend.core.models import UserStory
+from backend.core.executors import ExecutorSaturated
+from backend.core.circuit_breaker import CircuitOpen
+from backend.utils.single_flight import single_flight
+from backend.api.payload import strip_raw_output
+from backend.utils.fast_json import FastJSONResponse
 from backend.services.story_generator import story_gen
+from backend.services.requirement_index import requirement_index
 
 router = APIRouter()
 
@@ -16,26 +24,78 @@ class StoriesGenerate(BaseModel):
     project_type: str = "General"
 
 @router.post("/generate")
-async def generate_stories(data: StoriesGenerate):
+async def generate_stories(data: StoriesGenerate, include_raw: bool = None):
     try:
-        # Get requirements
-        requirements = db.get_requirements(data.input_id)
-        
-        if not requirements:
-            raise HTTPException(status_code=404, detail="No requirements found")
-        
-        # Format requirements text
-        req_text = "## Requirements\n"
-        for req in requirements:
-            req_text += f"- {req[1]}: {req[3]}\n"
-        
-        # Generate stories
-        stories = story_gen.generate(req_text, data.project_type)
-        
-        return stories
+        # Identical concurrent requests share one computation
+        result = await single_flight.do(
+            ("stories.generate", data.input_id, data.project_type),
+            _generate_and_save,
+            data
+        )
+        # raw_output duplicates the parsed items; only sent when asked for
+        return FastJSONResponse(strip_raw_output(result, include_raw))
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _generate_and_save(data):
+    """Generate user stories for an input and save them to the database"""
+    # Get requirements
+    requirements = db.get_requirements(data.input_id)
+
+    if not requirements:
+        raise HTTPException(status_code=404, detail="No requirements found")
+
+    # Collapse near-duplicate requirements so they don't become duplicate stories
+    merged = {}
+    if APIConfig.REQUIREMENT_DEDUPE:
+        requirements, merged = requirement_index.dedupe(requirements)
+        if merged:
+            print(f"Collapsed {sum(len(v) for v in merged.values())} near-duplicate requirements")
+
+    # Generate stories (large sets fan out into concurrent per-group calls)
+    try:
+        stories = story_gen.generate_for_requirements(requirements, data.project_type)
+    except CircuitOpen as e:
+        return _saved_stories(requirements, merged, e)
+    stories['merged_requirements'] = merged
+
+    # Save to database, linked to the requirement each story implements
+    try:
+        by_requirement = story_gen.link_requirements(stories['stories'], requirements)
+        linked = [story for group in by_requirement.values() for story in group]
+
+        # The new stories replace the input's whole story set, so stories of
+        # requirements that got none this time can't keep colliding codes
+        if linked:
+            for story, story_id in zip(linked, db.save_input_stories(data.input_id, linked)):
+                story.story_id = story_id
+    except Exception as db_error:
+        print(f"Database save error: {str(db_error)}")
+        # Continue even if saving fails
+
+    return stories
+
+
+def _saved_stories(requirements, merged, error):
+    """
+    Stories saved by an earlier generation, served while Gemini's circuit
+    is open; raises the CircuitOpen error (503) when there are none
+    """
+    saved = [story for req in requirements for story in db.get_user_stories(req.req_id)]
+    if not saved:
+        raise error
+    print(f"Gemini circuit open, serving {len(saved)} saved user stories")
+    return {
+        'stories': saved,
+        'total_count': len(saved),
+        'merged_requirements': merged,
+        'cached': True
+    }
+
+
 @router.get("/{input_id}")
 async def get_stories(input_id: int):
     # Implementation: retrieve from database
@@ -44,5 +104,6 @@ async def get_stories(input_id: int):
 @router.post("/export/jira")
 async def export_jira(data: dict):
     stories_data = data.get('stories', {})
+    stories_data = {**stories_data, 'stories': [UserStory.from_dict(s) for s in stories_data.get('stories', [])]}
     csv = story_gen.format_for_jira(stories_data)
     return {"csv": csv}
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""
+Benchmarks
+==========
+Standalone performance scripts, run with python -m backend.benchmarks.<name>
+"""
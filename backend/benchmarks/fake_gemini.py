@@ -0,0 +1,266 @@
+"""
+Fake Gemini Backend
+===================
+Serves the API with google.generativeai replaced by a local fake, so the
+full workflow can be load tested without quota or cost.
+
+Responses are built from the prompt in the formats the parsers expect:
+- requirements: one FR per sentence of the analyzed text (capped)
+- user stories: one story per requirement listed in the prompt
+- acceptance criteria: three scenarios
+- transcription: a short requirements meeting transcript
+- output repair: the response echoed back
+
+Each call sleeps for the first-token latency plus output tokens at the
+given generation speed, with uniform jitter; streamed responses spread
+that time over their chunks. Uploaded files stay PROCESSING for
+--file-processing seconds.
+
+Usage:
+    python -m backend.benchmarks.fake_gemini [--port 8000] [--latency 1.5]
+        [--tokens-per-second 200] [--jitter 0.2] [--file-processing 2]
+
+The load test (backend.benchmarks.load_test) starts this server itself.
+"""
+
+import argparse
+import itertools
+import random
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "backend"))
+
+import google.generativeai as genai
+
+
+# Cap on requirements per extraction response
+MAX_REQUIREMENTS = 40
+
+SENTENCE_PATTERN = re.compile(r'[^.!?\n]{20,}[.!?]')
+
+TRANSCRIPT = (
+    "Thanks for joining the requirements session for the new customer portal. "
+    "Customers need to sign in with their email address and a password. "
+    "The dashboard should show open orders and the invoices of the last twelve months. "
+    "Customers must be able to download every invoice as a PDF document. "
+    "Support staff want to see the full order history when a customer calls. "
+    "Pages should load within two seconds even at the end of the month. "
+    "All personal data has to be encrypted at rest and in transit."
+)
+
+
+class FakeResponse:
+    """generate_content result with the attributes the services read"""
+
+    class Usage:
+        def __init__(self, prompt_tokens, output_tokens):
+            self.prompt_token_count = prompt_tokens
+            self.candidates_token_count = output_tokens
+            self.cached_content_token_count = 0
+
+    def __init__(self, text, prompt_tokens=0):
+        self.text = text
+        self.usage_metadata = self.Usage(prompt_tokens, len(text) // 4)
+
+
+class FakeFile:
+    """File API object; PROCESSING until ready_at"""
+
+    class State:
+        def __init__(self, name):
+            self.name = name
+
+    def __init__(self, name, display_name, mime_type, ready_at):
+        self.name = name
+        self.display_name = display_name
+        self.mime_type = mime_type
+        self.uri = f"https://fake-gemini.local/{name}"
+        self.ready_at = ready_at
+
+    @property
+    def state(self):
+        return self.State("ACTIVE" if time.monotonic() >= self.ready_at else "PROCESSING")
+
+
+class FakeGemini:
+    """Prompt-aware stand-in for the google.generativeai functions the app uses"""
+
+    def __init__(self, latency=1.5, tokens_per_second=200, jitter=0.2, file_processing=2.0):
+        """
+        Args:
+            latency: Seconds until the first token
+            tokens_per_second: Generation speed for the rest of the response
+            jitter: Random +/- fraction applied to every delay
+            file_processing: Seconds an uploaded file stays PROCESSING
+        """
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.file_processing = file_processing
+
+        self._lock = threading.Lock()
+        self._files = {}
+        self._ids = itertools.count(1)
+        self.calls = 0
+
+
+    def install(self):
+        """Replace the google.generativeai entry points with this fake"""
+        fake = self
+
+        class GenerativeModel:
+            def __init__(self, model_name=None, generation_config=None, **kwargs):
+                self.model_name = model_name
+                self.generation_config = generation_config
+
+            def generate_content(self, contents, stream=False, **kwargs):
+                return fake.generate(contents, stream=stream)
+
+        genai.configure = lambda **kwargs: None
+        genai.GenerativeModel = GenerativeModel
+        genai.upload_file = self.upload_file
+        genai.get_file = self.get_file
+        genai.delete_file = self.delete_file
+        genai.list_files = self.list_files
+
+
+    # ----------------------------------------
+    # Generation
+    # ----------------------------------------
+
+    def generate(self, contents, stream=False):
+        """Respond to a prompt after the simulated generation time"""
+        if isinstance(contents, str):
+            contents = [contents]
+        prompt = '\n'.join(part for part in contents if isinstance(part, str))
+        text = self._respond(prompt)
+        with self._lock:
+            self.calls += 1
+
+        first_token = self._jittered(self.latency)
+        generation = self._jittered(len(text) / 4 / self.tokens_per_second)
+        if not stream:
+            time.sleep(first_token + generation)
+            return FakeResponse(text, len(prompt) // 4)
+        return self._stream(text, first_token, generation)
+
+
+    def _stream(self, text, first_token, generation):
+        time.sleep(first_token)
+        lines = text.splitlines(keepends=True) or ['']
+        for line in lines:
+            time.sleep(generation / len(lines))
+            yield FakeResponse(line)
+
+
+    def _jittered(self, seconds):
+        return max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+    @staticmethod
+    def _respond(prompt):
+        if 'Please transcribe this audio recording' in prompt:
+            return TRANSCRIPT
+
+        if 'You are a text formatter' in prompt:
+            return prompt.split('RESPONSE TO REFORMAT:', 1)[-1].strip()
+
+        if 'TEXT TO ANALYZE:' in prompt:
+            text = prompt.split('TEXT TO ANALYZE:', 1)[1].split('CONTEXT:', 1)[0]
+            sentences = [' '.join(s.split()) for s in SENTENCE_PATTERN.findall(text)][:MAX_REQUIREMENTS]
+            functional = sentences[:max(1, len(sentences) * 3 // 4)]
+            non_functional = sentences[len(functional):]
+            lines = ["## Functional Requirements"]
+            lines += [f"- FR-{i:03d}: The system shall handle this: {s}" for i, s in enumerate(functional, 1)]
+            lines += ["", "## Non-Functional Requirements"]
+            lines += [f"- NFR-{i:03d}: The system shall meet this quality target: {s}"
+                      for i, s in enumerate(non_functional, 1)]
+            return '\n'.join(lines) + '\n'
+
+        if 'REQUIREMENTS:' in prompt:
+            requirements = re.findall(r'^- (N?FR-\d+): (.*)$', prompt.split('REQUIREMENTS:', 1)[1], re.MULTILINE)
+            return ''.join(
+                f"**Story ID**: US-{i:03d}\n"
+                f"**Requirement**: {code}\n"
+                f"**Title**: Deliver {code}\n"
+                f"**User Story**: As an end user, I want {description[:120]}, so that my work gets done faster\n"
+                f"**Priority**: {('High', 'Medium', 'Low')[i % 3]}\n"
+                f"**Story Points**: {(1, 2, 3, 5, 8)[i % 5]}\n"
+                f"**Dependencies**: {f'US-{i - 1:03d}' if i > 1 else 'None'}\n"
+                f"**Notes**: Generated by the fake Gemini backend\n\n---\n\n"
+                for i, (code, description) in enumerate(requirements, 1)
+            )
+
+        if 'USER STORY:' in prompt:
+            return (
+                "**Scenario 1: Successful completion**\n"
+                "- GIVEN the user is signed in\n- WHEN the user completes the action\n"
+                "- THEN the system confirms the result\n\n"
+                "**Scenario 2: Alternative path**\n"
+                "- GIVEN the user has saved preferences\n- WHEN the user repeats the action\n"
+                "- THEN the system applies the preferences\n\n"
+                "**Scenario 3: Invalid input**\n"
+                "- GIVEN the user enters invalid data\n- WHEN the user submits the form\n"
+                "- THEN the system shows a validation error\n"
+            )
+
+        return "OK"
+
+
+    # ----------------------------------------
+    # File API
+    # ----------------------------------------
+
+    def upload_file(self, path=None, mime_type=None, display_name=None, **kwargs):
+        time.sleep(self._jittered(self.latency / 2))
+        with self._lock:
+            name = f"files/fake-{next(self._ids)}"
+            file = FakeFile(name, display_name, mime_type, time.monotonic() + self._jittered(self.file_processing))
+            self._files[name] = file
+        return file
+
+
+    def get_file(self, name):
+        with self._lock:
+            if name not in self._files:
+                raise Exception(f"404 File {name} not found")
+            return self._files[name]
+
+
+    def delete_file(self, name):
+        with self._lock:
+            if self._files.pop(name, None) is None:
+                raise Exception(f"404 File {name} not found")
+
+
+    def list_files(self):
+        with self._lock:
+            return list(self._files.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=1.5, help="Seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Generation speed")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Random +/- fraction of every delay")
+    parser.add_argument("--file-processing", type=float, default=2.0, help="Seconds uploads stay PROCESSING")
+    args = parser.parse_args()
+
+    FakeGemini(args.latency, args.tokens_per_second, args.jitter, args.file_processing).install()
+
+    # Services configure themselves at import, so the fake goes in first
+    import uvicorn
+    from backend.api.main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+JSON Serialization Benchmark
+============================
+Compares FastAPI's default response path (jsonable_encoder + stdlib
+json, as JSONResponse renders) against FastJSONResponse (orjson, no
+encoder pass) on the payloads of the heaviest read endpoints:
+
+- projects:     GET /api/projects
+- requirements: GET /api/requirements/{input_id}
+- export:       stories with their acceptance criteria, as models
+
+Usage:
+    python -m backend.benchmarks.json_serialization [--scale 1.0] [--repeat 7]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from backend.core.models import Project, Requirement, UserStory, Scenario
+from backend.utils import fast_json
+
+
+def projects_payload(n):
+    return [
+        Project(i, f"Project {i}", "Web", "Finance", created_at="2025-01-01 12:00:00").to_dict(
+            "project_id", "project_name", "project_type", "industry", "created_at")
+        for i in range(n)
+    ]
+
+
+def requirements_payload(n):
+    return {"requirements": [
+        Requirement(i, 1, f"FR-{i:03d}", "Functional",
+                    "The system shall let users reset their password via a link sent by email").to_dict(
+            "req_code", "req_type", "description")
+        for i in range(n)
+    ]}
+
+
+def export_payload(n):
+    return {"stories": [
+        {
+            "story": UserStory(i, 1, f"US-{i:03d}", "Reset password",
+                               "As a user I want to reset my password so that I can regain access",
+                               "High", 3, "None", "", "FR-001"),
+            "criteria": [
+                Scenario(i * 3 + k, i, f"Scenario {k}", "the user is on the login page",
+                         "the user requests a reset link", "an email with a reset link is sent")
+                for k in range(3)
+            ]
+        }
+        for i in range(n)
+    ]}
+
+
+def default_render(content):
+    """What FastAPI does for a plain dict return value"""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def measure(func, payload, repeat):
+    """Median wall time of func(payload) in milliseconds, and output size"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply payload sizes")
+    parser.add_argument("--repeat", type=int, default=7, help="Runs per measurement")
+    args = parser.parse_args()
+
+    payloads = {
+        "projects": projects_payload(int(1000 * args.scale)),
+        "requirements": requirements_payload(int(5000 * args.scale)),
+        "export": export_payload(int(2000 * args.scale)),
+    }
+
+    backend_name = "orjson" if fast_json.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"Fast path: {backend_name}\n")
+    print(f"{'payload':<14}{'bytes':>10}{'default ms':>13}{'fast ms':>10}{'speedup':>10}")
+
+    for name, payload in payloads.items():
+        default_ms, size = measure(default_render, payload, args.repeat)
+        fast_ms, _ = measure(fast_json.dumps, payload, args.repeat)
+        print(f"{name:<14}{size:>10}{default_ms:>13.2f}{fast_ms:>10.2f}{default_ms / fast_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,626 @@
+"""
+Load Test and Capacity Report
+=============================
+Drives concurrent analyst sessions through the full BA workflow and
+reports how many of them one instance sustains.
+
+Each virtual analyst runs sessions back to back, with think time between
+steps:
+
+    create project → upload a document (or an audio recording) → extract
+    requirements → generate stories → generate criteria for a few stories
+    → export the project as JIRA CSV
+
+Concurrency is stepped through --levels; each level runs for
+--stage-seconds, then waits for in-flight sessions to finish. Unless --url
+is given, the API is started locally on the fake Gemini backend
+(backend.benchmarks.fake_gemini) with a throwaway database, so only this
+app's own capacity is measured.
+
+The report covers, per level:
+- latency curve: session throughput and p50/p95/p99 session latency,
+  p95 per step
+- resources: peak utilization, average queue and rejections of every
+  worker pool (/api/health/executors), event-loop responsiveness (latency
+  of /api/health while loaded) and server CPU (local runs on Linux)
+
+A level is sustainable while session errors stay under --max-error-rate
+and p95 session latency within --slo-seconds (default: twice the p95 of
+the first level). The highest sustainable level is the capacity; each
+resource's saturation point is the first level at which it ran out
+(workers all busy with work queued, or requests rejected). The run stops
+after the first unsustainable level unless --keep-going.
+
+Usage:
+    python -m backend.benchmarks.load_test [--levels 1,2,4,8,16] [--stage-seconds 60]
+        [--gemini-latency 1.5] [--report capacity.md] [--json capacity.json]
+        [--min-sessions N]
+
+With --min-sessions the exit status is 1 when the capacity is below N,
+so a release pipeline can gate on it.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import wave
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent.parent
+
+STEPS = ["create_project", "upload", "extract", "stories", "criteria", "export"]
+
+# /api/health slower than this under load means the event loop is saturated
+EVENT_LOOP_LIMIT_MS = 100
+# Average server CPU (% of one core) treated as saturated
+CPU_LIMIT_PERCENT = 90
+
+FEATURES = [
+    "Customers sign in with their email address and a password",
+    "Managers approve purchase orders above the department limit",
+    "The dashboard shows open tickets grouped by priority",
+    "Users export monthly reports as spreadsheets",
+    "Administrators deactivate accounts of employees who left",
+    "Customers receive an email when their order ships",
+    "Support staff search orders by customer name or order number",
+    "The system keeps an audit log of every change to invoices",
+    "Users upload receipts as photos from their phones",
+    "Finance reconciles payments against bank statements every night",
+    "Pages load within two seconds at peak hours",
+    "Personal data is encrypted at rest and in transit",
+    "The service stays available during deployments",
+    "Sales representatives see the purchase history of their accounts",
+    "Customers reset their password through a link that expires after an hour",
+]
+
+
+# ----------------------------------------
+# HTTP
+# ----------------------------------------
+
+class HTTPError(Exception):
+    def __init__(self, status, body):
+        self.status = status
+        super().__init__(f"HTTP {status}: {body[:200].decode('utf-8', 'replace')}")
+
+
+async def http_request(host, port, method, path, body=b"", content_type=None, timeout=300):
+    """
+    One HTTP/1.1 request on a new connection
+
+    The response is framed by Content-Length or chunked encoding rather
+    than by the connection closing: document parser processes forked
+    during a request inherit its socket and keep it open.
+
+    Returns:
+        Response body (bytes)
+
+    Raises:
+        HTTPError: For non-2xx responses
+    """
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            head = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close",
+                    f"Content-Length: {len(body)}"]
+            if content_type:
+                head.append(f"Content-Type: {content_type}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+
+            lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            status = int(lines[0].split()[1])
+            headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+            if headers.get("transfer-encoding") == "chunked":
+                payload = bytearray()
+                while True:
+                    size = int((await reader.readline()).split(b";")[0], 16)
+                    if size == 0:
+                        break
+                    payload += await reader.readexactly(size + 2)
+                    del payload[-2:]
+            elif "content-length" in headers:
+                payload = await reader.readexactly(int(headers["content-length"]))
+            else:
+                payload = await reader.read()
+        finally:
+            writer.close()
+        return status, bytes(payload)
+
+    status, payload = await asyncio.wait_for(exchange(), timeout)
+    if not 200 <= status < 300:
+        raise HTTPError(status, payload)
+    return payload
+
+
+def multipart(fields, file_field, file_name, file_bytes, file_type):
+    """Encode a multipart/form-data body; returns (body, content_type)"""
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+        f'Content-Type: {file_type}\r\n\r\n'.encode() + file_bytes + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+# ----------------------------------------
+# Session inputs
+# ----------------------------------------
+
+def meeting_notes(session_id, sentences):
+    """Unique meeting notes, so no session is served from another's caches"""
+    rng = random.Random(session_id)
+    lines = [f"Requirements workshop {session_id}."]
+    for i in range(sentences):
+        lines.append(f"{rng.choice(FEATURES)} in release {i % 4 + 1} of project {session_id}.")
+    return " ".join(lines)
+
+
+def recording(session_id, seconds):
+    """Unique 16 kHz mono WAV: a tone at a session-specific pitch with noise"""
+    rng = random.Random(session_id)
+    frequency = 200 + rng.random() * 600
+    samples = io.BytesIO()
+    for n in range(int(16000 * seconds)):
+        value = 0.3 * math.sin(2 * math.pi * frequency * n / 16000) + 0.05 * (rng.random() - 0.5)
+        samples.write(int(value * 32767).to_bytes(2, "little", signed=True))
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(samples.getvalue())
+    return buffer.getvalue()
+
+
+# ----------------------------------------
+# Driver
+# ----------------------------------------
+
+class LoadTest:
+    """Runs the load levels against one server and collects measurements"""
+
+    def __init__(self, host, port, args, server_pid=None):
+        self.host = host
+        self.port = port
+        self.args = args
+        self.server_pid = server_pid
+        self.session_ids = iter(range(1, 10 ** 9))
+
+
+    async def call(self, method, path, payload=None, body=b"", content_type=None):
+        if payload is not None:
+            body, content_type = json.dumps(payload).encode(), "application/json"
+        response = await http_request(self.host, self.port, method, path, body, content_type,
+                                      timeout=self.args.request_timeout)
+        return response
+
+
+    async def session(self, steps):
+        """One analyst session; appends (step, seconds, status) to steps"""
+        session_id = next(self.session_ids)
+        args = self.args
+
+        async def step(name, method, path, payload=None, **kwargs):
+            started = time.monotonic()
+            try:
+                response = await self.call(method, path, payload, **kwargs)
+                steps.append((name, time.monotonic() - started, 200))
+                return json.loads(response) if response[:1] in (b"{", b"[") else response
+            except HTTPError as e:
+                steps.append((name, time.monotonic() - started, e.status))
+                raise
+            except Exception:
+                steps.append((name, time.monotonic() - started, 0))
+                raise
+            finally:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * args.think_time)
+
+        project = await step("create_project", "POST", "/api/projects",
+                             {"name": f"Load test {session_id}", "type": "Web", "industry": "Retail"})
+        project_id = project["project_id"]
+
+        if random.random() < args.audio_share:
+            body, content_type = multipart({"project_id": project_id}, "file", f"meeting-{session_id}.wav",
+                                           recording(session_id, args.audio_seconds), "audio/wav")
+            uploaded = await step("upload", "POST", "/api/audio/upload", body=body, content_type=content_type)
+        else:
+            notes = meeting_notes(session_id, args.document_sentences).encode()
+            body, content_type = multipart({"project_id": project_id}, "file", f"notes-{session_id}.txt",
+                                           notes, "text/plain")
+            uploaded = await step("upload", "POST", "/api/input/upload", body=body, content_type=content_type)
+        input_id = uploaded["input_id"]
+
+        await step("extract", "POST", "/api/requirements/extract",
+                   {"input_id": input_id, "project_type": "Web", "industry": "Retail"})
+        stories = await step("stories", "POST", "/api/stories/generate", {"input_id": input_id, "project_type": "Web"})
+
+        for story in stories["stories"][:args.criteria_per_session]:
+            await step("criteria", "POST", "/api/criteria/generate", {
+                "story_id": story["story_id"],
+                "user_story": f"{story['story_code']}: {story['title']}\n{story['user_story']}"
+            })
+
+        await step("export", "GET", f"/api/projects/{project_id}/export/jira")
+
+
+    async def analyst(self, stage_end, sessions):
+        """Run sessions back to back until the stage ends"""
+        while time.monotonic() < stage_end:
+            steps = []
+            started = time.monotonic()
+            try:
+                await self.session(steps)
+                ok = True
+            except Exception:
+                ok = False
+            work = sum(seconds for _, seconds, _ in steps)
+            sessions.append({"ok": ok, "seconds": work, "wall": time.monotonic() - started, "steps": steps})
+
+
+    async def sample(self, samples, stop):
+        """Poll pool metrics, event-loop responsiveness and server CPU"""
+        cpu_before = self._cpu_seconds()
+        clock_before = time.monotonic()
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                await self.call("GET", "/api/health")
+                loop_ms = (time.monotonic() - started) * 1000
+                pools = json.loads(await self.call("GET", "/api/health/executors"))["pools"]
+            except Exception:
+                loop_ms, pools = None, {}
+
+            cpu_now, clock_now = self._cpu_seconds(), time.monotonic()
+            cpu = None
+            if cpu_before is not None and cpu_now is not None:
+                cpu = 100 * (cpu_now - cpu_before) / max(clock_now - clock_before, 1e-6)
+            cpu_before, clock_before = cpu_now, clock_now
+
+            samples.append({"loop_ms": loop_ms, "pools": pools, "cpu": cpu})
+            try:
+                await asyncio.wait_for(stop.wait(), self.args.sample_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+    def _cpu_seconds(self):
+        """User + system CPU time of the local server process (Linux only)"""
+        if self.server_pid is None:
+            return None
+        try:
+            fields = Path(f"/proc/{self.server_pid}/stat").read_text().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+    async def run_level(self, concurrency):
+        """Run one concurrency level and summarize it"""
+        sessions, samples = [], []
+        stop = asyncio.Event()
+        before = await self._pool_counters()
+
+        started = time.monotonic()
+        sampler = asyncio.create_task(self.sample(samples, stop))
+        stage_end = started + self.args.stage_seconds
+        await asyncio.gather(*(self.analyst(stage_end, sessions) for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+        stop.set()
+        await sampler
+
+        after = await self._pool_counters()
+        return summarize(concurrency, elapsed, sessions, samples, before, after)
+
+
+    async def _pool_counters(self):
+        try:
+            pools = json.loads(await self.call("GET", "/api/health/executors"))["pools"]
+        except Exception:
+            return {}
+        return {name: {"rejected": pool["rejected"], "completed": pool["completed"]} for name, pool in pools.items()}
+
+
+    async def run(self):
+        """Step through the levels; returns the list of level summaries"""
+        levels = []
+        slo = self.args.slo_seconds
+        for concurrency in self.args.levels:
+            print(f"▶ {concurrency} concurrent sessions for {self.args.stage_seconds:.0f}s...", flush=True)
+            level = await self.run_level(concurrency)
+
+            if slo is None and level["latency"]["p95"] is not None:
+                slo = 2 * level["latency"]["p95"]
+            level["sustainable"] = (
+                level["sessions"] > 0
+                and level["error_rate"] <= self.args.max_error_rate
+                and level["latency"]["p95"] is not None
+                and level["latency"]["p95"] <= slo
+            )
+            levels.append(level)
+            print(f"  {level['sessions']} sessions, p95 {_fmt(level['latency']['p95'])}s, "
+                  f"errors {level['error_rate']:.1%}{_fmt_errors(level['errors'])} "
+                  f"→ {'ok' if level['sustainable'] else 'NOT sustainable'}",
+                  flush=True)
+
+            if not level["sustainable"] and not self.args.keep_going:
+                break
+        return levels, slo
+
+
+# ----------------------------------------
+# Analysis
+# ----------------------------------------
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize(concurrency, elapsed, sessions, samples, before, after):
+    """Latency curve point and resource usage of one level"""
+    completed = [s["seconds"] for s in sessions if s["ok"]]
+    step_times = {}
+    statuses = {}
+    for session in sessions:
+        for name, seconds, status in session["steps"]:
+            step_times.setdefault(name, []).append(seconds)
+            if status != 200:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    pools = {}
+    for sample in samples:
+        for name, pool in sample["pools"].items():
+            entry = pools.setdefault(name, {"workers": pool["workers"], "peak_utilization": 0.0, "queued": []})
+            entry["peak_utilization"] = max(entry["peak_utilization"], pool["utilization"])
+            entry["queued"].append(pool["queued"])
+    for name, entry in pools.items():
+        queued = entry.pop("queued")
+        entry["avg_queued"] = round(statistics.mean(queued), 2)
+        entry["max_queued"] = max(queued)
+        entry["rejected"] = after.get(name, {}).get("rejected", 0) - before.get(name, {}).get("rejected", 0)
+        entry["completed"] = after.get(name, {}).get("completed", 0) - before.get(name, {}).get("completed", 0)
+
+    loop_ms = [s["loop_ms"] for s in samples if s["loop_ms"] is not None]
+    cpu = [s["cpu"] for s in samples if s["cpu"] is not None]
+
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 1),
+        "sessions": len(sessions),
+        "failed": len(sessions) - len(completed),
+        "error_rate": (len(sessions) - len(completed)) / len(sessions) if sessions else 0.0,
+        "errors": statuses,
+        "throughput_per_minute": round(len(completed) / elapsed * 60, 2),
+        "latency": {f"p{q}": _round(percentile(completed, q)) for q in (50, 95, 99)},
+        "steps_p95": {name: _round(percentile(step_times.get(name, []), 95)) for name in STEPS},
+        "pools": pools,
+        "event_loop_p95_ms": _round(percentile(loop_ms, 95), 1),
+        "cpu_percent": _round(statistics.mean(cpu), 1) if cpu else None,
+    }
+
+
+def saturation_points(levels):
+    """First level at which each resource ran out (None if it never did)"""
+    points = {}
+    for level in levels:
+        checks = {
+            f"pool:{name}": (pool["peak_utilization"] >= 1.0 and pool["avg_queued"] > 0) or pool["rejected"] > 0
+            for name, pool in level["pools"].items()
+        }
+        if level["event_loop_p95_ms"] is not None:
+            checks["event_loop"] = level["event_loop_p95_ms"] > EVENT_LOOP_LIMIT_MS
+        if level["cpu_percent"] is not None:
+            checks["cpu"] = level["cpu_percent"] >= CPU_LIMIT_PERCENT
+
+        for resource, saturated in checks.items():
+            if points.get(resource) is None:
+                points[resource] = level["concurrency"] if saturated else None
+    return points
+
+
+def build_report(levels, slo, args):
+    """Capacity summary as a dict (for --json) and Markdown (for --report)"""
+    capacity = 0
+    for level in levels:
+        if not level["sustainable"]:
+            break
+        capacity = level["concurrency"]
+    points = saturation_points(levels)
+
+    summary = {
+        "max_sustainable_sessions": capacity,
+        "slo_p95_seconds": _round(slo),
+        "max_error_rate": args.max_error_rate,
+        "saturation": points,
+        "gemini": {"latency": args.gemini_latency, "tokens_per_second": args.gemini_tokens_per_second,
+                   "jitter": args.gemini_jitter} if not args.url else "external",
+        "levels": levels,
+    }
+
+    lines = [
+        "# Capacity Report",
+        "",
+        f"**Max sustainable concurrent sessions: {capacity}** "
+        f"(p95 session latency ≤ {_fmt(slo)}s, errors ≤ {args.max_error_rate:.0%})",
+        "",
+        "Gemini: " + (f"fake, {args.gemini_latency}s to first token, {args.gemini_tokens_per_second:g} tokens/s, "
+                      f"±{args.gemini_jitter:.0%} jitter" if not args.url else f"external server {args.url}"),
+        "",
+        "## Saturation point per resource",
+        "",
+        "| resource | saturated at |",
+        "|---|---|",
+    ]
+    for resource, level in sorted(points.items()):
+        lines.append(f"| {resource} | {f'{level} sessions' if level else 'not reached'} |")
+
+    lines += [
+        "",
+        "## Latency curve",
+        "",
+        "| sessions | completed | errors | sessions/min | p50 s | p95 s | p99 s | event loop p95 ms | CPU % | |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for level in levels:
+        lines.append(
+            f"| {level['concurrency']} | {level['sessions'] - level['failed']} | {level['error_rate']:.1%} "
+            f"| {level['throughput_per_minute']} | {_fmt(level['latency']['p50'])} | {_fmt(level['latency']['p95'])} "
+            f"| {_fmt(level['latency']['p99'])} | {_fmt(level['event_loop_p95_ms'])} | {_fmt(level['cpu_percent'])} "
+            f"| {'✅' if level['sustainable'] else '❌'} |"
+        )
+
+    lines += ["", "## p95 per step (seconds)", "",
+              "| sessions | " + " | ".join(STEPS) + " |", "|---" * (len(STEPS) + 1) + "|"]
+    for level in levels:
+        lines.append(f"| {level['concurrency']} | " + " | ".join(_fmt(level["steps_p95"][s]) for s in STEPS) + " |")
+
+    lines += ["", "## Worker pools (peak utilization / avg queued / rejected)", ""]
+    pool_names = sorted({name for level in levels for name in level["pools"]})
+    lines += ["| sessions | " + " | ".join(pool_names) + " |", "|---" * (len(pool_names) + 1) + "|"]
+    for level in levels:
+        cells = []
+        for name in pool_names:
+            pool = level["pools"].get(name)
+            cells.append(f"{pool['peak_utilization']:.0%} / {pool['avg_queued']} / {pool['rejected']}" if pool else "-")
+        lines.append(f"| {level['concurrency']} | " + " | ".join(cells) + " |")
+
+    return summary, "\n".join(lines) + "\n"
+
+
+def _round(value, digits=2):
+    return None if value is None else round(value, digits)
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:g}"
+
+
+def _fmt_errors(errors):
+    """Failed steps by HTTP status (0: no response)"""
+    if not errors:
+        return ""
+    return " (" + ", ".join(f"{status}: {count}" for status, count in sorted(errors.items())) + ")"
+
+
+# ----------------------------------------
+# Local server
+# ----------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, port, state_dir):
+    """Start the API on the fake Gemini backend with a throwaway database"""
+    env = {
+        **os.environ,
+        "DATABASE_URL": "",
+        "DATABASE_PATH": str(Path(state_dir) / "load_test.db"),
+        "LOCAL_STATE_DIR": state_dir,
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "fake",
+        "GEMINI_AUDIO_API_KEY": os.environ.get("GEMINI_AUDIO_API_KEY") or "fake",
+        "GEMINI_CONTEXT_CACHE": "local",
+    }
+    command = [
+        sys.executable, "-m", "backend.benchmarks.fake_gemini", "--port", str(port),
+        "--latency", str(args.gemini_latency),
+        "--tokens-per-second", str(args.gemini_tokens_per_second),
+        "--jitter", str(args.gemini_jitter),
+        "--file-processing", str(args.gemini_file_processing),
+    ]
+    log = open(Path(state_dir) / "server.log", "w")
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    # The log goes away with the temporary directory
+    tail = Path(log.name).read_text(encoding="utf-8", errors="replace").splitlines()[-20:]
+    raise SystemExit("Server did not start:\n" + "\n".join(tail))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Test a running server (e.g. http://127.0.0.1:8000) instead of a local fake")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4, 8, 16, 32],
+                        help="Concurrent sessions per stage")
+    parser.add_argument("--stage-seconds", type=float, default=60, help="Duration of each level")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Average pause between steps")
+    parser.add_argument("--audio-share", type=float, default=0.3, help="Fraction of sessions uploading audio")
+    parser.add_argument("--audio-seconds", type=float, default=10, help="Length of uploaded recordings")
+    parser.add_argument("--document-sentences", type=int, default=20, help="Sentences per uploaded document")
+    parser.add_argument("--criteria-per-session", type=int, default=3, help="Stories that get criteria")
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between resource samples")
+    parser.add_argument("--slo-seconds", type=float, help="p95 session latency limit (default: 2x first level)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--keep-going", action="store_true", help="Run all levels even after one fails")
+    parser.add_argument("--gemini-latency", type=float, default=1.5, help="Fake Gemini seconds to first token")
+    parser.add_argument("--gemini-tokens-per-second", type=float, default=200, help="Fake Gemini generation speed")
+    parser.add_argument("--gemini-jitter", type=float, default=0.2, help="Fake Gemini +/- delay fraction")
+    parser.add_argument("--gemini-file-processing", type=float, default=2.0, help="Fake File API processing seconds")
+    parser.add_argument("--report", help="Write the Markdown report here")
+    parser.add_argument("--json", help="Write the full results as JSON here")
+    parser.add_argument("--min-sessions", type=int, help="Exit with status 1 below this capacity")
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="ba_copilot_load_") as state_dir:
+        if args.url:
+            address = args.url.split("://", 1)[-1].rstrip("/")
+            host, _, port = address.partition(":")
+            port = int(port or 80)
+        else:
+            host, port = "127.0.0.1", free_port()
+            server = start_server(args, port, state_dir)
+
+        try:
+            load_test = LoadTest(host, port, args, server_pid=server.pid if server else None)
+            levels, slo = asyncio.run(load_test.run())
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    summary, report = build_report(levels, slo, args)
+    print()
+    print(report)
+    if args.report:
+        Path(args.report).write_text(report, encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+    if args.min_sessions is not None and summary["max_sustainable_sessions"] < args.min_sessions:
+        print(f"❌ Capacity {summary['max_sustainable_sessions']} is below the required {args.min_sessions} sessions")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,5 +8,9 @@ Configuration, database, and models
 
 from .config import Settings, APIConfig, settings
 from .database import Database, db
+from .executors import ExecutorManager, ExecutorSaturated, executors
+from .models import Project, Input, Requirement, UserStory, Scenario
 
-__all__ = ['Settings', 'APIConfig', 'settings', 'Database', 'db']
\ No newline at end of file
+__all__ = ['Settings', 'APIConfig', 'settings', 'Database', 'db',
+           'ExecutorManager', 'ExecutorSaturated', 'executors',
+           'Project', 'Input', 'Requirement', 'UserStory', 'Scenario']
\ No newline at end of file
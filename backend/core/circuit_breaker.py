@@ -0,0 +1,236 @@
+"""
+Circuit Breakers
+================
+Fast-fail for model calls while Gemini is down or overloaded.
+
+Each breaker tracks the outcomes of recent calls in a sliding time
+window and moves between three states:
+
+- closed:    calls go through; the breaker opens once at least
+             CIRCUIT_MIN_CALLS calls in the window fail (outage errors
+             only: 503/429/timeouts/5xx) or run slow at the configured rates
+- open:      calls are rejected immediately with CircuitOpen (503 +
+             Retry-After) instead of piling into retry sleeps
+- half_open: after the open period a few probe calls are let through;
+             success closes the breaker, failure reopens it for twice as
+             long (up to CIRCUIT_MAX_OPEN_SECONDS)
+
+Breaker states are reported by /api/health/apis.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from backend.core.config import APIConfig
+from backend.core.executors import ExecutorSaturated
+
+
+# Exception class names (anywhere in the MRO) that mean the service is unavailable
+OUTAGE_ERROR_NAMES = {
+    'ServiceUnavailable', 'ResourceExhausted', 'TooManyRequests', 'DeadlineExceeded',
+    'InternalServerError', 'BadGateway', 'GatewayTimeout', 'RetryError',
+    'TimeoutError', 'ConnectionError',
+}
+
+# Message fragments of wrapped/untyped outage errors
+OUTAGE_MESSAGES = ('503', '429', 'overloaded', 'unavailable', 'deadline exceeded', 'timed out', '500 internal')
+
+
+def is_outage_error(error):
+    """True for errors caused by the service being down or overloaded (not by the request)"""
+    if any(cls.__name__ in OUTAGE_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in OUTAGE_MESSAGES)
+
+
+class CircuitOpen(ExecutorSaturated):
+    """
+    Raised instead of calling a service whose breaker is open
+
+    Subclasses ExecutorSaturated so routes pass it through and the API
+    answers 503 + Retry-After the same way.
+    """
+
+    def __init__(self, breaker_name, label, retry_after):
+        self.pool_name = breaker_name
+        self.breaker_name = breaker_name
+        self.retry_after = retry_after
+        Exception.__init__(
+            self,
+            f"{label} is temporarily unavailable (circuit open after repeated failures). "
+            f"Retry in {retry_after}s."
+        )
+
+
+class CircuitBreaker:
+    """Error-rate and latency based circuit breaker"""
+
+    def __init__(self, name, label=None):
+        """
+        Args:
+            name: Breaker name used in health output
+            label: Human-readable service name for error messages
+        """
+        self.name = name
+        self.label = label or name
+        self.window_seconds = APIConfig.CIRCUIT_WINDOW_SECONDS
+        self.min_calls = APIConfig.CIRCUIT_MIN_CALLS
+        self.error_rate = APIConfig.CIRCUIT_ERROR_RATE
+        self.slow_call_seconds = APIConfig.CIRCUIT_SLOW_CALL_SECONDS
+        self.slow_call_rate = APIConfig.CIRCUIT_SLOW_CALL_RATE
+        self.open_seconds = APIConfig.CIRCUIT_OPEN_SECONDS
+        self.max_open_seconds = APIConfig.CIRCUIT_MAX_OPEN_SECONDS
+        self.half_open_calls = APIConfig.CIRCUIT_HALF_OPEN_CALLS
+
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self._outcomes = deque()     # (time, failed, slow) of calls while closed
+        self._open_until = 0.0
+        self._open_duration = self.open_seconds
+        self._probes = 0             # half-open calls in flight
+        self.stats = {'opened': 0, 'rejected': 0, 'failures': 0, 'calls': 0}
+        self.last_error = None
+        self.last_reason = None      # why the breaker last opened
+
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call func through the breaker
+
+        Raises:
+            CircuitOpen: If the breaker is open (func is not called)
+        """
+        probe = self._before()
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            outage = is_outage_error(e)
+            if outage:
+                self.last_error = str(e)[:200]
+            self._after(probe, time.monotonic() - started, failed=outage)
+            raise
+        self._after(probe, time.monotonic() - started, failed=False)
+        return result
+
+
+    def check(self):
+        """
+        Raise CircuitOpen if the breaker is open, without using up a probe
+
+        Retry loops call this before sleeping, so a request gives up as
+        soon as the outage is established instead of waiting it out.
+        """
+        with self._lock:
+            if self.state == 'open' and time.monotonic() < self._open_until:
+                self.stats['rejected'] += 1
+                raise self._open_error(time.monotonic())
+
+
+    def _before(self):
+        """Admit or reject a call; returns True for half-open probes"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'open':
+                if now < self._open_until:
+                    self.stats['rejected'] += 1
+                    raise self._open_error(now)
+                self.state = 'half_open'
+                self._probes = 0
+
+            if self.state == 'half_open':
+                if self._probes >= self.half_open_calls:
+                    self.stats['rejected'] += 1
+                    raise CircuitOpen(self.name, self.label, 1)
+                self._probes += 1
+                return True
+
+            return False
+
+
+    def _after(self, probe, elapsed, failed):
+        """Record a call outcome and change state if needed"""
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            self.stats['calls'] += 1
+            if failed:
+                self.stats['failures'] += 1
+
+            if probe:
+                self._probes -= 1
+                if self.state != 'half_open':
+                    return
+                if failed or slow:
+                    reason = 'probe failed' if failed else f'probe took {elapsed:.1f}s'
+                    self._open(now, min(self._open_duration * 2, self.max_open_seconds), reason)
+                else:
+                    print(f"Circuit '{self.name}' closed: probe call succeeded")
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                    self._open_duration = self.open_seconds
+                return
+
+            # Late results of calls admitted before the breaker opened
+            if self.state != 'closed':
+                return
+
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                self._outcomes.popleft()
+
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, _, s in self._outcomes if s)
+            if failures / calls >= self.error_rate:
+                self._open(now, self.open_seconds, f'{failures}/{calls} calls failed')
+            elif slow_calls / calls >= self.slow_call_rate:
+                self._open(now, self.open_seconds, f'{slow_calls}/{calls} calls slower than {self.slow_call_seconds:g}s')
+
+
+    def _open(self, now, duration, reason):
+        """Open the breaker for duration seconds (caller holds the lock)"""
+        self.state = 'open'
+        self._open_duration = duration
+        self._open_until = now + duration
+        self._outcomes.clear()
+        self.stats['opened'] += 1
+        self.last_reason = reason
+        print(f"Circuit '{self.name}' opened for {duration:.0f}s: {reason} (last error: {self.last_error})")
+
+
+    def _open_error(self, now):
+        return CircuitOpen(self.name, self.label, max(1, math.ceil(self._open_until - now)))
+
+
+    def status(self):
+        """State and window statistics for health endpoints"""
+        with self._lock:
+            now = time.monotonic()
+            calls = len(self._outcomes)
+            state = self.state
+            if state == 'open' and now >= self._open_until:
+                state = 'half_open'
+            return {
+                'state': state,
+                'calls_in_window': calls,
+                'error_rate': round(sum(1 for _, f, _ in self._outcomes if f) / calls, 2) if calls else 0.0,
+                'slow_call_rate': round(sum(1 for _, _, s in self._outcomes if s) / calls, 2) if calls else 0.0,
+                'retry_after': max(1, math.ceil(self._open_until - now)) if state == 'open' else None,
+                'last_error': self.last_error,
+                'last_open_reason': self.last_reason,
+                **self.stats
+            }
+
+
+# Breaker instances, one per upstream service
+circuit_breakers = {
+    'gemini': CircuitBreaker('gemini', 'Gemini API'),
+    'gemini_live': CircuitBreaker('gemini_live', 'Gemini live transcription'),
+}
+gemini_breaker = circuit_breakers['gemini']
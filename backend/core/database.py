@@ -1,18 +1,212 @@
 import sqlite3
 import json
+import re
 from datetime import datetime
 from pathlib import Path
 
+from backend.core.config import APIConfig
+from backend.core.models import Project, Input, Requirement, UserStory, Scenario
+from backend.core.tracing import trace_methods
 
-class Database:
-    """Database manager for BA Copilot"""
+
+# Full-text search mirrors: fts table -> (content table, rowid column, indexed columns)
+FTS_TABLES = {
+    'inputs_fts': ('inputs', 'input_id', ['raw_text']),
+    'requirements_fts': ('requirements', 'req_id', ['description']),
+    'user_stories_fts': ('user_stories', 'story_id', ['title', 'user_story']),
+    'acceptance_criteria_fts': ('acceptance_criteria', 'criteria_id',
+                                ['scenario_name', 'given_clause', 'when_clause', 'then_clause']),
+}
+
+# Materialized project counters: table -> (owning project of row {row}, {project_stats column: per-row value})
+# Expressions are plain SQL shared by the SQLite and PostgreSQL triggers
+STATS_SOURCES = {
+    'inputs': ("{row}.project_id", {
+        'inputs': "1",
+    }),
+    'requirements': ("(SELECT project_id FROM inputs WHERE input_id = {row}.input_id)", {
+        'requirements': "1",
+        'functional_requirements': "CASE WHEN {row}.req_type = 'Functional' THEN 1 ELSE 0 END",
+        'non_functional_requirements': "CASE WHEN {row}.req_type = 'Non-Functional' THEN 1 ELSE 0 END",
+    }),
+    'user_stories': ("(SELECT i.project_id FROM requirements r JOIN inputs i ON i.input_id = r.input_id "
+                     "WHERE r.req_id = {row}.req_id)", {
+        'user_stories': "1",
+        'story_points': "COALESCE({row}.story_points, 0)",
+        'high_priority': "CASE WHEN {row}.priority = 'High' THEN 1 ELSE 0 END",
+        'medium_priority': "CASE WHEN {row}.priority = 'Medium' THEN 1 ELSE 0 END",
+        'low_priority': "CASE WHEN {row}.priority = 'Low' THEN 1 ELSE 0 END",
+    }),
+    'acceptance_criteria': ("(SELECT i.project_id FROM user_stories s JOIN requirements r ON r.req_id = s.req_id "
+                            "JOIN inputs i ON i.input_id = r.input_id WHERE s.story_id = {row}.story_id)", {
+        'acceptance_criteria': "1",
+    }),
+}
+
+
+class StorageBackend:
+    """
+    Backend-independent part of the storage interface
+
+    Database (SQLite) and PostgresDatabase implement the same method
+    surface: project, input, requirement, story and criteria CRUD returning
+    models, export iterators, full-text search, version lookups for HTTP
+    caching and the requirement index queries. Subclasses provide the SQL;
+    this class holds what is shared between them.
+
+    Attributes:
+        state_dir: Directory for node-local derived state (requirement
+            index, transcript cache) that can be rebuilt from the database
+    """
+
+    # kind -> (fts table, SQL joining the matched rowid `m.rowid` to its project)
+    SEARCH_SOURCES = {
+        'input': ('inputs_fts', """
+            SELECT m.rowid, m.rank, m.snippet, i.project_id, i.input_id, COALESCE(i.file_name, i.input_type) AS title
+            FROM ({match}) m
+            JOIN inputs i ON i.input_id = m.rowid
+        """),
+        'requirement': ('requirements_fts', """
+            SELECT m.rowid, m.rank, m.snippet, i.project_id, i.input_id, r.req_code AS title
+            FROM ({match}) m
+            JOIN requirements r ON r.req_id = m.rowid
+            JOIN inputs i ON i.input_id = r.input_id
+        """),
+        'story': ('user_stories_fts', """
+            SELECT m.rowid, m.rank, m.snippet, i.project_id, i.input_id, s.story_code || ': ' || s.title AS title
+            FROM ({match}) m
+            JOIN user_stories s ON s.story_id = m.rowid
+            JOIN requirements r ON r.req_id = s.req_id
+            JOIN inputs i ON i.input_id = r.input_id
+        """),
+        'criteria': ('acceptance_criteria_fts', """
+            SELECT m.rowid, m.rank, m.snippet, i.project_id, i.input_id, c.scenario_name AS title
+            FROM ({match}) m
+            JOIN acceptance_criteria c ON c.criteria_id = m.rowid
+            JOIN user_stories s ON s.story_id = c.story_id
+            JOIN requirements r ON r.req_id = s.req_id
+            JOIN inputs i ON i.input_id = r.input_id
+        """),
+    }
+
+
+    @staticmethod
+    def _scenario_names(criteria_list):
+        """
+        Scenario names made unique within one story
+
+        scenario_name is the upsert key, so repeated names ("Invalid input"
+        twice) get a " (2)", " (3)" suffix instead of overwriting each other.
+        """
+        names = []
+        seen = set()
+        for criteria in criteria_list:
+            base = criteria.scenario_name or 'Scenario'
+            name, n = base, 1
+            while name in seen:
+                n += 1
+                name = f"{base} ({n})"
+            seen.add(name)
+            names.append(name)
+        return names
+
+
+    def search(self, text, kinds=None, project_id=None, limit=20, offset=0):
+        """
+        Ranked full-text search over inputs, requirements, stories and criteria
+
+        Args:
+            text: Free-text query
+            kinds: Subset of SEARCH_SOURCES keys (default: all)
+            project_id: Restrict results to one project
+            limit: Page size
+            offset: Page offset
+
+        Returns:
+            (results, has_more) where results are dicts with kind, item_id,
+            project_id, input_id, title, snippet and score
+        """
+        kinds = kinds or list(self.SEARCH_SOURCES)
+        # Each source only needs to produce enough rows to fill this page
+        window = offset + limit + 1
+
+        results = [
+            {
+                'kind': kind,
+                'item_id': rowid,
+                'project_id': row_project_id,
+                'input_id': input_id,
+                'title': title,
+                'snippet': snippet,
+                'score': -rank
+            }
+            for kind, (rowid, rank, snippet, row_project_id, input_id, title)
+            in self._search_rows(text, kinds, project_id, window)
+        ]
+
+        # Backends rank ascending (bm25 is negative); higher score means a better match
+        results.sort(key=lambda r: r['score'], reverse=True)
+        page = results[offset:offset + limit]
+        has_more = len(results) > offset + limit
+
+        return page, has_more
+
+
+    def get_project_summary(self, project_id):
+        """
+        Get complete summary of a project
+        
+        Reads the trigger-maintained project_stats row, so the cost does
+        not grow with the size of the project.
+        """
+        stats = self._get_stats(project_id)
+        
+        if stats is None:
+            return {
+                'inputs': 0,
+                'requirements': 0,
+                'user_stories': 0,
+                'acceptance_criteria': 0,
+                'story_points': 0,
+                'requirement_types': {'functional': 0, 'non_functional': 0},
+                'priorities': {'high': 0, 'medium': 0, 'low': 0},
+                'version': 0
+            }
+        
+        return {
+            'inputs': stats['inputs'],
+            'requirements': stats['requirements'],
+            'user_stories': stats['user_stories'],
+            'acceptance_criteria': stats['acceptance_criteria'],
+            'story_points': stats['story_points'],
+            'requirement_types': {
+                'functional': stats['functional_requirements'],
+                'non_functional': stats['non_functional_requirements']
+            },
+            'priorities': {
+                'high': stats['high_priority'],
+                'medium': stats['medium_priority'],
+                'low': stats['low_priority']
+            },
+            'version': stats['version']
+        }
+
+
+    def close(self):
+        """Release connections held by the backend"""
+
+
+@trace_methods('db')
+class Database(StorageBackend):
+    """SQLite database manager for BA Copilot"""
     
     def __init__(self, db_path="database/ba_copilot.db"):
         """Initialize database connection"""
         self.db_path = db_path
+        self.state_dir = Path(db_path).parent
         
         # Create database directory if it doesn't exist
-        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
         
         # Initialize database tables
         self._initialize_tables()
@@ -109,9 +303,215 @@ class Database:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        
+
+        self._initialize_unique_keys(cursor)
+        self._initialize_search(cursor)
+        self._initialize_stats(cursor)
+        self._initialize_versions(cursor)
+
         conn.commit()
         conn.close()
+
+
+    def _initialize_unique_keys(self, cursor):
+        """
+        Guard against duplicate persistence of generated items
+
+        Re-running a generation for the same parent updates rows in place
+        instead of appending copies. Databases created before these keys
+        existed are cleaned up first: duplicates are collapsed onto the
+        oldest row and child rows are re-pointed to it.
+        """
+        # unique index -> (table, id column, key columns, child table that references id)
+        unique_keys = {
+            'idx_requirements_input_code': ('requirements', 'req_id', ('input_id', 'req_code'), 'user_stories'),
+            'idx_user_stories_req_code': ('user_stories', 'story_id', ('req_id', 'story_code'), 'acceptance_criteria'),
+            'idx_criteria_story_scenario': ('acceptance_criteria', 'criteria_id', ('story_id', 'scenario_name'), None),
+        }
+
+        for index_name, (table, id_col, key_cols, child_table) in unique_keys.items():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+            if cursor.fetchone():
+                continue
+
+            same_key = ' AND '.join(f"d.{c} = {table}.{c}" for c in key_cols)
+            keeper = f"(SELECT MIN(d.{id_col}) FROM {table} d WHERE {same_key})"
+
+            if child_table:
+                cursor.execute(f"""
+                    UPDATE {child_table} SET {id_col} = (
+                        SELECT {keeper} FROM {table} WHERE {table}.{id_col} = {child_table}.{id_col}
+                    )
+                    WHERE {id_col} IN (SELECT {id_col} FROM {table} WHERE {id_col} > {keeper})
+                """)
+            cursor.execute(f"DELETE FROM {table} WHERE {id_col} > {keeper}")
+
+            cursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {table} ({', '.join(key_cols)})")
+
+
+    def _initialize_search(self, cursor):
+        """
+        Create FTS5 mirrors of the text columns, kept in sync by triggers
+
+        The FTS tables are external-content tables, so the text itself is
+        only stored once in the base tables. Tables created for the first
+        time are backfilled from existing rows.
+        """
+        for fts_table, (table, rowid, columns) in FTS_TABLES.items():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+            exists = cursor.fetchone() is not None
+
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f"new.{c}" for c in columns)
+            old_values = ', '.join(f"old.{c}" for c in columns)
+
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                    {column_list},
+                    content='{table}',
+                    content_rowid='{rowid}',
+                    tokenize='porter unicode61',
+                    prefix='2 3'
+                )
+            """)
+
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.{rowid}, {new_values});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.{rowid}, {old_values});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.{rowid}, {old_values});
+                    INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.{rowid}, {new_values});
+                END
+            """)
+
+            if not exists:
+                cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+    def _initialize_stats(self, cursor):
+        """
+        Create project_stats, a per-project row of counters kept current by triggers
+
+        Every insert, update (including upserts) and delete on the source
+        tables adjusts the owning project's counters and bumps its version,
+        so summaries are a primary-key lookup. The table is backfilled from
+        existing rows when first created.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'project_stats'")
+        exists = cursor.fetchone() is not None
+
+        columns = [c for _, values in STATS_SOURCES.values() for c in values]
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS project_stats (
+                project_id INTEGER PRIMARY KEY,
+                {', '.join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in columns)},
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS project_stats_projects_ai AFTER INSERT ON projects BEGIN
+                INSERT INTO project_stats (project_id)
+                SELECT new.project_id WHERE NOT EXISTS (SELECT 1 FROM project_stats WHERE project_id = new.project_id);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS project_stats_projects_ad AFTER DELETE ON projects BEGIN
+                DELETE FROM project_stats WHERE project_id = old.project_id;
+            END
+        """)
+
+        for table, (project, values) in STATS_SOURCES.items():
+            def adjust(row, sign):
+                assignments = ', '.join(f"{c} = {c} {sign} {v.format(row=row)}" for c, v in values.items())
+                return f"""
+                    UPDATE project_stats
+                    SET {assignments}, version = version + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE project_id = {project.format(row=row)};
+                """
+
+            # NOT EXISTS rather than OR IGNORE: an outer upsert's conflict
+            # handling would override OR IGNORE inside the trigger
+            ensure_row = f"""
+                INSERT INTO project_stats (project_id)
+                SELECT p.project_id FROM (SELECT {project.format(row='new')} AS project_id) p
+                WHERE p.project_id IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM project_stats ps WHERE ps.project_id = p.project_id);
+            """
+
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS project_stats_{table}_ai AFTER INSERT ON {table} BEGIN
+                    {ensure_row}
+                    {adjust('new', '+')}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS project_stats_{table}_ad AFTER DELETE ON {table} BEGIN
+                    {adjust('old', '-')}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS project_stats_{table}_au AFTER UPDATE ON {table} BEGIN
+                    {adjust('old', '-')}
+                    {ensure_row}
+                    {adjust('new', '+')}
+                END
+            """)
+
+        if not exists:
+            cursor.execute("INSERT OR IGNORE INTO project_stats (project_id) SELECT project_id FROM projects")
+            for table, (project, values) in STATS_SOURCES.items():
+                sums = ', '.join(f"SUM({v.format(row='t')})" for v in values.values())
+                cursor.execute(f"SELECT {project.format(row='t')} AS pid, {sums} FROM {table} t GROUP BY pid")
+                assignments = ', '.join(f"{c} = ?" for c in values)
+                cursor.executemany(
+                    f"UPDATE project_stats SET {assignments} WHERE project_id = ?",
+                    [(*row[1:], row[0]) for row in cursor.fetchall() if row[0] is not None]
+                )
+    
+    
+    def _initialize_versions(self, cursor):
+        """
+        Version counters for HTTP caching
+
+        resource_versions holds collection-level counters (the project
+        list); per-project content is versioned by project_stats.version,
+        which the project's own row edits bump as well.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS resource_versions (
+                resource TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO resource_versions (resource) VALUES ('projects')")
+
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS resource_versions_projects_{event.lower()} AFTER {event} ON projects BEGIN
+                    UPDATE resource_versions
+                    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE resource = 'projects';
+                END
+            """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS project_stats_projects_au AFTER UPDATE ON projects BEGIN
+                UPDATE project_stats
+                SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE project_id = new.project_id;
+            END
+        """)
     
     
     # ========================================
@@ -136,12 +536,13 @@ class Database:
     
     
     def get_all_projects(self):
-        """Retrieve all projects"""
+        """Retrieve all projects as Project models"""
         conn = self._get_connection()
+        conn.row_factory = Project.row_factory
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT project_id, project_name, project_type, industry, created_at
+            SELECT project_id, project_name, project_type, industry, description, created_at, updated_at
             FROM projects
             ORDER BY created_at DESC
         """)
@@ -153,12 +554,14 @@ class Database:
     
     
     def get_project(self, project_id):
-        """Get specific project details"""
+        """Get specific project details (Project or None)"""
         conn = self._get_connection()
+        conn.row_factory = Project.row_factory
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT * FROM projects WHERE project_id = ?
+            SELECT project_id, project_name, project_type, industry, description, created_at, updated_at
+            FROM projects WHERE project_id = ?
         """, (project_id,))
         
         project = cursor.fetchone()
@@ -200,54 +603,115 @@ class Database:
         input_id = cursor.lastrowid
         conn.commit()
         conn.close()
-        
+
         return input_id
-    
+
+
+    def get_input(self, input_id):
+        """Get a single input (Input or None)"""
+        conn = self._get_connection()
+        conn.row_factory = Input.row_factory
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT input_id, project_id, input_type, raw_text, file_name, created_at
+            FROM inputs WHERE input_id = ?
+        """, (input_id,))
+
+        input_row = cursor.fetchone()
+        conn.close()
+
+        return input_row
+
     
     # ========================================
     # REQUIREMENTS OPERATIONS
     # ========================================
     
-    def save_requirements(self, input_id, requirements_list):
+    def save_requirements(self, input_id, requirements_list, prune=False):
         """
         Save extracted requirements
     
+        Re-saving a req_code for the same input updates the existing row
+        instead of adding a duplicate. When the description changed, the
+        stories and criteria generated for the old text are deleted, since
+        they no longer describe the requirement.
+    
         Args:
         input_id: ID of the input source
-        requirements_list: List of dicts with keys: req_code, req_type, description
+        requirements_list: List of Requirement models
+        prune: Also delete the input's requirements missing from the list,
+            with their stories and criteria (extractions are not
+            deterministic, so only on explicit request)
+        
+        Returns:
+            List of req_ids in the same order as requirements_list
         """
         conn = self._get_connection()
         cursor = conn.cursor()
     
         try:
+            req_ids = []
             for req in requirements_list:
-                # Ensure all required fields exist
-                req_code = req.get('req_code', 'UNKNOWN')
-                req_type = req.get('req_type', 'Functional')
-                description = req.get('description', '')
+                req_code = req.req_code or 'UNKNOWN'
+
+                cursor.execute(
+                    "SELECT req_id, description FROM requirements WHERE input_id = ? AND req_code = ?",
+                    (input_id, req_code)
+                )
+                existing = cursor.fetchone()
+                if existing and existing[1] != req.description:
+                    self._delete_stories(cursor, "req_id = ?", (existing[0],))
             
                 cursor.execute("""
                 INSERT INTO requirements (input_id, req_code, req_type, description)
                 VALUES (?, ?, ?, ?)
-                """, (input_id, req_code, req_type, description))
+                ON CONFLICT (input_id, req_code) DO UPDATE SET
+                    req_type = excluded.req_type,
+                    description = excluded.description
+                """, (input_id, req_code, req.req_type, req.description))
+                
+                cursor.execute(
+                    "SELECT req_id FROM requirements WHERE input_id = ? AND req_code = ?",
+                    (input_id, req_code)
+                )
+                req_ids.append(cursor.fetchone()[0])
+
+            if prune:
+                stale = f"input_id = ? AND req_id NOT IN ({','.join('?' * len(req_ids))})"
+                self._delete_stories(cursor, f"req_id IN (SELECT req_id FROM requirements WHERE {stale})",
+                                     (input_id, *req_ids))
+                cursor.execute(f"DELETE FROM requirements WHERE {stale}", (input_id, *req_ids))
         
             conn.commit()
             print(f"Successfully saved {len(requirements_list)} requirements")
+            return req_ids
         except Exception as e:
             print(f"Error saving requirements: {str(e)}")
             conn.rollback()
             raise
         finally:
             conn.close()
+
+
+    @staticmethod
+    def _delete_stories(cursor, where, params):
+        """Delete the user stories matching a condition, with their acceptance criteria"""
+        cursor.execute(f"""
+            DELETE FROM acceptance_criteria
+            WHERE story_id IN (SELECT story_id FROM user_stories WHERE {where})
+        """, params)
+        cursor.execute(f"DELETE FROM user_stories WHERE {where}", params)
     
     
     def get_requirements(self, input_id):
-        """Get all requirements for an input"""
+        """Get all requirements for an input as Requirement models"""
         conn = self._get_connection()
+        conn.row_factory = Requirement.row_factory
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT req_id, req_code, req_type, description
+            SELECT req_id, input_id, req_code, req_type, description
             FROM requirements
             WHERE input_id = ?
             ORDER BY req_code
@@ -255,9 +719,86 @@ class Database:
         
         requirements = cursor.fetchall()
         conn.close()
-        
+
         return requirements
-    
+
+
+    def get_project_requirements(self, project_id):
+        """Get all requirements across every input of a project as Requirement models"""
+        conn = self._get_connection()
+        conn.row_factory = Requirement.row_factory
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT r.req_id, r.input_id, r.req_code, r.req_type, r.description
+            FROM requirements r
+            JOIN inputs i ON i.input_id = r.input_id
+            WHERE i.project_id = ?
+            ORDER BY r.input_id, r.req_code
+        """, (project_id,))
+
+        requirements = cursor.fetchall()
+        conn.close()
+
+        return requirements
+
+
+    def get_requirement_texts(self, req_ids=None, after_id=0):
+        """
+        (req_id, description) pairs for the requirement index, ordered by req_id
+
+        Args:
+            req_ids: Specific requirements to read (overrides after_id)
+            after_id: Read every requirement with a greater req_id
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        if req_ids is not None:
+            placeholders = ','.join('?' * len(req_ids))
+            cursor.execute(f"""
+                SELECT req_id, description FROM requirements
+                WHERE req_id IN ({placeholders})
+                ORDER BY req_id
+            """, list(req_ids))
+        else:
+            cursor.execute("""
+                SELECT req_id, description FROM requirements
+                WHERE req_id > ?
+                ORDER BY req_id
+            """, (after_id,))
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        return rows
+
+
+    def count_requirements(self, max_id):
+        """Number of requirements with req_id <= max_id"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT COUNT(*) FROM requirements WHERE req_id <= ?", (max_id,))
+
+        count = cursor.fetchone()[0]
+        conn.close()
+
+        return count
+
+
+    def get_requirement_ids(self, max_id):
+        """req_ids <= max_id"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT req_id FROM requirements WHERE req_id <= ?", (max_id,))
+
+        req_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        return req_ids
+
     
     # ========================================
     # USER STORY OPERATIONS
@@ -265,52 +806,139 @@ class Database:
     
     def save_user_stories(self, req_id, stories_list):
         """
-        Save generated user stories
+        Save generated user stories as the requirement's full story set
         
         Args:
             req_id: ID of the requirement
-            stories_list: List of dicts with story details
+            stories_list: List of UserStory models
+        
+        A story_code already saved for this requirement is updated in place;
+        the requirement's other stories (and their criteria) are deleted in
+        the same transaction.
+        
+        Returns:
+            List of story_ids in the same order as stories_list
+        """
+        for story in stories_list:
+            story.req_id = req_id
+        return self._replace_stories("req_id = ?", (req_id,), stories_list)
+
+
+    def save_input_stories(self, input_id, stories_list):
+        """
+        Save the user stories generated for an input as its full story set
+
+        Like save_user_stories, but across all requirements of the input:
+        stories of a requirement that got none in this run are deleted too,
+        so their codes can't collide with the renumbered codes of the new
+        stories.
+
+        Args:
+            input_id: ID of the input source
+            stories_list: UserStory models with req_id set to a requirement
+                of the input
+
+        Returns:
+            List of story_ids in the same order as stories_list
         """
+        return self._replace_stories(
+            "req_id IN (SELECT req_id FROM requirements WHERE input_id = ?)", (input_id,), stories_list
+        )
+
+
+    def _replace_stories(self, scope, params, stories_list):
+        """Upsert stories and delete the other stories in scope, in one transaction"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        for story in stories_list:
-            cursor.execute("""
-                INSERT INTO user_stories 
-                (req_id, story_code, title, user_story, priority, story_points, dependencies, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                req_id,
-                story.get('story_code'),
-                story.get('title'),
-                story.get('user_story'),
-                story.get('priority'),
-                story.get('story_points'),
-                story.get('dependencies'),
-                story.get('notes')
-            ))
-        
-        conn.commit()
-        conn.close()
+        try:
+            story_ids = []
+            for story in stories_list:
+                cursor.execute("""
+                    INSERT INTO user_stories 
+                    (req_id, story_code, title, user_story, priority, story_points, dependencies, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (req_id, story_code) DO UPDATE SET
+                        title = excluded.title,
+                        user_story = excluded.user_story,
+                        priority = excluded.priority,
+                        story_points = excluded.story_points,
+                        dependencies = excluded.dependencies,
+                        notes = excluded.notes
+                """, (
+                    story.req_id,
+                    story.story_code,
+                    story.title,
+                    story.user_story,
+                    story.priority,
+                    story.story_points,
+                    story.dependencies,
+                    story.notes
+                ))
+                
+                if story.story_code is None:
+                    story_ids.append(cursor.lastrowid)
+                else:
+                    cursor.execute(
+                        "SELECT story_id FROM user_stories WHERE req_id = ? AND story_code = ?",
+                        (story.req_id, story.story_code)
+                    )
+                    story_ids.append(cursor.fetchone()[0])
+
+            self._delete_stories(
+                cursor,
+                f"{scope} AND story_id NOT IN ({','.join('?' * len(story_ids))})",
+                (*params, *story_ids)
+            )
+            
+            conn.commit()
+            return story_ids
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
     
     
     def get_user_stories(self, req_id=None):
-        """Get user stories (all or for specific requirement)"""
+        """Get user stories (all or for specific requirement) as UserStory models"""
         conn = self._get_connection()
+        conn.row_factory = UserStory.row_factory
         cursor = conn.cursor()
         
         if req_id:
             cursor.execute("""
-                SELECT * FROM user_stories WHERE req_id = ?
+                SELECT story_id, req_id, story_code, title, user_story, priority, story_points, dependencies, notes
+                FROM user_stories WHERE req_id = ?
                 ORDER BY story_code
             """, (req_id,))
         else:
-            cursor.execute("SELECT * FROM user_stories ORDER BY story_code")
+            cursor.execute("""
+                SELECT story_id, req_id, story_code, title, user_story, priority, story_points, dependencies, notes
+                FROM user_stories ORDER BY story_code
+            """)
         
         stories = cursor.fetchall()
         conn.close()
         
         return stories
+
+
+    def get_user_story(self, story_id):
+        """Get a single user story (UserStory or None)"""
+        conn = self._get_connection()
+        conn.row_factory = UserStory.row_factory
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT story_id, req_id, story_code, title, user_story, priority, story_points, dependencies, notes
+            FROM user_stories WHERE story_id = ?
+        """, (story_id,))
+
+        story = cursor.fetchone()
+        conn.close()
+
+        return story
     
     
     # ========================================
@@ -319,39 +947,61 @@ class Database:
     
     def save_acceptance_criteria(self, story_id, criteria_list):
         """
-        Save acceptance criteria
+        Save acceptance criteria as the story's full scenario set
         
         Args:
             story_id: ID of the user story
-            criteria_list: List of dicts with scenario details
+            criteria_list: List of Scenario models
+        
+        A scenario_name already saved for this story is updated in place;
+        the story's other scenarios are deleted in the same transaction.
+        Repeated names within the list are numbered (see _scenario_names).
         """
+        names = self._scenario_names(criteria_list)
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        for criteria in criteria_list:
-            cursor.execute("""
-                INSERT INTO acceptance_criteria 
-                (story_id, scenario_name, given_clause, when_clause, then_clause)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                story_id,
-                criteria.get('scenario_name'),
-                criteria.get('given'),
-                criteria.get('when'),
-                criteria.get('then')
-            ))
-        
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute(f"""
+                DELETE FROM acceptance_criteria
+                WHERE story_id = ? AND (scenario_name IS NULL OR scenario_name NOT IN ({','.join('?' * len(names))}))
+            """, (story_id, *names))
+
+            for criteria, name in zip(criteria_list, names):
+                cursor.execute("""
+                    INSERT INTO acceptance_criteria 
+                    (story_id, scenario_name, given_clause, when_clause, then_clause)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (story_id, scenario_name) DO UPDATE SET
+                        given_clause = excluded.given_clause,
+                        when_clause = excluded.when_clause,
+                        then_clause = excluded.then_clause
+                """, (
+                    story_id,
+                    name,
+                    criteria.given,
+                    criteria.when,
+                    criteria.then
+                ))
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
     
     
     def get_acceptance_criteria(self, story_id):
-        """Get acceptance criteria for a user story"""
+        """Get acceptance criteria for a user story as Scenario models"""
         conn = self._get_connection()
+        conn.row_factory = Scenario.row_factory
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT * FROM acceptance_criteria WHERE story_id = ?
+            SELECT criteria_id, story_id, scenario_name, given_clause, when_clause, then_clause
+            FROM acceptance_criteria WHERE story_id = ?
+            ORDER BY criteria_id
         """, (story_id,))
         
         criteria = cursor.fetchall()
@@ -360,35 +1010,212 @@ class Database:
         return criteria
     
     
+    # ========================================
+    # EXPORT OPERATIONS
+    # ========================================
+
+    def _iter_rows(self, sql, params, chunk_size, row_factory=None):
+        """
+        Stream query results in chunks without loading them all
+
+        The connection stays open for the lifetime of the generator and is
+        closed once it is exhausted or discarded.
+        """
+        conn = self._get_connection()
+        conn.row_factory = row_factory
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+
+    def iter_project_stories(self, project_id, chunk_size=500):
+        """
+        Stream all user stories of a project
+
+        Yields:
+            UserStory models with req_code filled in
+        """
+        return self._iter_rows("""
+            SELECT s.story_id, s.req_id, s.story_code, s.title, s.user_story, s.priority,
+                   s.story_points, s.dependencies, s.notes, r.req_code
+            FROM user_stories s
+            JOIN requirements r ON r.req_id = s.req_id
+            JOIN inputs i ON i.input_id = r.input_id
+            WHERE i.project_id = ?
+            ORDER BY s.story_id
+        """, (project_id,), chunk_size, UserStory.row_factory)
+
+
+    def iter_project_criteria(self, project_id, chunk_size=500):
+        """
+        Stream all stories of a project with their acceptance criteria,
+        ordered so each story's scenarios are consecutive
+
+        Yields:
+            (UserStory, Scenario) pairs, with Scenario None for stories
+            without criteria
+        """
+        return self._iter_rows("""
+            SELECT s.story_id, s.req_id, s.story_code, s.title, s.user_story,
+                   c.criteria_id, c.story_id, c.scenario_name, c.given_clause, c.when_clause, c.then_clause
+            FROM user_stories s
+            JOIN requirements r ON r.req_id = s.req_id
+            JOIN inputs i ON i.input_id = r.input_id
+            LEFT JOIN acceptance_criteria c ON c.story_id = s.story_id
+            WHERE i.project_id = ?
+            ORDER BY s.story_id, c.criteria_id
+        """, (project_id,), chunk_size, self._story_scenario_row)
+
+
+    @staticmethod
+    def _story_scenario_row(cursor, row):
+        """Row factory splitting a story/criteria join into models"""
+        scenario = Scenario(*row[5:]) if row[5] is not None else None
+        return UserStory(*row[:5]), scenario
+
+
+    # ========================================
+    # SEARCH OPERATIONS
+    # ========================================
+
+    @staticmethod
+    def _fts_query(text):
+        """
+        Turn free text into a safe FTS5 query
+
+        Every word is quoted (so user input can't break MATCH syntax) and
+        the last word is matched as a prefix for search-as-you-type.
+        """
+        terms = re.findall(r'\w+', text or '')
+        if not terms:
+            return None
+
+        quoted = [f'"{t}"' for t in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+
+    def _search_rows(self, text, kinds, project_id, window):
+        """FTS5 matches per kind, best first: (kind, (rowid, rank, snippet, project_id, input_id, title))"""
+        query = self._fts_query(text)
+        if not query:
+            return []
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        rows = []
+        for kind in kinds:
+            fts_table, join_sql = self.SEARCH_SOURCES[kind]
+            match_sql = f"""
+                SELECT rowid, rank,
+                       snippet({fts_table}, -1, '<mark>', '</mark>', '...', 16) AS snippet
+                FROM {fts_table}
+                WHERE {fts_table} MATCH ?
+                ORDER BY rank
+            """
+            params = [query]
+
+            if project_id is None:
+                # Limit inside the FTS query so the joins only see one page
+                match_sql += " LIMIT ?"
+                params.append(window)
+                sql = join_sql.format(match=match_sql)
+            else:
+                sql = join_sql.format(match=match_sql) + " WHERE i.project_id = ? ORDER BY m.rank LIMIT ?"
+                params.extend([project_id, window])
+
+            cursor.execute(sql, params)
+            rows.extend((kind, row) for row in cursor.fetchall())
+
+        conn.close()
+
+        return rows
+
+
+    # ========================================
+    # VERSION OPERATIONS
+    # ========================================
+
+    def get_projects_version(self):
+        """(version, updated_at) of the project list"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT version, updated_at FROM resource_versions WHERE resource = 'projects'")
+
+        version = cursor.fetchone()
+        conn.close()
+
+        return version
+
+
+    def get_project_version(self, project_id):
+        """(version, updated_at) of a project and everything in it, or None"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT version, updated_at FROM project_stats WHERE project_id = ?", (project_id,))
+
+        version = cursor.fetchone()
+        conn.close()
+
+        return version
+
+
+    def get_input_project_id(self, input_id):
+        """Project an input belongs to, or None"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT project_id FROM inputs WHERE input_id = ?", (input_id,))
+
+        row = cursor.fetchone()
+        conn.close()
+
+        return row[0] if row else None
+
+
     # ========================================
     # UTILITY OPERATIONS
     # ========================================
     
-    def get_project_summary(self, project_id):
-        """Get complete summary of a project"""
+    def _get_stats(self, project_id):
+        """project_stats row of a project, or None"""
         conn = self._get_connection()
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        # Get counts
-        cursor.execute("""
-            SELECT 
-                (SELECT COUNT(*) FROM inputs WHERE project_id = ?) as input_count,
-                (SELECT COUNT(*) FROM requirements WHERE input_id IN 
-                    (SELECT input_id FROM inputs WHERE project_id = ?)) as req_count,
-                (SELECT COUNT(*) FROM user_stories WHERE req_id IN 
-                    (SELECT req_id FROM requirements WHERE input_id IN 
-                        (SELECT input_id FROM inputs WHERE project_id = ?))) as story_count
-        """, (project_id, project_id, project_id))
-        
-        summary = cursor.fetchone()
+        cursor.execute("SELECT * FROM project_stats WHERE project_id = ?", (project_id,))
+        
+        stats = cursor.fetchone()
         conn.close()
         
-        return {
-            'inputs': summary[0],
-            'requirements': summary[1],
-            'user_stories': summary[2]
-        }
+        return stats
+
+
+def create_database(url=None):
+    """
+    Storage backend selected by DATABASE_URL
+
+    postgres:// and postgresql:// URLs use PostgresDatabase; anything else
+    (including an empty URL) uses SQLite at DATABASE_PATH.
+    """
+    url = APIConfig.DATABASE_URL if url is None else url
+    if url.startswith(('postgres://', 'postgresql://')):
+        from backend.core.postgres import PostgresDatabase
+        return PostgresDatabase(url)
+    if url.startswith('sqlite:///'):
+        return Database(url[len('sqlite:///'):])
+    return Database(APIConfig.DATABASE_PATH)
 
 
 # Initialize database instance
-db = Database()
\ No newline at end of file
+db = create_database()
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Managed Executors
+=================
+Bounded worker pools that keep blocking and CPU-bound work off the
+event loop:
+
+- documents: process pool for PDF/DOCX parsing (true parallelism, so a
+             large PDF can't stall other requests)
+- parsing:   thread pool for short CPU-bound steps awaited on the event
+             loop (e.g. encoding live audio windows); model output is
+             parsed inline on the worker thread that received it
+- blocking:  thread pool for Gemini calls and SQLite writes
+- fanout:    thread pool for the concurrent per-group Gemini calls a
+             single request fans out into (kept apart from blocking so
+             a request waiting on its groups never starves them)
+
+Each pool tracks queue depth. When the queue is full, new async
+submissions are rejected with ExecutorSaturated, which the API turns
+into 503 + Retry-After. Utilization metrics are reported per pool and
+all pools are shut down gracefully with the app.
+"""
+
+import asyncio
+import contextvars
+import functools
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from backend.core.config import APIConfig
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a pool's queue is full"""
+
+    def __init__(self, pool_name, retry_after):
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+        super().__init__(f"Server busy ({pool_name} pool saturated). Retry in {retry_after}s.")
+
+
+class ManagedPool:
+    """A lazily created executor with queue-depth accounting"""
+
+    def __init__(self, name, kind, max_workers, max_queue):
+        """
+        Args:
+            name: Pool name used in metrics and errors
+            kind: "process" or "thread"
+            max_workers: Worker count
+            max_queue: Tasks allowed to wait beyond the busy workers
+        """
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.avg_latency_seconds = 0.0
+
+
+    def _get_executor(self):
+        """Create the executor on first use"""
+        if self._executor is None:
+            if self.kind == 'process':
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                except (OSError, NotImplementedError) as e:
+                    # e.g. serverless runtimes without /dev/shm
+                    print(f"Process pool unavailable ({str(e)}), using threads for {self.name}")
+                    self.kind = 'thread'
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"{self.name}-worker"
+                )
+
+        return self._executor
+
+
+    def submit(self, func, *args, reject=True):
+        """
+        Submit work and return a concurrent.futures.Future
+
+        Args:
+            func: Callable (must be picklable for process pools)
+            *args: Arguments for func
+            reject: Raise ExecutorSaturated instead of queueing when full
+        """
+        with self._lock:
+            if reject and self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(self.name, self.retry_after())
+            self.pending += 1
+
+        started = time.monotonic()
+        executor = self._get_executor()
+        if self.kind == 'thread':
+            # Carry the caller's context (e.g. the active trace span) into the worker
+            func = functools.partial(contextvars.copy_context().run, func)
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+
+        def done(f):
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.pending -= 1
+                if f.cancelled() or f.exception() is not None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                # Exponential moving average of queue wait + run time
+                self.avg_latency_seconds = elapsed if not self.avg_latency_seconds else (
+                    0.8 * self.avg_latency_seconds + 0.2 * elapsed
+                )
+
+        future.add_done_callback(done)
+        return future
+
+
+    def retry_after(self):
+        """Seconds until the current backlog has likely drained"""
+        # A full queue drains in about one end-to-end latency
+        return max(1, math.ceil(self.avg_latency_seconds or 1.0))
+
+
+    def metrics(self):
+        """Current utilization snapshot"""
+        with self._lock:
+            busy = min(self.pending, self.max_workers)
+            return {
+                'kind': self.kind,
+                'workers': self.max_workers,
+                'busy': busy,
+                'queued': max(0, self.pending - self.max_workers),
+                'max_queue': self.max_queue,
+                'utilization': round(busy / self.max_workers, 2),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_latency_seconds': round(self.avg_latency_seconds, 3)
+            }
+
+
+    def shutdown(self, wait=True):
+        """Stop accepting work and release workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+
+class ExecutorManager:
+    """Registry of the application's worker pools"""
+
+    def __init__(self):
+        """Initialize pools from config (executors start lazily)"""
+        process_workers = APIConfig.DOCUMENT_PARSE_WORKERS
+        self.pools = {
+            'documents': ManagedPool(
+                'documents',
+                'process' if process_workers > 0 else 'thread',
+                process_workers or 2,
+                APIConfig.DOCUMENT_PARSE_MAX_QUEUE
+            ),
+            'parsing': ManagedPool('parsing', 'thread', APIConfig.PARSING_THREADS, APIConfig.PARSING_MAX_QUEUE),
+            'blocking': ManagedPool('blocking', 'thread', APIConfig.BLOCKING_THREADS, APIConfig.BLOCKING_MAX_QUEUE),
+            'fanout': ManagedPool('fanout', 'thread', APIConfig.FANOUT_THREADS, APIConfig.FANOUT_MAX_QUEUE),
+        }
+
+
+    async def run(self, pool_name, func, *args, reject=True):
+        """
+        Run func in a pool and await the result
+
+        Raises:
+            ExecutorSaturated: If the pool's queue is full (and reject is set)
+        """
+        future = self.pools[pool_name].submit(func, *args, reject=reject)
+        return await asyncio.wrap_future(future)
+
+
+    def run_sync(self, pool_name, func, *args):
+        """
+        Run func in a pool from synchronous code and wait for the result
+
+        Never rejects: callers are already running on a worker and have
+        nowhere to surface a 503, so they queue instead.
+        """
+        return self.pools[pool_name].submit(func, *args, reject=False).result()
+
+
+    def map_sync(self, pool_name, func, items):
+        """
+        Run func(item) for every item concurrently in a pool and wait for all
+
+        Never rejects (see run_sync). Results keep the order of items; the
+        first exception is raised once every call has finished.
+        """
+        futures = [self.pools[pool_name].submit(func, item, reject=False) for item in items]
+        wait(futures)
+        return [future.result() for future in futures]
+
+
+    def metrics(self):
+        """Utilization metrics for every pool"""
+        return {name: pool.metrics() for name, pool in self.pools.items()}
+
+
+    def shutdown(self, wait=True):
+        """Shut down all pools"""
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
+
+
+# Initialize executor manager instance
+executors = ExecutorManager()
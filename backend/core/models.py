@@ -0,0 +1,105 @@
+"""
+Domain Models
+=============
+Slotted dataclasses for the objects passed between parsers, routes and
+the database.
+
+Field order mirrors the table columns, so SQLite rows map positionally
+through each model's row_factory without building intermediate dicts or
+tuples. Parsers create models by keyword and leave the ids unset until
+the rows are saved.
+
+Models serialize directly: FastAPI/Pydantic and orjson both encode
+dataclasses natively, and to_dict() picks a subset of fields for
+responses that expose only some of them.
+"""
+
+from dataclasses import dataclass
+
+
+class _Model:
+    """Row mapping and dict conversion shared by all models"""
+
+    __slots__ = ()
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """
+        sqlite3 row factory building the model from a row
+
+        The query must select the model's columns in field order; columns
+        left out at the end keep their defaults.
+        """
+        return cls(*row)
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a model from a dict, ignoring unknown keys (e.g. client payloads)"""
+        return cls(**{k: v for k, v in data.items() if k in cls.__slots__})
+
+
+    def to_dict(self, *names):
+        """
+        Convert to a plain dict
+
+        Args:
+            *names: Fields to include (all fields if omitted)
+        """
+        return {name: getattr(self, name) for name in names or self.__slots__}
+
+
+@dataclass(slots=True)
+class Project(_Model):
+    project_id: int = None
+    project_name: str = ''
+    project_type: str = 'General'
+    industry: str = 'General'
+    description: str = ''
+    created_at: str = None
+    updated_at: str = None
+
+
+@dataclass(slots=True)
+class Input(_Model):
+    input_id: int = None
+    project_id: int = None
+    input_type: str = ''
+    raw_text: str = ''
+    file_name: str = None
+    created_at: str = None
+
+
+@dataclass(slots=True)
+class Requirement(_Model):
+    req_id: int = None
+    input_id: int = None
+    req_code: str = ''
+    req_type: str = 'Functional'
+    description: str = ''
+
+
+@dataclass(slots=True)
+class UserStory(_Model):
+    story_id: int = None
+    req_id: int = None
+    story_code: str = ''
+    title: str = ''
+    user_story: str = ''
+    priority: str = 'Medium'
+    story_points: int = 0
+    dependencies: str = 'None'
+    notes: str = ''
+    # Code of the source requirement (joined in, not a user_stories column)
+    req_code: str = ''
+
+
+@dataclass(slots=True)
+class Scenario(_Model):
+    """One Given-When-Then acceptance criterion"""
+    criteria_id: int = None
+    story_id: int = None
+    scenario_name: str = ''
+    given: str = ''
+    when: str = ''
+    then: str = ''
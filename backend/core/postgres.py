@@ -0,0 +1,776 @@
+"""
+PostgreSQL Storage Backend
+==========================
+Database implementation on PostgreSQL, selected when DATABASE_URL is a
+postgres:// or postgresql:// URL. Every API instance shares one database,
+which the local SQLite file can't do on ephemeral Vercel/Render disks.
+
+The method surface matches the SQLite Database, and so does the schema
+behaviour:
+- upserts on the same unique keys
+- project_stats counters and version bumps kept by PL/pgSQL triggers,
+  so concurrent writers from several instances serialize on the row lock
+  instead of losing updates
+- full-text search over GIN expression indexes (ts_rank_cd, ts_headline)
+
+Connections come from a psycopg_pool.ConnectionPool. Callers already run
+storage calls on worker threads (the executors' blocking pool), so the
+pool is synchronous and each call borrows one connection for one
+transaction. Exports page through their rows with one short query per
+chunk rather than holding a connection while the client downloads.
+"""
+
+import re
+import tempfile
+from pathlib import Path
+
+from backend.core.config import APIConfig
+from backend.core.database import StorageBackend, FTS_TABLES, STATS_SOURCES
+from backend.core.models import Project, Input, Requirement, UserStory, Scenario
+from backend.core.tracing import trace_methods
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+
+# Held while creating the schema so instances starting together don't race
+SCHEMA_LOCK_ID = 4242001
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=1, MaxWords=16, MinWords=4, FragmentDelimiter=..."
+
+STORY_COLUMNS = "story_id, req_id, story_code, title, user_story, priority, story_points, dependencies, notes"
+
+
+def _model_rows(model):
+    """psycopg row factory building model instances positionally"""
+    def factory(cursor):
+        return lambda values: model(*values)
+    return factory
+
+
+def _story_scenario_rows(cursor):
+    """psycopg row factory splitting a story/criteria join into models"""
+    def make_row(values):
+        scenario = Scenario(*values[5:]) if values[5] is not None else None
+        return UserStory(*values[:5]), scenario
+    return make_row
+
+
+def _fts_document(columns, alias=''):
+    """tsvector expression indexed, and matched, for full-text search"""
+    prefix = f"{alias}." if alias else ''
+    text = " || ' ' || ".join(f"coalesce({prefix}{c}, '')" for c in columns)
+    return f"to_tsvector('english', {text})"
+
+
+@trace_methods('db')
+class PostgresDatabase(StorageBackend):
+    """PostgreSQL database manager for BA Copilot"""
+
+    def __init__(self, url):
+        """
+        Open the connection pool and create the schema if needed
+
+        Args:
+            url: postgresql:// connection URL
+        """
+        if ConnectionPool is None:
+            raise Exception("PostgreSQL storage requires psycopg. Install it with: pip install 'psycopg[binary,pool]'")
+
+        self.pool = ConnectionPool(
+            url,
+            min_size=APIConfig.DATABASE_POOL_MIN_SIZE,
+            max_size=APIConfig.DATABASE_POOL_MAX_SIZE,
+            open=True
+        )
+
+        self.state_dir = Path(APIConfig.LOCAL_STATE_DIR or Path(tempfile.gettempdir()) / 'ba_copilot')
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+        self._initialize_tables()
+
+
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close()
+
+
+    def _initialize_tables(self):
+        """Create all tables, indexes and triggers if they don't exist"""
+        with self.pool.connection() as conn:
+            conn.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS projects (
+                    project_id BIGSERIAL PRIMARY KEY,
+                    project_name TEXT NOT NULL,
+                    project_type TEXT,
+                    industry TEXT,
+                    description TEXT,
+                    created_at TIMESTAMPTZ DEFAULT now(),
+                    updated_at TIMESTAMPTZ DEFAULT now()
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS inputs (
+                    input_id BIGSERIAL PRIMARY KEY,
+                    project_id BIGINT REFERENCES projects(project_id),
+                    input_type TEXT,
+                    raw_text TEXT,
+                    file_name TEXT,
+                    created_at TIMESTAMPTZ DEFAULT now()
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS requirements (
+                    req_id BIGSERIAL PRIMARY KEY,
+                    input_id BIGINT REFERENCES inputs(input_id),
+                    req_code TEXT,
+                    req_type TEXT,
+                    description TEXT,
+                    created_at TIMESTAMPTZ DEFAULT now()
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_stories (
+                    story_id BIGSERIAL PRIMARY KEY,
+                    req_id BIGINT REFERENCES requirements(req_id),
+                    story_code TEXT,
+                    title TEXT,
+                    user_story TEXT,
+                    priority TEXT,
+                    story_points INTEGER,
+                    dependencies TEXT,
+                    notes TEXT,
+                    created_at TIMESTAMPTZ DEFAULT now()
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS acceptance_criteria (
+                    criteria_id BIGSERIAL PRIMARY KEY,
+                    story_id BIGINT REFERENCES user_stories(story_id),
+                    scenario_name TEXT,
+                    given_clause TEXT,
+                    when_clause TEXT,
+                    then_clause TEXT,
+                    created_at TIMESTAMPTZ DEFAULT now()
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS feedback (
+                    feedback_id BIGSERIAL PRIMARY KEY,
+                    item_id BIGINT,
+                    item_type TEXT,
+                    rating INTEGER,
+                    comments TEXT,
+                    created_at TIMESTAMPTZ DEFAULT now()
+                )
+            """)
+
+            # Same upsert keys as SQLite
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_requirements_input_code ON requirements (input_id, req_code)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_stories_req_code ON user_stories (req_id, story_code)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_criteria_story_scenario ON acceptance_criteria (story_id, scenario_name)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_inputs_project ON inputs (project_id)")
+
+            for fts_table, (table, rowid, columns) in FTS_TABLES.items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {fts_table}_idx ON {table} USING GIN ({_fts_document(columns)})")
+
+            self._initialize_stats(conn)
+            self._initialize_versions(conn)
+
+
+    @staticmethod
+    def _create_trigger(conn, name, table, events, function, level='ROW'):
+        """(Re)create a trigger calling a PL/pgSQL function"""
+        conn.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        conn.execute(f"""
+            CREATE TRIGGER {name} AFTER {events} ON {table}
+            FOR EACH {level} EXECUTE FUNCTION {function}()
+        """)
+
+
+    def _initialize_stats(self, conn):
+        """
+        Create project_stats with trigger-maintained counters (see
+        Database._initialize_stats), backfilled when first created
+        """
+        exists = conn.execute("SELECT to_regclass('project_stats') IS NOT NULL").fetchone()[0]
+
+        columns = [c for _, values in STATS_SOURCES.values() for c in values]
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS project_stats (
+                project_id BIGINT PRIMARY KEY,
+                {', '.join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in columns)},
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ DEFAULT now()
+            )
+        """)
+
+        # A project's own row edits bump its version as well
+        conn.execute("""
+            CREATE OR REPLACE FUNCTION project_stats_projects() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO project_stats (project_id) VALUES (new.project_id) ON CONFLICT DO NOTHING;
+                ELSIF TG_OP = 'UPDATE' THEN
+                    UPDATE project_stats SET version = version + 1, updated_at = now()
+                    WHERE project_id = new.project_id;
+                ELSE
+                    DELETE FROM project_stats WHERE project_id = old.project_id;
+                END IF;
+                RETURN NULL;
+            END $$
+        """)
+        self._create_trigger(conn, 'project_stats_projects', 'projects',
+                             'INSERT OR UPDATE OR DELETE', 'project_stats_projects')
+
+        for table, (project, values) in STATS_SOURCES.items():
+            def adjust(row, sign):
+                assignments = ', '.join(f"{c} = {c} {sign} {v.format(row=row)}" for c, v in values.items())
+                return f"""
+                    UPDATE project_stats
+                    SET {assignments}, version = version + 1, updated_at = now()
+                    WHERE project_id = {project.format(row=row)};
+                """
+
+            conn.execute(f"""
+                CREATE OR REPLACE FUNCTION project_stats_{table}() RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        {adjust('old', '-')}
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        INSERT INTO project_stats (project_id)
+                        SELECT p.project_id FROM (SELECT {project.format(row='new')} AS project_id) p
+                        WHERE p.project_id IS NOT NULL
+                        ON CONFLICT DO NOTHING;
+                        {adjust('new', '+')}
+                    END IF;
+                    RETURN NULL;
+                END $$
+            """)
+            self._create_trigger(conn, f'project_stats_{table}', table,
+                                 'INSERT OR UPDATE OR DELETE', f'project_stats_{table}')
+
+        if not exists:
+            conn.execute("INSERT INTO project_stats (project_id) SELECT project_id FROM projects ON CONFLICT DO NOTHING")
+            for table, (project, values) in STATS_SOURCES.items():
+                sums = ', '.join(f"SUM({v.format(row='t')}) AS {c}" for c, v in values.items())
+                assignments = ', '.join(f"{c} = s.{c}" for c in values)
+                conn.execute(f"""
+                    UPDATE project_stats ps SET {assignments}
+                    FROM (SELECT {project.format(row='t')} AS pid, {sums} FROM {table} t GROUP BY 1) s
+                    WHERE ps.project_id = s.pid
+                """)
+
+
+    def _initialize_versions(self, conn):
+        """Collection-level version counters for HTTP caching (see Database._initialize_versions)"""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS resource_versions (
+                resource TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ DEFAULT now()
+            )
+        """)
+        conn.execute("INSERT INTO resource_versions (resource) VALUES ('projects') ON CONFLICT DO NOTHING")
+
+        conn.execute("""
+            CREATE OR REPLACE FUNCTION resource_versions_projects() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                UPDATE resource_versions
+                SET version = version + 1, updated_at = now()
+                WHERE resource = 'projects';
+                RETURN NULL;
+            END $$
+        """)
+        self._create_trigger(conn, 'resource_versions_projects', 'projects',
+                             'INSERT OR UPDATE OR DELETE', 'resource_versions_projects', level='STATEMENT')
+
+
+    # ========================================
+    # PROJECT OPERATIONS
+    # ========================================
+
+    def create_project(self, name, project_type="General", industry="General", description=""):
+        """Create a new project"""
+        with self.pool.connection() as conn:
+            return conn.execute("""
+                INSERT INTO projects (project_name, project_type, industry, description)
+                VALUES (%s, %s, %s, %s)
+                RETURNING project_id
+            """, (name, project_type, industry, description)).fetchone()[0]
+
+
+    def get_all_projects(self):
+        """Retrieve all projects as Project models"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(Project))
+            return cursor.execute("""
+                SELECT project_id, project_name, project_type, industry, description, created_at, updated_at
+                FROM projects
+                ORDER BY created_at DESC
+            """).fetchall()
+
+
+    def get_project(self, project_id):
+        """Get specific project details (Project or None)"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(Project))
+            return cursor.execute("""
+                SELECT project_id, project_name, project_type, industry, description, created_at, updated_at
+                FROM projects WHERE project_id = %s
+            """, (project_id,)).fetchone()
+
+
+    def delete_project(self, project_id):
+        """Delete a project and all related data"""
+        with self.pool.connection() as conn:
+            # Delete in reverse order of dependencies
+            conn.execute("""
+                DELETE FROM acceptance_criteria WHERE story_id IN (
+                    SELECT s.story_id FROM user_stories s
+                    JOIN requirements r ON r.req_id = s.req_id
+                    JOIN inputs i ON i.input_id = r.input_id
+                    WHERE i.project_id = %s)
+            """, (project_id,))
+            conn.execute("""
+                DELETE FROM user_stories WHERE req_id IN (
+                    SELECT r.req_id FROM requirements r
+                    JOIN inputs i ON i.input_id = r.input_id
+                    WHERE i.project_id = %s)
+            """, (project_id,))
+            conn.execute("DELETE FROM requirements WHERE input_id IN (SELECT input_id FROM inputs WHERE project_id = %s)", (project_id,))
+            conn.execute("DELETE FROM inputs WHERE project_id = %s", (project_id,))
+            conn.execute("DELETE FROM projects WHERE project_id = %s", (project_id,))
+
+
+    # ========================================
+    # INPUT OPERATIONS
+    # ========================================
+
+    def save_input(self, project_id, input_type, raw_text, file_name=None):
+        """Save raw input (transcript or document)"""
+        with self.pool.connection() as conn:
+            return conn.execute("""
+                INSERT INTO inputs (project_id, input_type, raw_text, file_name)
+                VALUES (%s, %s, %s, %s)
+                RETURNING input_id
+            """, (project_id, input_type, raw_text, file_name)).fetchone()[0]
+
+
+    def get_input(self, input_id):
+        """Get a single input (Input or None)"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(Input))
+            return cursor.execute("""
+                SELECT input_id, project_id, input_type, raw_text, file_name, created_at
+                FROM inputs WHERE input_id = %s
+            """, (input_id,)).fetchone()
+
+
+    # ========================================
+    # REQUIREMENTS OPERATIONS
+    # ========================================
+
+    def save_requirements(self, input_id, requirements_list, prune=False):
+        """
+        Save extracted requirements, updating rows with the same req_code,
+        deleting the stories of requirements whose text changed and (with
+        prune) the input's other requirements (see Database.save_requirements)
+
+        Returns:
+            List of req_ids in the same order as requirements_list
+        """
+        try:
+            with self.pool.connection() as conn:
+                req_ids = []
+                for req in requirements_list:
+                    req_code = req.req_code or 'UNKNOWN'
+
+                    existing = conn.execute("""
+                        SELECT req_id, description FROM requirements
+                        WHERE input_id = %s AND req_code = %s
+                        FOR UPDATE
+                    """, (input_id, req_code)).fetchone()
+                    if existing and existing[1] != req.description:
+                        self._delete_stories(conn, "req_id = %s", (existing[0],))
+
+                    req_ids.append(conn.execute("""
+                        INSERT INTO requirements (input_id, req_code, req_type, description)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (input_id, req_code) DO UPDATE SET
+                            req_type = excluded.req_type,
+                            description = excluded.description
+                        RETURNING req_id
+                    """, (input_id, req_code, req.req_type, req.description)).fetchone()[0])
+
+                if prune:
+                    stale = "input_id = %s AND req_id <> ALL(%s)"
+                    self._delete_stories(conn, f"req_id IN (SELECT req_id FROM requirements WHERE {stale})",
+                                         (input_id, req_ids))
+                    conn.execute(f"DELETE FROM requirements WHERE {stale}", (input_id, req_ids))
+
+            print(f"Successfully saved {len(requirements_list)} requirements")
+            return req_ids
+        except Exception as e:
+            print(f"Error saving requirements: {str(e)}")
+            raise
+
+
+    @staticmethod
+    def _delete_stories(conn, where, params):
+        """Delete the user stories matching a condition, with their acceptance criteria"""
+        conn.execute(f"""
+            DELETE FROM acceptance_criteria
+            WHERE story_id IN (SELECT story_id FROM user_stories WHERE {where})
+        """, params)
+        conn.execute(f"DELETE FROM user_stories WHERE {where}", params)
+
+
+    def get_requirements(self, input_id):
+        """Get all requirements for an input as Requirement models"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(Requirement))
+            return cursor.execute("""
+                SELECT req_id, input_id, req_code, req_type, description
+                FROM requirements
+                WHERE input_id = %s
+                ORDER BY req_code
+            """, (input_id,)).fetchall()
+
+
+    def get_project_requirements(self, project_id):
+        """Get all requirements across every input of a project as Requirement models"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(Requirement))
+            return cursor.execute("""
+                SELECT r.req_id, r.input_id, r.req_code, r.req_type, r.description
+                FROM requirements r
+                JOIN inputs i ON i.input_id = r.input_id
+                WHERE i.project_id = %s
+                ORDER BY r.input_id, r.req_code
+            """, (project_id,)).fetchall()
+
+
+    def get_requirement_texts(self, req_ids=None, after_id=0):
+        """(req_id, description) pairs for the requirement index, ordered by req_id"""
+        with self.pool.connection() as conn:
+            if req_ids is not None:
+                return conn.execute("""
+                    SELECT req_id, description FROM requirements
+                    WHERE req_id = ANY(%s)
+                    ORDER BY req_id
+                """, (list(req_ids),)).fetchall()
+            return conn.execute("""
+                SELECT req_id, description FROM requirements
+                WHERE req_id > %s
+                ORDER BY req_id
+            """, (after_id,)).fetchall()
+
+
+    def count_requirements(self, max_id):
+        """Number of requirements with req_id <= max_id"""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM requirements WHERE req_id <= %s", (max_id,)).fetchone()[0]
+
+
+    def get_requirement_ids(self, max_id):
+        """req_ids <= max_id"""
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT req_id FROM requirements WHERE req_id <= %s", (max_id,)).fetchall()
+            return [row[0] for row in rows]
+
+
+    # ========================================
+    # USER STORY OPERATIONS
+    # ========================================
+
+    def save_user_stories(self, req_id, stories_list):
+        """
+        Save generated user stories as the requirement's full story set
+        (see Database.save_user_stories)
+
+        Returns:
+            List of story_ids in the same order as stories_list
+        """
+        for story in stories_list:
+            story.req_id = req_id
+        return self._replace_stories("req_id = %s", (req_id,), stories_list)
+
+
+    def save_input_stories(self, input_id, stories_list):
+        """
+        Save the user stories generated for an input as its full story set
+        (see Database.save_input_stories)
+
+        Returns:
+            List of story_ids in the same order as stories_list
+        """
+        return self._replace_stories(
+            "req_id IN (SELECT req_id FROM requirements WHERE input_id = %s)", (input_id,), stories_list
+        )
+
+
+    def _replace_stories(self, scope, params, stories_list):
+        """Upsert stories and delete the other stories in scope, in one transaction"""
+        with self.pool.connection() as conn:
+            story_ids = []
+            for story in stories_list:
+                story_ids.append(conn.execute("""
+                    INSERT INTO user_stories
+                    (req_id, story_code, title, user_story, priority, story_points, dependencies, notes)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (req_id, story_code) DO UPDATE SET
+                        title = excluded.title,
+                        user_story = excluded.user_story,
+                        priority = excluded.priority,
+                        story_points = excluded.story_points,
+                        dependencies = excluded.dependencies,
+                        notes = excluded.notes
+                    RETURNING story_id
+                """, (
+                    story.req_id,
+                    story.story_code,
+                    story.title,
+                    story.user_story,
+                    story.priority,
+                    story.story_points,
+                    story.dependencies,
+                    story.notes
+                )).fetchone()[0])
+
+            self._delete_stories(conn, f"{scope} AND story_id <> ALL(%s)", (*params, story_ids))
+
+            return story_ids
+
+
+    def get_user_stories(self, req_id=None):
+        """Get user stories (all or for specific requirement) as UserStory models"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(UserStory))
+            if req_id:
+                return cursor.execute(f"""
+                    SELECT {STORY_COLUMNS}
+                    FROM user_stories WHERE req_id = %s
+                    ORDER BY story_code
+                """, (req_id,)).fetchall()
+            return cursor.execute(f"""
+                SELECT {STORY_COLUMNS}
+                FROM user_stories ORDER BY story_code
+            """).fetchall()
+
+
+    def get_user_story(self, story_id):
+        """Get a single user story (UserStory or None)"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(UserStory))
+            return cursor.execute(f"""
+                SELECT {STORY_COLUMNS}
+                FROM user_stories WHERE story_id = %s
+            """, (story_id,)).fetchone()
+
+
+    # ========================================
+    # ACCEPTANCE CRITERIA OPERATIONS
+    # ========================================
+
+    def save_acceptance_criteria(self, story_id, criteria_list):
+        """
+        Save acceptance criteria as the story's full scenario set
+        (see Database.save_acceptance_criteria)
+        """
+        names = self._scenario_names(criteria_list)
+        with self.pool.connection() as conn:
+            conn.execute("""
+                DELETE FROM acceptance_criteria
+                WHERE story_id = %s AND (scenario_name IS NULL OR scenario_name <> ALL(%s))
+            """, (story_id, names))
+
+            for criteria, name in zip(criteria_list, names):
+                conn.execute("""
+                    INSERT INTO acceptance_criteria
+                    (story_id, scenario_name, given_clause, when_clause, then_clause)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (story_id, scenario_name) DO UPDATE SET
+                        given_clause = excluded.given_clause,
+                        when_clause = excluded.when_clause,
+                        then_clause = excluded.then_clause
+                """, (
+                    story_id,
+                    name,
+                    criteria.given,
+                    criteria.when,
+                    criteria.then
+                ))
+
+
+    def get_acceptance_criteria(self, story_id):
+        """Get acceptance criteria for a user story as Scenario models"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=_model_rows(Scenario))
+            return cursor.execute("""
+                SELECT criteria_id, story_id, scenario_name, given_clause, when_clause, then_clause
+                FROM acceptance_criteria WHERE story_id = %s
+                ORDER BY criteria_id
+            """, (story_id,)).fetchall()
+
+
+    # ========================================
+    # EXPORT OPERATIONS
+    # ========================================
+
+    def _iter_rows(self, sql, params, chunk_size, row_factory, start, key):
+        """
+        Stream query results in keyset-paginated chunks
+
+        Every chunk is one short query on a pooled connection, so a slow
+        export client never holds a connection (the pool is shared with
+        all API requests). Rows committed while the export runs may or may
+        not be included.
+
+        Args:
+            sql: Query whose last parameters are the key values of the
+                keyset condition (key > previous key), ordered by that key
+            params: Parameters before the key values
+            chunk_size: Rows per query
+            row_factory: psycopg row factory
+            start: Key tuple below every row
+            key: Function giving the key tuple of a produced row
+        """
+        after = start
+        while True:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor(row_factory=row_factory)
+                rows = cursor.execute(
+                    f"{sql} LIMIT %s",
+                    (*params, *after, chunk_size)
+                ).fetchall()
+
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            after = key(rows[-1])
+
+
+    def iter_project_stories(self, project_id, chunk_size=500):
+        """Stream all user stories of a project as UserStory models with req_code"""
+        return self._iter_rows("""
+            SELECT s.story_id, s.req_id, s.story_code, s.title, s.user_story, s.priority,
+                   s.story_points, s.dependencies, s.notes, r.req_code
+            FROM user_stories s
+            JOIN requirements r ON r.req_id = s.req_id
+            JOIN inputs i ON i.input_id = r.input_id
+            WHERE i.project_id = %s AND s.story_id > %s
+            ORDER BY s.story_id
+        """, (project_id,), chunk_size, _model_rows(UserStory),
+            start=(0,), key=lambda story: (story.story_id,))
+
+
+    def iter_project_criteria(self, project_id, chunk_size=500):
+        """Stream (UserStory, Scenario or None) pairs, each story's scenarios consecutive"""
+        return self._iter_rows("""
+            SELECT s.story_id, s.req_id, s.story_code, s.title, s.user_story,
+                   c.criteria_id, c.story_id, c.scenario_name, c.given_clause, c.when_clause, c.then_clause
+            FROM user_stories s
+            JOIN requirements r ON r.req_id = s.req_id
+            JOIN inputs i ON i.input_id = r.input_id
+            LEFT JOIN acceptance_criteria c ON c.story_id = s.story_id
+            WHERE i.project_id = %s AND (s.story_id, COALESCE(c.criteria_id, 0)) > (%s, %s)
+            ORDER BY s.story_id, COALESCE(c.criteria_id, 0)
+        """, (project_id,), chunk_size, _story_scenario_rows,
+            start=(0, 0), key=lambda pair: (pair[0].story_id, pair[1].criteria_id if pair[1] else 0))
+
+
+    # ========================================
+    # SEARCH OPERATIONS
+    # ========================================
+
+    @staticmethod
+    def _tsquery(text):
+        """
+        Turn free text into a to_tsquery expression
+
+        Only word characters pass through, so user input can't break the
+        query syntax; the last word is matched as a prefix.
+        """
+        terms = re.findall(r'[^\W_]+', text or '')
+        if not terms:
+            return None
+        return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+    def _search_rows(self, text, kinds, project_id, window):
+        """Full-text matches per kind, ranked ascending like FTS5 bm25"""
+        query = self._tsquery(text)
+        if not query:
+            return []
+
+        rows = []
+        with self.pool.connection() as conn:
+            for kind in kinds:
+                fts_table, join_sql = self.SEARCH_SOURCES[kind]
+                table, rowid, columns = FTS_TABLES[fts_table]
+                text_sql = " || ' ' || ".join(f"coalesce(t.{c}, '')" for c in columns)
+
+                match_sql = f"""
+                    SELECT t.{rowid} AS rowid,
+                           -ts_rank_cd({_fts_document(columns, 't')}, q) AS rank,
+                           ts_headline('english', {text_sql}, q, '{HEADLINE_OPTIONS}') AS snippet
+                    FROM {table} t, to_tsquery('english', %s) q
+                    WHERE {_fts_document(columns, 't')} @@ q
+                    ORDER BY rank
+                """
+                params = [query]
+
+                if project_id is None:
+                    match_sql += " LIMIT %s"
+                    params.append(window)
+                    sql = join_sql.format(match=match_sql)
+                else:
+                    sql = join_sql.format(match=match_sql) + " WHERE i.project_id = %s ORDER BY m.rank LIMIT %s"
+                    params.extend([project_id, window])
+
+                rows.extend((kind, row) for row in conn.execute(sql, params).fetchall())
+
+        return rows
+
+
+    # ========================================
+    # VERSION OPERATIONS
+    # ========================================
+
+    def get_projects_version(self):
+        """(version, updated_at) of the project list"""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT version, updated_at FROM resource_versions WHERE resource = 'projects'").fetchone()
+
+
+    def get_project_version(self, project_id):
+        """(version, updated_at) of a project and everything in it, or None"""
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT version, updated_at FROM project_stats WHERE project_id = %s", (project_id,)
+            ).fetchone()
+
+
+    def get_input_project_id(self, input_id):
+        """Project an input belongs to, or None"""
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT project_id FROM inputs WHERE input_id = %s", (input_id,)).fetchone()
+            return row[0] if row else None
+
+
+    # ========================================
+    # UTILITY OPERATIONS
+    # ========================================
+
+    def _get_stats(self, project_id):
+        """project_stats row of a project, or None"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            return cursor.execute("SELECT * FROM project_stats WHERE project_id = %s", (project_id,)).fetchone()
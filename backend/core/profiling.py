@@ -0,0 +1,402 @@
+"""
+Request Profiling
+=================
+Opt-in sampling profiler for requests that are slow in production.
+
+A background thread samples the Python stack of every thread
+(sys._current_frames) at a fixed interval into a ring buffer. When a
+request finishes, the samples taken during it are written out as a
+speedscope profile if:
+
+- it took at least the slow-request threshold (PROFILE_SLOW_REQUEST_SECONDS,
+  adjustable at runtime through /api/admin/profiling), or
+- it was sent with an `X-Profile: <PROFILING_ADMIN_TOKEN>` header; the
+  response then carries `X-Profile-Id`
+
+All threads are sampled because the work of a request runs on executor
+threads (blocking-worker, fanout-worker, parsing-worker), not on the
+event loop; each thread becomes its own profile in the file. Under
+concurrent load the window also shows other requests' threads.
+
+The sampler only runs while slow-request capture is on or a profiled
+request is in flight; otherwise nothing is sampled. Profiles are kept in
+PROFILE_DIR (newest PROFILE_MAX_FILES) and can be downloaded as
+speedscope JSON or collapsed stacks for flamegraph.pl.
+"""
+
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from backend.core.config import APIConfig
+from backend.core.executors import executors
+
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+PROFILE_SUFFIX = ".speedscope.json"
+META_SUFFIX = ".meta.json"
+
+# Leaf frames of threads that are parked, not working
+IDLE_LEAVES = {
+    ('thread.py', '_worker'),       # idle ThreadPoolExecutor worker
+    ('selectors.py', 'select'),     # event loop waiting for I/O
+}
+
+
+class SamplingProfiler:
+    """Process-wide stack sampler with a time-bounded ring buffer"""
+
+    def __init__(self, interval_ms=None, buffer_seconds=None):
+        """
+        Args:
+            interval_ms: Milliseconds between samples
+            buffer_seconds: How far back samples are kept (bounds the
+                            longest request that can be profiled)
+        """
+        self.buffer_seconds = buffer_seconds or APIConfig.PROFILE_BUFFER_SECONDS
+        self.interval = (interval_ms or APIConfig.PROFILE_SAMPLE_INTERVAL_MS) / 1000
+
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=self._buffer_length())
+        self._code_index = {}    # code object -> frame index
+        self.frames = []         # frame index -> (name, file, line)
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._users = 0          # profiled requests in flight
+        self._continuous = False
+
+
+    def _buffer_length(self):
+        return max(1, int(self.buffer_seconds / self.interval))
+
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+
+    def set_interval(self, interval_ms):
+        """Change the sampling interval (drops buffered samples)"""
+        with self._lock:
+            self.interval = interval_ms / 1000
+            self._samples = deque(maxlen=self._buffer_length())
+
+
+    def set_continuous(self, continuous):
+        """Keep sampling all the time (needed for slow-request capture)"""
+        with self._lock:
+            self._continuous = continuous
+            self._update()
+
+
+    def acquire(self):
+        """Start sampling for a profiled request"""
+        with self._lock:
+            self._users += 1
+            self._update()
+
+
+    def release(self):
+        """Stop sampling once no profiled request needs it"""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            self._update()
+
+
+    def _update(self):
+        """Start or stop the sampler thread (caller holds the lock)"""
+        wanted = self._continuous or self._users > 0
+        if wanted and self._thread is None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                            name='profiler-sampler', daemon=True)
+            self._thread.start()
+        elif not wanted and self._thread is not None:
+            self._stop.set()
+            self._thread = None
+
+
+    def _run(self, stop):
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            now = time.monotonic()
+            stacks = {}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stack = self._stack(frame)
+                    if stack:
+                        stacks[ident] = stack
+            with self._lock:
+                self._samples.append((now, stacks))
+
+
+    def _stack(self, frame):
+        """Frame indexes root-first, or None for parked threads"""
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+            return None
+
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            index = self._code_index.get(code)
+            if index is None:
+                index = len(self.frames)
+                self.frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+                self._code_index[code] = index
+            stack.append(index)
+            frame = frame.f_back
+
+        stack.reverse()
+        return tuple(stack)
+
+
+    def samples_between(self, start, end):
+        """Buffered (timestamp, {thread ident: stack}) samples within [start, end]"""
+        with self._lock:
+            return [s for s in self._samples if start <= s[0] <= end]
+
+
+    def to_speedscope(self, samples, name):
+        """
+        Build a speedscope "sampled" profile document, one profile per thread
+
+        Args:
+            samples: From samples_between()
+            name: Document name shown in speedscope
+        """
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        frame_map = {}
+        frames = []
+        per_thread = {}
+
+        previous = None
+        for timestamp, stacks in samples:
+            # Weight by the actual gap: the sampler runs late under GIL contention
+            weight = round(((timestamp - previous) if previous else self.interval) * 1000, 3)
+            previous = timestamp
+            for ident, stack in stacks.items():
+                mapped = []
+                for index in stack:
+                    if index not in frame_map:
+                        frame_map[index] = len(frames)
+                        func, file, line = self.frames[index]
+                        frames.append({'name': func, 'file': file, 'line': line})
+                    mapped.append(frame_map[index])
+                samples_and_weights = per_thread.setdefault(ident, ([], []))
+                samples_and_weights[0].append(mapped)
+                samples_and_weights[1].append(weight)
+
+        profiles = []
+        for ident, (stacks, weights) in sorted(per_thread.items(), key=lambda item: -sum(item[1][1])):
+            profiles.append({
+                'type': 'sampled',
+                'name': thread_names.get(ident, f"thread {ident}"),
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 3),
+                'samples': stacks,
+                'weights': weights,
+            })
+
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': name,
+            'exporter': 'ba-copilot-profiler',
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': profiles,
+        }
+
+
+class ProfileStore:
+    """Speedscope files on disk with a small metadata file each, newest max_files kept"""
+
+    def __init__(self, directory, max_files=None):
+        self.directory = Path(directory)
+        self.max_files = max_files or APIConfig.PROFILE_MAX_FILES
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def new_id(method, path):
+        """Profile id: timestamp, method and path slug plus a random suffix"""
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-')[:60] or 'root'
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        return f"{stamp}_{method}_{slug}_{uuid.uuid4().hex[:6]}"
+
+
+    def save(self, profile_id, document, meta):
+        """Write a profile and its metadata, evicting the oldest beyond max_files"""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{profile_id}{PROFILE_SUFFIX}").write_text(json.dumps(document), encoding='utf-8')
+            (self.directory / f"{profile_id}{META_SUFFIX}").write_text(json.dumps(meta), encoding='utf-8')
+
+            files = sorted(self.directory.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime)
+            for old in files[:max(0, len(files) - self.max_files)]:
+                old.unlink(missing_ok=True)
+                old.with_name(old.name[:-len(PROFILE_SUFFIX)] + META_SUFFIX).unlink(missing_ok=True)
+
+
+    def path(self, profile_id):
+        """Path of a stored profile, or None (ids can't escape the directory)"""
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', profile_id):
+            return None
+        path = self.directory / f"{profile_id}{PROFILE_SUFFIX}"
+        return path if path.exists() else None
+
+
+    def list(self):
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for path in self.directory.glob(f"*{META_SUFFIX}"):
+            try:
+                profiles.append(json.loads(path.read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                continue
+        profiles.sort(key=lambda meta: meta.get('created_at', ''), reverse=True)
+        return profiles
+
+
+    @staticmethod
+    def to_collapsed(document):
+        """Convert a speedscope document to collapsed stacks ("a;b;c count") for flamegraph.pl"""
+        frames = [f"{f['name']} ({os.path.basename(f['file'])}:{f['line']})" for f in document['shared']['frames']]
+        counts = {}
+        for profile in document['profiles']:
+            thread = profile['name'].replace(';', ':')
+            for stack in profile['samples']:
+                key = ';'.join([thread] + [frames[i].replace(';', ':') for i in stack])
+                counts[key] = counts.get(key, 0) + 1
+        return ''.join(f"{stack} {count}\n" for stack, count in counts.items())
+
+
+class RequestProfiler:
+    """Decides which requests are profiled and saves their samples"""
+
+    def __init__(self, store, sampler):
+        self.store = store
+        self.sampler = sampler
+        self.slow_request_seconds = 0
+        self.captured = 0
+        self.set_slow_request_seconds(APIConfig.PROFILE_SLOW_REQUEST_SECONDS)
+
+
+    def set_slow_request_seconds(self, seconds):
+        """Threshold for automatic capture (0 disables it and the continuous sampler)"""
+        self.slow_request_seconds = max(0, seconds or 0)
+        self.sampler.set_continuous(self.slow_request_seconds > 0)
+
+
+    def token_matches(self, token):
+        """Check a client-supplied admin token (never matches when none is configured)"""
+        if not APIConfig.PROFILING_ADMIN_TOKEN or not token:
+            return False
+        # Constant-time comparison, so response timing doesn't leak the token
+        return hmac.compare_digest(token.encode('utf-8'), APIConfig.PROFILING_ADMIN_TOKEN.encode('utf-8'))
+
+
+    def capture(self, profile_id, method, path, start, end, reason):
+        """Save the samples of one request window (runs on a worker thread)"""
+        samples = self.sampler.samples_between(start, end)
+        if not samples:
+            return
+        document = self.sampler.to_speedscope(samples, f"{method} {path} ({end - start:.2f}s)")
+        self.store.save(profile_id, document, {
+            'profile_id': profile_id,
+            'method': method,
+            'path': path,
+            'duration_ms': round((end - start) * 1000),
+            'reason': reason,
+            'samples': len(samples),
+            'threads': len(document['profiles']),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        })
+        self.captured += 1
+        print(f"Saved profile {profile_id} ({len(samples)} samples)")
+
+
+    def status(self):
+        """Settings and counters for the admin endpoint"""
+        return {
+            'slow_request_seconds': self.slow_request_seconds,
+            'sample_interval_ms': round(self.sampler.interval * 1000, 3),
+            'buffer_seconds': self.sampler.buffer_seconds,
+            'sampling': self.sampler.running,
+            'captured': self.captured,
+            'directory': str(self.store.directory),
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware capturing profiles of slow or explicitly flagged requests"""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        flag = headers.get(b'x-profile')
+        requested = flag is not None and self.profiler.token_matches(flag.decode('latin-1'))
+
+        if not requested and self.profiler.slow_request_seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope['method'], scope['path']
+        start = time.monotonic()
+        profile_id = None
+
+        if requested:
+            self.profiler.sampler.acquire()
+            profile_id = self.profiler.store.new_id(method, path)
+
+            async def send_wrapper(message):
+                if message['type'] == 'http.response.start':
+                    message = {**message, 'headers': [*message['headers'], (b'x-profile-id', profile_id.encode())]}
+                await send(message)
+        else:
+            send_wrapper = send
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.monotonic()
+            slow = 0 < self.profiler.slow_request_seconds <= end - start
+            if requested or slow:
+                profile_id = profile_id or self.profiler.store.new_id(method, path)
+                # Serializing the samples can take a moment; keep it off the event loop
+                executors.pools['blocking'].submit(
+                    self.profiler.capture, profile_id, method, path, start, end,
+                    'requested' if requested else 'slow', reject=False
+                )
+            if requested:
+                self.profiler.sampler.release()
+
+
+def _profile_dir():
+    """PROFILE_DIR, or a directory in the database's local state dir"""
+    if APIConfig.PROFILE_DIR:
+        return Path(APIConfig.PROFILE_DIR)
+    from backend.core.database import db
+    return Path(db.state_dir) / 'profiles'
+
+
+# Initialize profiler instance
+request_profiler = RequestProfiler(ProfileStore(_profile_dir()), SamplingProfiler())
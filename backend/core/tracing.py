@@ -0,0 +1,268 @@
+"""
+Tracing
+=======
+OpenTelemetry spans for the stages of a request: upload, document
+parsing, each Gemini call attempt (and retry sleeps), output parsing and
+every storage call.
+
+Exporters work offline:
+- console: spans printed to stdout as they end
+- file:    OTLP/JSON lines (one ExportTraceServiceRequest per line)
+           appended to TRACING_FILE; load them into any OTLP-aware viewer
+
+TRACING_EXPORTER=off (the default) or a missing opentelemetry package
+makes every helper a no-op: decorators return the function unchanged
+and span() yields a stub, so instrumented code costs nothing.
+
+Usage:
+    with span('gemini.generate_content', model=name) as s:
+        response = ...
+        s.set_attribute('response.characters', len(response.text))
+
+    @traced('requirements.parse')
+    def _parse_requirements(self, text): ...
+
+    @trace_methods('db')
+    class Database: ...
+"""
+
+import contextlib
+import functools
+import threading
+
+from backend.core.config import APIConfig
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+    )
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    trace = None
+
+try:
+    from google.protobuf.json_format import MessageToJson
+    from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+except ImportError:
+    encode_spans = None
+
+
+# Storage methods left out of trace_methods; iter_* return lazy iterators,
+# so a span would only time their creation
+UNTRACED_METHODS = ('close',)
+UNTRACED_PREFIXES = ('_', 'iter_')
+
+
+class _NoopSpan:
+    """Stand-in when tracing is disabled"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+if trace is not None:
+    class OTLPFileSpanExporter(SpanExporter):
+        """Append spans to a file as OTLP/JSON lines"""
+
+        def __init__(self, path):
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans):
+            if encode_spans is not None:
+                line = MessageToJson(encode_spans(spans), indent=None)
+                lines = [line.replace('\n', '')]
+            else:
+                # Without the OTLP encoder fall back to the SDK's own JSON
+                lines = [s.to_json(indent=None) for s in spans]
+            try:
+                with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                    for line in lines:
+                        f.write(line + '\n')
+            except OSError as e:
+                print(f"Could not write traces to {self.path}: {str(e)}")
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+
+def _create_tracer():
+    """Tracer for the configured exporter, or None when tracing is off"""
+    exporter_name = APIConfig.TRACING_EXPORTER
+    if exporter_name == 'off':
+        return None
+    if trace is None:
+        print("Tracing requested but opentelemetry-sdk is not installed; tracing disabled")
+        return None
+
+    if exporter_name == 'console':
+        exporter = ConsoleSpanExporter()
+    elif exporter_name == 'file':
+        exporter = OTLPFileSpanExporter(APIConfig.TRACING_FILE)
+    else:
+        print(f"Unknown TRACING_EXPORTER '{exporter_name}'; tracing disabled")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({'service.name': APIConfig.TRACING_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer('ba_copilot')
+
+
+tracer = _create_tracer()
+enabled = tracer is not None
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Run a block inside a span
+
+    Args:
+        name: Span name, "<stage>.<operation>"
+        **attributes: Initial attributes (None values are skipped)
+
+    Yields:
+        The span (or a no-op stub), for attributes known only afterwards
+    """
+    if not enabled:
+        yield _NOOP_SPAN
+        return
+
+    with tracer.start_as_current_span(name, record_exception=False, set_status_on_exception=False) as current:
+        current.set_attributes({k: v for k, v in attributes.items() if v is not None})
+        try:
+            yield current
+        except Exception as e:
+            current.record_exception(e)
+            current.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+
+
+def current_span():
+    """The active span (or a no-op stub) for adding attributes from nested code"""
+    if not enabled:
+        return _NOOP_SPAN
+    return trace.get_current_span()
+
+
+def traced(name, **attributes):
+    """
+    Decorator running each call of a function inside a span
+
+    The span gets an 'input.characters' (or 'input.bytes') attribute from
+    the first str/bytes argument, 'output.characters' for string results
+    and 'output.items' for lists (or result dicts with a total_count).
+    """
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes) as current:
+                data = next((a for a in args if isinstance(a, (str, bytes))), None)
+                if data is not None:
+                    current.set_attribute('input.bytes' if isinstance(data, bytes) else 'input.characters', len(data))
+                result = func(*args, **kwargs)
+                if isinstance(result, list):
+                    current.set_attribute('output.items', len(result))
+                elif isinstance(result, str):
+                    current.set_attribute('output.characters', len(result))
+                elif isinstance(result, dict) and 'total_count' in result:
+                    current.set_attribute('output.items', result['total_count'])
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def trace_methods(prefix):
+    """
+    Class decorator wrapping every public method in a "<prefix>.<method>" span
+
+    save_* methods record 'db.rows_written' (the length of their list
+    argument); other methods returning lists record 'db.rows'.
+    """
+    def decorator(cls):
+        if not enabled:
+            return cls
+
+        for attr in dir(cls):
+            if attr in UNTRACED_METHODS or attr.startswith(UNTRACED_PREFIXES):
+                continue
+            method = getattr(cls, attr)
+            if not callable(method) or isinstance(method, type):
+                continue
+            setattr(cls, attr, _traced_method(f"{prefix}.{attr}", method))
+
+        return cls
+
+    return decorator
+
+
+def _traced_method(name, method):
+    """Wrap one storage method"""
+    writes = method.__name__.startswith('save_')
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with span(name) as current:
+            result = method(*args, **kwargs)
+            if writes and args and isinstance(args[-1], list):
+                current.set_attribute('db.rows_written', len(args[-1]))
+            elif isinstance(result, list):
+                current.set_attribute('db.rows', len(result))
+            return result
+
+    return wrapper
+
+
+class TracingMiddleware:
+    """ASGI middleware opening one root span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if not enabled or scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = {}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        with span(f"{scope['method']} {scope['path']}",
+                  **{'http.method': scope['method'], 'http.target': scope['path']}) as current:
+            await self.app(scope, receive, send_wrapper)
+            if 'code' in status:
+                current.set_attribute('http.status_code', status['code'])
+
+
+def shutdown():
+    """Flush buffered spans (called on app shutdown)"""
+    if enabled:
+        trace.get_tracer_provider().shutdown()
@@ -6,12 +6,54 @@ Uses Gemini 2.0 Flash for audio transcription with proper File API handling
 
 import google.generativeai as genai
 from backend.core.config import APIConfig
+from utils.audio_preprocessing import AudioPreprocessor
 import base64
-import tempfile
-import os
 import time
 from google.api_core import exceptions as google_exceptions
 from google.api_core import retry
+from backend.core.executors import executors, ExecutorSaturated
+from backend.core.circuit_breaker import gemini_breaker, CircuitOpen
+from backend.services.file_processing import file_waiter, ClientDisconnected
+from backend.services.transcript_cache import transcript_cache
+from backend.services.scratch_space import scratch_space
+from backend.services.context_cache import record_response
+from backend.core.tracing import span, traced
+import hashlib
+
+
+MIME_TYPES = {
+    'wav': 'audio/wav',
+    'mp3': 'audio/mp3',
+    'webm': 'audio/webm',
+    'm4a': 'audio/mp4',
+    'ogg': 'audio/ogg',
+    'flac': 'audio/flac'
+}
+
+TRANSCRIPTION_PROMPT = """
+Please transcribe this audio recording into text.
+This is a business meeting or requirements discussion.
+
+Provide a clear, accurate, and complete transcription.
+Include all spoken words and format it as a professional transcript.
+Do not add any commentary or explanation - just the transcription.
+"""
+
+# Part of the transcript cache key, so prompt edits invalidate cached transcripts
+TRANSCRIPTION_PROMPT_VERSION = hashlib.sha256(TRANSCRIPTION_PROMPT.encode('utf-8')).hexdigest()[:12]
+
+# Rate limit retries for upload and generation
+MAX_RETRIES = 3
+RETRY_DELAY = 5
+
+RATE_LIMIT_MESSAGE = (
+    "⚠️ API RATE LIMIT EXCEEDED ⚠️\n\n"
+    "Your Gemini API has reached its quota limit.\n\n"
+    "Solutions:\n"
+    "1. Wait 1-5 minutes and try again (free tier: 15 requests/min)\n"
+    "2. Check your quota at: https://aistudio.google.com/app/apikey\n"
+    "3. Enable billing for higher limits: https://console.cloud.google.com/billing\n\n"
+)
 
 
 class AudioTranscriber:
@@ -39,13 +81,59 @@ class AudioTranscriber:
             traceback.print_exc()
     
     
-    def transcribe_audio(self, audio_data, audio_format="wav"):
+    @staticmethod
+    def prepare_audio(audio_bytes, audio_format):
+        """
+        Shrink audio to AUDIO_CONFIG (16 kHz mono) before upload
+        
+        Args:
+            audio_bytes: Raw audio bytes
+            audio_format: Audio format (wav, mp3, webm, etc.)
+            
+        Returns:
+            (audio_bytes, audio_format, stats)
+        """
+        if not APIConfig.AUDIO_PREPROCESS:
+            return audio_bytes, audio_format, {'original_bytes': len(audio_bytes), 'processed': False}
+        
+        audio_bytes, audio_format, stats = AudioPreprocessor.preprocess(
+            audio_bytes,
+            audio_format,
+            target_rate=APIConfig.AUDIO_CONFIG['sample_rate'],
+            codec=APIConfig.AUDIO_CODEC,
+            threshold_db=APIConfig.AUDIO_SILENCE_THRESHOLD_DB
+        )
+        
+        if stats['processed']:
+            print(f"🎚️ Audio preprocessed: {stats['original_bytes']} -> {stats['processed_bytes']} bytes "
+                  f"({stats['reduction_percent']}% smaller, {stats['source_rate']} Hz x{stats['source_channels']} "
+                  f"-> {stats['sample_rate']} Hz mono, {stats['original_seconds']}s -> {stats['processed_seconds']}s)")
+        
+        return audio_bytes, audio_format, stats
+    
+    
+    @staticmethod
+    def cache_key(audio_bytes):
+        """
+        Transcript cache key for decoded audio bytes
+        
+        Args:
+            audio_bytes: Audio bytes as received (before preprocessing)
+            
+        Returns:
+            Cache key for transcript_cache
+        """
+        return transcript_cache.key(audio_bytes, APIConfig.GEMINI_MODEL, TRANSCRIPTION_PROMPT_VERSION)
+    
+    
+    def transcribe_audio(self, audio_data, audio_format="wav", preprocess=True):
         """
         Transcribe audio to text using Gemini
         
         Args:
             audio_data: Audio data (base64 encoded or bytes)
             audio_format: Audio format (wav, mp3, webm, etc.)
+            preprocess: Run prepare_audio first (skip if the caller already did)
             
         Returns:
             Transcribed text
@@ -56,182 +144,113 @@ class AudioTranscriber:
         temp_path = None
         audio_file = None
         
+        # Decode base64 if needed
+        if isinstance(audio_data, str):
+            audio_data = base64.b64decode(audio_data)
+        
+        # Re-uploaded recordings skip upload and transcription entirely
+        cache_key = self.cache_key(audio_data)
+        transcript = transcript_cache.get(cache_key)
+        if transcript is not None:
+            print(f"⚡ Transcript cache hit: {len(transcript)} characters")
+            return transcript
+        
         try:
-            print(f"🎙️ Transcribing audio using {APIConfig.GEMINI_MODEL}...")
+            audio_bytes, mime_type, temp_path = self._prepare_upload(audio_data, audio_format, preprocess)
             
-            # Decode base64 if needed
-            if isinstance(audio_data, str):
-                audio_bytes = base64.b64decode(audio_data)
-            else:
-                audio_bytes = audio_data
-            
-            print(f"📊 Audio size: {len(audio_bytes)} bytes, format: {audio_format}")
+            # METHOD 1: Try using File API if available
+            try:
+                audio_file = self._upload(temp_path, mime_type)
+                
+                print("⏳ Waiting for audio processing...")
+                audio_file = file_waiter.wait_sync(audio_file)
+                print(f"✅ Audio processing complete. State: {audio_file.state.name}")
+                
+                transcript = self._generate([TRANSCRIPTION_PROMPT, audio_file])
             
-            # Determine MIME type
-            mime_type_map = {
-                'wav': 'audio/wav',
-                'mp3': 'audio/mp3',
-                'webm': 'audio/webm',
-                'm4a': 'audio/mp4',
-                'ogg': 'audio/ogg',
-                'flac': 'audio/flac'
-            }
-            mime_type = mime_type_map.get(audio_format.lower(), 'audio/wav')
+            except CircuitOpen:
+                raise
+            except (AttributeError, Exception) as upload_error:
+                self._check_rate_limit(upload_error)
+                
+                # METHOD 2: Direct inline approach (fallback)
+                print(f"⚠️ File upload not available: {str(upload_error)}")
+                print("🔄 Attempting direct inline transcription...")
+                transcript = self._generate(self._inline_contents(audio_bytes, mime_type), method="inline")
             
-            print(f"🔧 Using MIME type: {mime_type}")
+            transcript_cache.put(cache_key, transcript)
+            return transcript
+        
+        except ExecutorSaturated:
+            raise
+        except Exception as e:
+            print(f"❌ Transcription error: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            raise Exception(f"Audio transcription failed: {str(e)}")
+        
+        finally:
+            self._cleanup(audio_file, temp_path)
+    
+    
+    async def transcribe_audio_async(self, audio_data, audio_format="wav", preprocess=True, is_disconnected=None):
+        """
+        Transcribe audio without holding a worker thread while Gemini processes the file
+        
+        Preparation, upload and generation run on the blocking pool; the processing wait
+        is polled from the event loop and abandoned if the client leaves.
+        
+        Args:
+            audio_data: Audio data (base64 encoded or bytes)
+            audio_format: Audio format (wav, mp3, webm, etc.)
+            preprocess: Run prepare_audio first (skip if the caller already did)
+            is_disconnected: Optional async callable, e.g. Request.is_disconnected
             
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{audio_format}') as temp_file:
-                temp_file.write(audio_bytes)
-                temp_path = temp_file.name
+        Returns:
+            Transcribed text
             
-            print(f"💾 Temporary file created: {temp_path}")
+        Raises:
+            ClientDisconnected: If the client went away during processing
+        """
+        if not self.api_configured:
+            raise Exception("Transcription API not configured. Check GEMINI_API_KEY in environment.")
+        
+        temp_path = None
+        audio_file = None
+        
+        try:
+            # Decoding, preprocessing and the scratch file write block too
+            audio_bytes, mime_type, temp_path = await executors.run(
+                'blocking', self._prepare_upload, audio_data, audio_format, preprocess
+            )
             
             # METHOD 1: Try using File API if available
             try:
-                print("📤 Uploading audio to Gemini...")
+                audio_file = await executors.run('blocking', self._upload, temp_path, mime_type)
                 
-                # Check if upload_file exists
-                if hasattr(genai, 'upload_file'):
-                    # Retry logic for rate limiting
-                    max_retries = 3
-                    retry_delay = 5
-                    
-                    for attempt in range(max_retries):
-                        try:
-                            audio_file = genai.upload_file(path=temp_path, mime_type=mime_type)
-                            print(f"✅ Audio uploaded successfully: {audio_file.name}")
-                            break
-                        except google_exceptions.ResourceExhausted as e:
-                            if attempt < max_retries - 1:
-                                wait_time = retry_delay * (attempt + 1)
-                                print(f"⏳ Rate limit hit. Waiting {wait_time}s before retry {attempt + 2}/{max_retries}...")
-                                time.sleep(wait_time)
-                            else:
-                                raise Exception(f"API rate limit exceeded after {max_retries} attempts. Please wait a few minutes and try again, or enable billing on your Google Cloud project for higher limits.")
-                    
-                    # Wait for processing
-                    max_wait = 60
-                    waited = 0
-                    print("⏳ Waiting for audio processing...")
-                    
-                    while audio_file.state.name == "PROCESSING" and waited < max_wait:
-                        print(f"   Processing... ({waited}s / {max_wait}s)")
-                        time.sleep(2)
-                        audio_file = genai.get_file(audio_file.name)
-                        waited += 2
-                    
-                    if audio_file.state.name == "FAILED":
-                        raise Exception("Audio file processing failed on Gemini servers")
-                    
-                    if audio_file.state.name == "PROCESSING":
-                        raise Exception(f"Audio processing timeout after {max_wait} seconds")
-                    
-                    print(f"✅ Audio processing complete. State: {audio_file.state.name}")
-                    
-                    # Create transcription prompt
-                    prompt = """
-Please transcribe this audio recording into text.
-This is a business meeting or requirements discussion.
-
-Provide a clear, accurate, and complete transcription.
-Include all spoken words and format it as a professional transcript.
-Do not add any commentary or explanation - just the transcription.
-"""
-                    
-                    # Generate transcription with retry
-                    print("🤖 Generating transcription...")
-                    for attempt in range(max_retries):
-                        try:
-                            response = self.transcription_model.generate_content([
-                                prompt,
-                                audio_file
-                            ])
-                            
-                            transcript = response.text.strip()
-                            print(f"✅ Transcription complete: {len(transcript)} characters")
-                            
-                            if not transcript:
-                                raise Exception("Transcription returned empty text")
-                            
-                            return transcript
-                        except google_exceptions.ResourceExhausted as e:
-                            if attempt < max_retries - 1:
-                                wait_time = retry_delay * (attempt + 1)
-                                print(f"⏳ Rate limit hit. Waiting {wait_time}s before retry {attempt + 2}/{max_retries}...")
-                                time.sleep(wait_time)
-                            else:
-                                raise Exception(f"API rate limit exceeded after {max_retries} attempts. Please wait a few minutes and try again, or enable billing on your Google Cloud project for higher limits.")
+                print("⏳ Waiting for audio processing...")
+                audio_file = await file_waiter.wait(audio_file, is_disconnected=is_disconnected)
+                print(f"✅ Audio processing complete. State: {audio_file.state.name}")
                 
-                else:
-                    raise AttributeError("upload_file not available")
+                return await executors.run('blocking', self._generate, [TRANSCRIPTION_PROMPT, audio_file])
             
+            except (ClientDisconnected, ExecutorSaturated):
+                raise
             except (AttributeError, Exception) as upload_error:
-                # Check if it's a rate limit error
-                if "429" in str(upload_error) or "Resource exhausted" in str(upload_error) or "rate limit" in str(upload_error).lower():
-                    raise Exception(f"⚠️ API RATE LIMIT EXCEEDED ⚠️\n\n"
-                                  f"Your Gemini API has reached its quota limit.\n\n"
-                                  f"Solutions:\n"
-                                  f"1. Wait 1-5 minutes and try again (free tier: 15 requests/min)\n"
-                                  f"2. Check your quota at: https://aistudio.google.com/app/apikey\n"
-                                  f"3. Enable billing for higher limits: https://console.cloud.google.com/billing\n\n"
-                                  f"Original error: {str(upload_error)}")
+                self._check_rate_limit(upload_error)
                 
                 # METHOD 2: Direct inline approach (fallback)
                 print(f"⚠️ File upload not available: {str(upload_error)}")
                 print("🔄 Attempting direct inline transcription...")
-                
-                # Read file back as bytes for inline upload
-                with open(temp_path, 'rb') as f:
-                    audio_bytes = f.read()
-                
-                # Create transcription prompt
-                prompt = """
-Please transcribe this audio recording into text.
-This is a business meeting or requirements discussion.
-
-Provide a clear, accurate, and complete transcription.
-Include all spoken words and format it as a professional transcript.
-Do not add any commentary or explanation - just the transcription.
-"""
-                
-                # Retry logic for inline method
-                max_retries = 3
-                retry_delay = 5
-                
-                for attempt in range(max_retries):
-                    try:
-                        print(f"🤖 Generating transcription (inline method, attempt {attempt + 1}/{max_retries})...")
-                        response = self.transcription_model.generate_content([
-                            prompt,
-                            {
-                                "mime_type": mime_type,
-                                "data": audio_bytes
-                            }
-                        ])
-                        
-                        transcript = response.text.strip()
-                        print(f"✅ Transcription complete (inline method): {len(transcript)} characters")
-                        
-                        if not transcript:
-                            raise Exception("Transcription returned empty text")
-                        
-                        return transcript
-                    
-                    except google_exceptions.ResourceExhausted as e:
-                        if attempt < max_retries - 1:
-                            wait_time = retry_delay * (attempt + 1)
-                            print(f"⏳ Rate limit hit. Waiting {wait_time}s before retry {attempt + 2}/{max_retries}...")
-                            time.sleep(wait_time)
-                        else:
-                            raise Exception(f"⚠️ API RATE LIMIT EXCEEDED ⚠️\n\n"
-                                          f"Your Gemini API has reached its quota limit.\n\n"
-                                          f"Solutions:\n"
-                                          f"1. Wait 1-5 minutes and try again (free tier: 15 requests/min)\n"
-                                          f"2. Check your quota at: https://aistudio.google.com/app/apikey\n"
-                                          f"3. Enable billing for higher limits: https://console.cloud.google.com/billing\n\n"
-                                          f"Free tier limits: ~15 requests/minute, 1500/day")
+                return await executors.run(
+                    'blocking',
+                    self._generate,
+                    self._inline_contents(audio_bytes, mime_type),
+                    "inline"
+                )
         
+        except (ClientDisconnected, ExecutorSaturated):
+            raise
         except Exception as e:
             print(f"❌ Transcription error: {str(e)}")
             import traceback
@@ -239,21 +258,117 @@ Do not add any commentary or explanation - just the transcription.
             raise Exception(f"Audio transcription failed: {str(e)}")
         
         finally:
-            # Clean up audio file from Gemini
-            if audio_file and hasattr(genai, 'delete_file'):
-                try:
-                    genai.delete_file(audio_file.name)
-                    print("🧹 Audio file cleaned up from Gemini")
-                except Exception as cleanup_err:
-                    print(f"⚠️ Could not cleanup remote file: {cleanup_err}")
+            # Don't make the caller wait for remote deletion
+            executors.pools['blocking'].submit(self._cleanup, audio_file, temp_path, reject=False)
+    
+    
+    def _prepare_upload(self, audio_data, audio_format, preprocess):
+        """Decode, optionally preprocess and write audio to a temp file"""
+        print(f"🎙️ Transcribing audio using {APIConfig.GEMINI_MODEL}...")
+        
+        # Decode base64 if needed
+        if isinstance(audio_data, str):
+            audio_bytes = base64.b64decode(audio_data)
+        else:
+            audio_bytes = audio_data
+        
+        if preprocess:
+            audio_bytes, audio_format, _ = self.prepare_audio(audio_bytes, audio_format)
+        
+        print(f"📊 Audio size: {len(audio_bytes)} bytes, format: {audio_format}")
+        
+        mime_type = MIME_TYPES.get(audio_format.lower(), 'audio/wav')
+        print(f"🔧 Using MIME type: {mime_type}")
+        
+        # Save audio to a quota-limited scratch file
+        temp_path = scratch_space.write(audio_bytes, suffix=f'.{audio_format}')
+        
+        print(f"💾 Temporary file created: {temp_path}")
+        
+        return audio_bytes, mime_type, temp_path
+    
+    
+    @traced('gemini.upload_file')
+    def _upload(self, temp_path, mime_type):
+        """Upload audio through the File API with rate-limit retries"""
+        print("📤 Uploading audio to Gemini...")
+        
+        # Check if upload_file exists
+        if not hasattr(genai, 'upload_file'):
+            raise AttributeError("upload_file not available")
+        
+        for attempt in range(MAX_RETRIES):
+            try:
+                audio_file = scratch_space.upload(
+                    temp_path, mime_type,
+                    lambda **kwargs: gemini_breaker.call(genai.upload_file, **kwargs)
+                )
+                print(f"✅ Audio uploaded successfully: {audio_file.name}")
+                return audio_file
+            except google_exceptions.ResourceExhausted as e:
+                if attempt < MAX_RETRIES - 1:
+                    gemini_breaker.check()
+                    wait_time = RETRY_DELAY * (attempt + 1)
+                    print(f"⏳ Rate limit hit. Waiting {wait_time}s before retry {attempt + 2}/{MAX_RETRIES}...")
+                    with span('gemini.retry_sleep', seconds=wait_time):
+                        time.sleep(wait_time)
+                else:
+                    raise Exception(f"API rate limit exceeded after {MAX_RETRIES} attempts. Please wait a few minutes and try again, or enable billing on your Google Cloud project for higher limits.")
+    
+    
+    def _generate(self, contents, method="file"):
+        """Generate the transcript with rate-limit retries"""
+        for attempt in range(MAX_RETRIES):
+            try:
+                print(f"🤖 Generating transcription ({method} method, attempt {attempt + 1}/{MAX_RETRIES})...")
+                with span('gemini.generate_content', attempt=attempt + 1, method=method,
+                          **{'gemini.model': APIConfig.GEMINI_MODEL}) as current:
+                    response = gemini_breaker.call(self.transcription_model.generate_content, contents)
+                    record_response(current, response)
+                
+                transcript = response.text.strip()
+                print(f"✅ Transcription complete ({method} method): {len(transcript)} characters")
+                
+                if not transcript:
+                    raise Exception("Transcription returned empty text")
+                
+                return transcript
             
-            # Clean up temp file
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.unlink(temp_path)
-                    print("🧹 Temporary file cleaned up")
-                except Exception as cleanup_err:
-                    print(f"⚠️ Could not cleanup temp file: {cleanup_err}")
+            except google_exceptions.ResourceExhausted as e:
+                if attempt < MAX_RETRIES - 1:
+                    gemini_breaker.check()
+                    wait_time = RETRY_DELAY * (attempt + 1)
+                    print(f"⏳ Rate limit hit. Waiting {wait_time}s before retry {attempt + 2}/{MAX_RETRIES}...")
+                    with span('gemini.retry_sleep', seconds=wait_time):
+                        time.sleep(wait_time)
+                else:
+                    raise Exception(RATE_LIMIT_MESSAGE + "Free tier limits: ~15 requests/minute, 1500/day")
+    
+    
+    @staticmethod
+    def _inline_contents(audio_bytes, mime_type):
+        """Prompt with the audio attached inline instead of via the File API"""
+        return [
+            TRANSCRIPTION_PROMPT,
+            {
+                "mime_type": mime_type,
+                "data": audio_bytes
+            }
+        ]
+    
+    
+    @staticmethod
+    def _check_rate_limit(error):
+        """Re-raise quota errors instead of falling back to inline upload"""
+        if "429" in str(error) or "Resource exhausted" in str(error) or "rate limit" in str(error).lower():
+            raise Exception(RATE_LIMIT_MESSAGE + f"Original error: {str(error)}")
+    
+    
+    @staticmethod
+    def _cleanup(audio_file, temp_path):
+        """Delete the remote file and the local temp file (the sweeper retries failures)"""
+        scratch_space.delete_remote(audio_file)
+        scratch_space.release(temp_path)
     
     
     def is_configured(self):
@@ -0,0 +1,368 @@
+"""
+Gemini Context Cache
+====================
+Explicit context caching for the long, fixed prompt prefixes (role,
+instructions, output format, worked examples) and for long transcripts
+that are sent more than once.
+
+A prefix is only cached once it has been seen twice within the TTL, so
+one-off prompts never pay the cache creation cost. Cached handles are
+reused until shortly before they expire, get their TTL extended while
+they are in use, and are deleted on shutdown. Creating and extending a
+cache are network calls made outside the manager's lock: one caller per
+prefix does the work while concurrent callers for the same prefix wait
+for its result (creation) or keep using the current handle (extension).
+A cached call rejected because the handle expired or was deleted on the
+server drops the handle and is sent once more with the full prompt.
+
+Only prefixes of at least GEMINI_CACHE_MIN_TOKENS (Gemini's minimum cache
+size) are cached. The fixed story and criteria instructions (~430 and
+~815 estimated tokens) are below that minimum and are always sent in
+full; what gets cached in practice is the requirements extraction
+prefix, which carries the transcript or document text and so crosses
+the minimum for all but short inputs.
+
+Backends (APIConfig.GEMINI_CONTEXT_CACHE):
+- "gemini": google.generativeai caching API
+- "local":  in-process mock that mirrors the API, for tests/offline use
+- "off":    never cache, always send the full prompt
+"""
+
+import hashlib
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+
+import google.generativeai as genai
+
+from backend.core.config import APIConfig
+from backend.core.circuit_breaker import gemini_breaker
+from backend.core.tracing import span
+from utils.text_compaction import TextCompactor
+
+
+# Longest a caller waits for another caller's cache creation before sending the full prompt
+CREATE_WAIT_SECONDS = 10
+
+# Exception class names (anywhere in the MRO) raised for a handle the server no longer knows
+CACHE_ERROR_NAMES = {'NotFound', 'InvalidArgument', 'PermissionDenied'}
+
+
+def is_cache_error(error):
+    """True for errors caused by an expired or deleted cached content handle"""
+    return any(cls.__name__ in CACHE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class GeminiCacheBackend:
+    """Cached content handles backed by the Gemini caching API"""
+
+    def available(self):
+        """Check that the installed SDK supports explicit caching"""
+        return hasattr(genai, 'caching')
+
+    def create(self, model_name, contents, ttl):
+        """Create a cached content handle; returns (handle, expire_time)"""
+        cached = genai.caching.CachedContent.create(
+            model=model_name if model_name.startswith('models/') else f"models/{model_name}",
+            contents=[contents],
+            ttl=ttl
+        )
+        return cached, cached.expire_time
+
+    def extend(self, handle, ttl):
+        """Extend a handle's TTL; returns the new expire_time"""
+        handle.update(ttl=ttl)
+        return handle.expire_time
+
+    def delete(self, handle):
+        handle.delete()
+
+    def model_for(self, handle, generation_config):
+        """GenerativeModel that prepends the cached contents to every call"""
+        return genai.GenerativeModel.from_cached_content(
+            cached_content=handle,
+            generation_config=generation_config
+        )
+
+
+class LocalCacheBackend:
+    """In-process stand-in for the caching API, used for tests and offline runs"""
+
+    class Handle:
+        def __init__(self, name, model_name, contents):
+            self.name = name
+            self.model_name = model_name
+            self.contents = contents
+            self.hits = 0
+
+    class Model:
+        """Prepends cached contents, exactly like a model bound to a cache"""
+
+        def __init__(self, handle, generation_config):
+            self.handle = handle
+            self.generation_config = generation_config
+            self.model = genai.GenerativeModel(
+                model_name=handle.model_name,
+                generation_config=generation_config
+            )
+
+        def generate_content(self, contents, **kwargs):
+            self.handle.hits += 1
+            if isinstance(contents, str):
+                contents = [contents]
+            return self.model.generate_content([self.handle.contents, *contents], **kwargs)
+
+    def __init__(self):
+        self.handles = {}
+        self._ids = itertools.count(1)
+
+    def available(self):
+        return True
+
+    def create(self, model_name, contents, ttl):
+        handle = self.Handle(f"cachedContents/local-{next(self._ids)}", model_name, contents)
+        self.handles[handle.name] = handle
+        return handle, datetime.now(timezone.utc) + ttl
+
+    def extend(self, handle, ttl):
+        return datetime.now(timezone.utc) + ttl
+
+    def delete(self, handle):
+        self.handles.pop(handle.name, None)
+
+    def model_for(self, handle, generation_config):
+        return self.Model(handle, generation_config)
+
+
+class ContextCacheManager:
+    """Reuse cached prompt prefixes across Gemini calls"""
+
+    BACKENDS = {
+        'gemini': GeminiCacheBackend,
+        'local': LocalCacheBackend,
+    }
+
+    def __init__(self, mode=None):
+        """
+        Args:
+            mode: "gemini", "local" or "off" (defaults to config)
+        """
+        mode = mode or APIConfig.GEMINI_CONTEXT_CACHE
+        self.backend = self.BACKENDS[mode]() if mode in self.BACKENDS else None
+        if self.backend and not self.backend.available():
+            print("Context caching not supported by installed google-generativeai, sending full prompts")
+            self.backend = None
+
+        self.ttl = timedelta(seconds=APIConfig.GEMINI_CACHE_TTL_SECONDS)
+        self.min_tokens = APIConfig.GEMINI_CACHE_MIN_TOKENS
+
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> {'handle', 'expire_time', 'model_name'}
+        self._seen = {}      # key -> last time an uncached prefix was used
+        self._failed = {}    # key -> time creation failed (don't retry until TTL passes)
+        self._creating = {}  # key -> threading.Event set once the in-flight creation finished
+        self.stats = {'hits': 0, 'misses': 0, 'created': 0, 'errors': 0}
+
+
+    def generate(self, model, prefix, suffix, generation_config=None, stream=False):
+        """
+        Call generate_content, serving the prefix from cache when possible
+
+        Args:
+            model: Uncached GenerativeModel used as fallback
+            prefix: Stable leading part of the prompt
+            suffix: Per-request remainder of the prompt
+            generation_config: Config for the cached model (defaults to GEMINI_CONFIG)
+            stream: Return a streaming response (iterate it for text chunks);
+                    the span then only covers the time to the first chunk
+
+        Returns:
+            Gemini response
+        """
+        with span('gemini.generate_content',
+                  **{'gemini.model': getattr(model, 'model_name', None),
+                     'gemini.stream': stream,
+                     'prompt.characters': len(prefix) + len(suffix),
+                     'prompt.estimated_tokens': TextCompactor.estimate_tokens(prefix + suffix)}) as current:
+            key, cached_model = self._cached_model(model, prefix, generation_config or APIConfig.GEMINI_CONFIG)
+            current.set_attribute('gemini.context_cached', cached_model is not None)
+            kwargs = {'stream': True} if stream else {}
+            response = None
+            if cached_model is not None:
+                try:
+                    response = gemini_breaker.call(cached_model.generate_content, suffix, **kwargs)
+                except Exception as e:
+                    if not is_cache_error(e):
+                        raise
+                    # Expired or deleted on the server: forget it and send the full prompt once
+                    print(f"Context cache unusable, sending full prompt: {str(e)}")
+                    self._drop(key)
+                    current.set_attribute('gemini.context_cached', False)
+            if response is None:
+                response = gemini_breaker.call(model.generate_content, prefix + suffix, **kwargs)
+            if not stream:
+                record_response(current, response)
+            return response
+
+
+    def _cached_model(self, model, prefix, generation_config):
+        """Return (cache key, model bound to a cache for this prefix or None)"""
+        if self.backend is None or TextCompactor.estimate_tokens(prefix) < self.min_tokens:
+            return None, None
+
+        model_name = getattr(model, 'model_name', APIConfig.GEMINI_MODEL)
+        key = hashlib.sha256(f"{model_name}\0{prefix}".encode('utf-8')).hexdigest()
+        now = datetime.now(timezone.utc)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            # Drop handles about to expire rather than racing the server
+            if entry and entry['expire_time'] - now < timedelta(seconds=30):
+                self._entries.pop(key, None)
+                entry = None
+
+            if entry:
+                self.stats['hits'] += 1
+                # Keep frequently used prefixes alive; one caller extends, the rest use the handle
+                extend = not entry['extending'] and entry['expire_time'] - now < self.ttl / 4
+                if extend:
+                    entry['extending'] = True
+            else:
+                creating = self._creating.get(key)
+                if creating is None:
+                    self.stats['misses'] += 1
+                    if not self._should_create(key, now):
+                        return key, None
+                    self._creating[key] = threading.Event()
+
+        if entry:
+            if extend:
+                self._extend(entry)
+            return key, self.backend.model_for(entry['handle'], generation_config)
+
+        if creating is not None:
+            return key, self._await_creation(key, creating, generation_config)
+
+        return key, self._create(key, model_name, prefix, now, generation_config)
+
+
+    def _should_create(self, key, now):
+        """Decide whether a missed prefix gets cached (called with the lock held)"""
+        failed_at = self._failed.get(key)
+        if failed_at and now - failed_at < self.ttl:
+            return False
+
+        # Only cache prefixes that are actually reused
+        last_seen = self._seen.get(key)
+        self._seen[key] = now
+        if not last_seen or now - last_seen > self.ttl:
+            self._prune(now)
+            return False
+        return True
+
+
+    def _create(self, key, model_name, prefix, now, generation_config):
+        """Create the cache for a prefix (outside the lock) and wake callers waiting for it"""
+        try:
+            handle, expire_time = self.backend.create(model_name, prefix, self.ttl)
+        except Exception as e:
+            print(f"Context cache creation failed, sending full prompt: {str(e)}")
+            with self._lock:
+                self.stats['errors'] += 1
+                self._failed[key] = now
+                self._creating.pop(key).set()
+            return None
+
+        with self._lock:
+            self.stats['created'] += 1
+            self._entries[key] = {'handle': handle, 'expire_time': expire_time,
+                                  'model_name': model_name, 'extending': False}
+            self._seen.pop(key, None)
+            self._creating.pop(key).set()
+        print(f"Created context cache for {TextCompactor.estimate_tokens(prefix)}-token prefix")
+
+        return self.backend.model_for(handle, generation_config)
+
+
+    def _await_creation(self, key, creating, generation_config):
+        """Wait for another caller's creation of this prefix's cache; None if it failed or is slow"""
+        creating.wait(CREATE_WAIT_SECONDS)
+        with self._lock:
+            entry = self._entries.get(key)
+            self.stats['hits' if entry else 'misses'] += 1
+        if entry is None:
+            return None
+        return self.backend.model_for(entry['handle'], generation_config)
+
+
+    def _extend(self, entry):
+        """Extend a handle's TTL (outside the lock)"""
+        try:
+            expire_time = self.backend.extend(entry['handle'], self.ttl)
+        except Exception as e:
+            print(f"Could not extend context cache TTL: {str(e)}")
+            expire_time = None
+        with self._lock:
+            if expire_time is not None:
+                entry['expire_time'] = expire_time
+            entry['extending'] = False
+
+
+    def _drop(self, key):
+        """Forget a handle the server rejected; the next reuse of the prefix creates a new one"""
+        with self._lock:
+            self.stats['errors'] += 1
+            self._entries.pop(key, None)
+
+
+    def _prune(self, now):
+        """Forget stale sightings, failures and expired handles so the registries stay bounded"""
+        for registry in (self._seen, self._failed):
+            for key in [k for k, t in registry.items() if now - t > self.ttl]:
+                del registry[key]
+        for key in [k for k, entry in self._entries.items() if entry['expire_time'] <= now]:
+            del self._entries[key]
+
+
+    def clear(self):
+        """Delete every cached content handle (called on shutdown)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+
+        for entry in entries:
+            try:
+                self.backend.delete(entry['handle'])
+            except Exception as e:
+                print(f"Could not delete context cache: {str(e)}")
+
+
+    def status(self):
+        """Cache statistics for health endpoints"""
+        with self._lock:
+            self._prune(datetime.now(timezone.utc))
+            return {
+                'backend': type(self.backend).__name__ if self.backend else 'off',
+                'active_caches': len(self._entries),
+                **self.stats
+            }
+
+
+def record_response(current, response):
+    """Add response size and token usage to a generate_content span"""
+    try:
+        current.set_attribute('response.characters', len(response.text))
+    except Exception:
+        # .text raises for blocked/empty candidates; the caller reports that
+        pass
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        for field in ('prompt_token_count', 'candidates_token_count', 'cached_content_token_count'):
+            value = getattr(usage, field, None)
+            if value is not None:
+                current.set_attribute(f"gemini.{field}", value)
+
+
+# Initialize cache manager instance
+context_cache = ContextCacheManager()
@@ -11,6 +11,10 @@ User Stories → Generate Acceptance Criteria
 import google.generativeai as genai
 from backend.core.config import APIConfig
 from utils.prompts import PromptTemplates
+from backend.services.model_router import model_router
+from backend.core.circuit_breaker import CircuitOpen
+from backend.core.models import Scenario
+from backend.core.tracing import traced
 import re
 
 
@@ -22,21 +26,16 @@ class AcceptanceCriteriaGenerator:
         self.api_configured = False
         
         try:
-            # Configure Gemini API
+            # Configure Gemini API (models are chosen per call by model_router)
             genai.configure(api_key=APIConfig.GEMINI_API_KEY)
             
-            # Initialize model
-            self.model = genai.GenerativeModel(
-                model_name=APIConfig.GEMINI_MODEL,
-                generation_config=APIConfig.GEMINI_CONFIG
-            )
-            
             self.api_configured = True
         
         except Exception as e:
             print(f"Gemini API configuration error: {str(e)}")
     
     
+    @traced('criteria.generate')
     def generate(self, user_story_text):
         """
         Generate acceptance criteria for a user story
@@ -48,12 +47,12 @@ class AcceptanceCriteriaGenerator:
             Dictionary with acceptance criteria:
             {
                 'criteria': [
-                    {
-                        'scenario_name': 'Successful Login',
-                        'given': 'the user is on login page AND has valid credentials',
-                        'when': 'the user enters email and password AND clicks Login',
-                        'then': 'system authenticates user AND redirects to dashboard'
-                    }
+                    Scenario(
+                        scenario_name='Successful Login',
+                        given='the user is on login page AND has valid credentials',
+                        when='the user enters email and password AND clicks Login',
+                        then='system authenticates user AND redirects to dashboard'
+                    )
                 ],
                 'raw_output': 'Full AI response'
             }
@@ -62,15 +61,28 @@ class AcceptanceCriteriaGenerator:
             raise Exception("Gemini API not configured. Please add API key to api_config.py")
         
         try:
-            # Generate prompt
-            prompt = PromptTemplates.acceptance_criteria_generator(user_story_text)
+            # Generate prompt (fixed prefix is served from context cache when possible)
+            prefix = PromptTemplates.acceptance_criteria_generator_prefix()
+            suffix = PromptTemplates.acceptance_criteria_generator_suffix(user_story_text)
             
             # Call Gemini API
-            response = self.model.generate_content(prompt)
+            route, response = model_router.generate('criteria', prefix, suffix)
             raw_output = response.text
             
             # Parse the response
             criteria = self._parse_criteria(raw_output)
+            model_router.record_result(route, len(criteria))
+            
+            # Nothing parsed: have the repair model reformat the response
+            if not criteria:
+                repaired, repaired_text = model_router.repair('criteria', raw_output, self._parse_criteria)
+                if repaired:
+                    return {
+                        'criteria': repaired,
+                        'raw_output': repaired_text,
+                        'total_scenarios': len(repaired),
+                        'repaired': True
+                    }
             
             return {
                 'criteria': criteria,
@@ -78,10 +90,13 @@ class AcceptanceCriteriaGenerator:
                 'total_scenarios': len(criteria)
             }
         
+        except CircuitOpen:
+            raise
         except Exception as e:
             raise Exception(f"Acceptance criteria generation error: {str(e)}")
     
     
+    @traced('criteria.parse_output')
     def _parse_criteria(self, text):
         """
         Parse AI output into structured acceptance criteria
@@ -90,7 +105,7 @@ class AcceptanceCriteriaGenerator:
             text: Raw AI response text
             
         Returns:
-            List of criteria dictionaries
+            List of Scenario models
         """
         criteria_list = []
         
@@ -120,14 +135,9 @@ class AcceptanceCriteriaGenerator:
             content: Content containing GIVEN-WHEN-THEN
             
         Returns:
-            Dictionary with criteria fields
+            Scenario model, or None if a clause is missing
         """
-        criteria = {
-            'scenario_name': scenario_name,
-            'given': '',
-            'when': '',
-            'then': ''
-        }
+        criteria = Scenario(scenario_name=scenario_name)
         
         # Extract GIVEN clauses
         given_pattern = r'-\s*GIVEN\s+(.+?)(?=-\s*(?:AND|WHEN)|$)'
@@ -139,7 +149,7 @@ class AcceptanceCriteriaGenerator:
         
         all_given = given_matches + given_and_matches
         if all_given:
-            criteria['given'] = ' AND '.join([' '.join(g.strip().split()) for g in all_given])
+            criteria.given = ' AND '.join([' '.join(g.strip().split()) for g in all_given])
         
         # Extract WHEN clauses
         when_pattern = r'-\s*WHEN\s+(.+?)(?=-\s*(?:AND|THEN)|$)'
@@ -151,7 +161,7 @@ class AcceptanceCriteriaGenerator:
         
         all_when = when_matches + when_and_matches
         if all_when:
-            criteria['when'] = ' AND '.join([' '.join(w.strip().split()) for w in all_when])
+            criteria.when = ' AND '.join([' '.join(w.strip().split()) for w in all_when])
         
         # Extract THEN clauses
         then_pattern = r'-\s*THEN\s+(.+?)(?=-\s*(?:AND|\*\*)|$)'
@@ -163,10 +173,10 @@ class AcceptanceCriteriaGenerator:
         
         all_then = then_matches + then_and_matches
         if all_then:
-            criteria['then'] = ' AND '.join([' '.join(t.strip().split()) for t in all_then])
+            criteria.then = ' AND '.join([' '.join(t.strip().split()) for t in all_then])
         
         # Only return if we have all three components
-        if criteria['given'] and criteria['when'] and criteria['then']:
+        if criteria.given and criteria.when and criteria.then:
             return criteria
         
         return None
@@ -187,10 +197,10 @@ class AcceptanceCriteriaGenerator:
         output.append("## ✅ Acceptance Criteria (Given-When-Then)\n")
         
         for idx, criteria in enumerate(criteria_data['criteria'], 1):
-            output.append(f"### Scenario {idx}: {criteria['scenario_name']}\n")
-            output.append(f"**GIVEN** {criteria['given']}\n")
-            output.append(f"**WHEN** {criteria['when']}\n")
-            output.append(f"**THEN** {criteria['then']}\n")
+            output.append(f"### Scenario {idx}: {criteria.scenario_name}\n")
+            output.append(f"**GIVEN** {criteria.given}\n")
+            output.append(f"**WHEN** {criteria.when}\n")
+            output.append(f"**THEN** {criteria.then}\n")
             output.append("\n---\n")
         
         # Summary
@@ -210,13 +220,44 @@ class AcceptanceCriteriaGenerator:
         Returns:
             Gherkin formatted string
         """
-        output = [f"Feature: {feature_name}\n"]
+        return self.gherkin_feature(feature_name, criteria_data['criteria'])
+    
+    
+    @staticmethod
+    def story_text(story):
+        """Prompt text of a saved UserStory, as the frontend sends it to /api/criteria/generate"""
+        return f"{story.story_code}: {story.title}\n{story.user_story}"
+    
+    
+    @staticmethod
+    def gherkin_feature(feature_name, criteria_list, description=""):
+        """
+        Render one Gherkin feature
+        
+        Every value is collapsed onto a single line, since a stray newline
+        inside a step would otherwise break the .feature file.
+        
+        Args:
+            feature_name: Name of the feature
+            criteria_list: List of Scenario models
+            description: Optional free-text description under the feature line
+            
+        Returns:
+            Gherkin formatted string
+        """
+        def line(value):
+            return ' '.join(str(value or '').split())
+        
+        output = [f"Feature: {line(feature_name)}"]
+        if description:
+            output.append(f"  {line(description)}")
+        output.append("")
         
-        for criteria in criteria_data['criteria']:
-            output.append(f"  Scenario: {criteria['scenario_name']}")
-            output.append(f"    Given {criteria['given']}")
-            output.append(f"    When {criteria['when']}")
-            output.append(f"    Then {criteria['then']}")
+        for criteria in criteria_list:
+            output.append(f"  Scenario: {line(criteria.scenario_name)}")
+            output.append(f"    Given {line(criteria.given)}")
+            output.append(f"    When {line(criteria.when)}")
+            output.append(f"    Then {line(criteria.then)}")
             output.append("")
         
         return '\n'.join(output)
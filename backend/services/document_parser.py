@@ -13,11 +13,14 @@ import io
 from docx import Document
 from PyPDF2 import PdfReader
 
+from backend.core.tracing import traced
+
 
 class DocumentParser:
     """Parse various document formats and extract text"""
     
     @staticmethod
+    @traced('document.parse_txt')
     def parse_txt(file_content):
         """
         Parse plain text file
@@ -41,6 +44,7 @@ class DocumentParser:
     
     
     @staticmethod
+    @traced('document.parse_docx')
     def parse_docx(file_content):
         """
         Parse Microsoft Word document (.docx)
@@ -71,6 +75,7 @@ class DocumentParser:
     
     
     @staticmethod
+    @traced('document.parse_pdf')
     def parse_pdf(file_content):
         """
         Parse PDF document
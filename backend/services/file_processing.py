@@ -0,0 +1,147 @@
+"""
+Gemini File Processing Waiter
+=============================
+Waits for files uploaded through the Gemini File API to leave the
+PROCESSING state.
+
+Polling is adaptive: the first checks come quickly (most short clips are
+ready within a second), then the interval doubles up to a cap. Waits
+run on the event loop, so many concurrent uploads are tracked without
+tying up a worker thread each, and a wait is abandoned as soon as the
+client disconnects or the deadline passes.
+"""
+
+import asyncio
+import time
+
+import google.generativeai as genai
+
+from backend.core.config import APIConfig
+from backend.core.executors import executors
+
+
+class ClientDisconnected(Exception):
+    """Raised when the requesting client went away mid-wait"""
+
+
+class FileProcessingWaiter:
+    """Track Gemini files until they are ACTIVE"""
+
+    def __init__(self, first_interval=None, max_interval=None, deadline=None):
+        """
+        Args:
+            first_interval: Seconds before the first re-check
+            max_interval: Upper bound for the poll interval
+            deadline: Default seconds to wait before giving up
+        """
+        self.first_interval = first_interval or APIConfig.FILE_POLL_FIRST_INTERVAL
+        self.max_interval = max_interval or APIConfig.FILE_POLL_MAX_INTERVAL
+        self.deadline = deadline or APIConfig.FILE_PROCESSING_DEADLINE
+
+        self._active = {}    # file name -> wait start time
+        self.stats = {'completed': 0, 'failed': 0, 'timed_out': 0, 'cancelled': 0, 'polls': 0, 'total_wait': 0.0}
+
+
+    def intervals(self):
+        """Poll schedule: fast first, then exponential up to max_interval"""
+        interval = self.first_interval
+        while True:
+            yield interval
+            interval = min(interval * 2, self.max_interval)
+
+
+    async def wait(self, file, deadline=None, is_disconnected=None):
+        """
+        Wait until a file has been processed
+
+        Args:
+            file: File returned by genai.upload_file
+            deadline: Seconds to wait (defaults to FILE_PROCESSING_DEADLINE)
+            is_disconnected: Optional async callable, e.g. Request.is_disconnected
+
+        Returns:
+            The processed file
+
+        Raises:
+            ClientDisconnected: If is_disconnected() reports the client left
+            Exception: If processing failed or the deadline passed
+        """
+        deadline = deadline or self.deadline
+        started = time.monotonic()
+        self._active[file.name] = started
+        outcome = 'cancelled'
+
+        try:
+            schedule = self.intervals()
+            while file.state.name == "PROCESSING":
+                waited = time.monotonic() - started
+                if waited >= deadline:
+                    outcome = 'timed_out'
+                    raise Exception(f"Audio processing timeout after {deadline} seconds")
+
+                if is_disconnected is not None and await is_disconnected():
+                    raise ClientDisconnected(f"Client disconnected while {file.name} was processing")
+
+                await asyncio.sleep(min(next(schedule), deadline - waited))
+                self.stats['polls'] += 1
+                # Polls must not be rejected mid-wait, so they always queue
+                file = await executors.run('blocking', genai.get_file, file.name, reject=False)
+
+            if file.state.name == "FAILED":
+                outcome = 'failed'
+                raise Exception("Audio file processing failed on Gemini servers")
+
+            outcome = 'completed'
+            return file
+
+        finally:
+            self._active.pop(file.name, None)
+            self.stats[outcome] += 1
+            self.stats['total_wait'] += time.monotonic() - started
+
+
+    def wait_sync(self, file, deadline=None):
+        """
+        Blocking variant of wait() for callers outside the event loop
+
+        Args:
+            file: File returned by genai.upload_file
+            deadline: Seconds to wait (defaults to FILE_PROCESSING_DEADLINE)
+
+        Returns:
+            The processed file
+        """
+        deadline = deadline or self.deadline
+        started = time.monotonic()
+        schedule = self.intervals()
+
+        while file.state.name == "PROCESSING":
+            waited = time.monotonic() - started
+            if waited >= deadline:
+                raise Exception(f"Audio processing timeout after {deadline} seconds")
+            time.sleep(min(next(schedule), deadline - waited))
+            self.stats['polls'] += 1
+            file = genai.get_file(file.name)
+
+        if file.state.name == "FAILED":
+            raise Exception("Audio file processing failed on Gemini servers")
+
+        return file
+
+
+    def status(self):
+        """Waiter statistics for health endpoints"""
+        finished = sum(self.stats[k] for k in ('completed', 'failed', 'timed_out', 'cancelled'))
+        return {
+            'waiting': len(self._active),
+            'completed': self.stats['completed'],
+            'failed': self.stats['failed'],
+            'timed_out': self.stats['timed_out'],
+            'cancelled': self.stats['cancelled'],
+            'polls': self.stats['polls'],
+            'avg_wait_seconds': round(self.stats['total_wait'] / finished, 3) if finished else 0.0
+        }
+
+
+# Initialize waiter instance
+file_waiter = FileProcessingWaiter()
@@ -0,0 +1,223 @@
+"""
+Live Transcription Service
+==========================
+Incremental transcription of audio streamed from the browser while the
+meeting is still running.
+
+The client streams raw 16-bit PCM frames. Frames are buffered into rolling
+windows (LIVE_WINDOW_SECONDS); each window is cut at the quietest point
+near its end so words are not split, resampled to 16 kHz mono, and
+transcribed while recording continues. Partial transcripts are pushed
+back as soon as each window is done, so only the last window remains to
+be transcribed when the meeting ends.
+
+Models (APIConfig.LIVE_TRANSCRIPTION_BACKEND):
+- "gemini": GEMINI_LIVE_MODEL called with the audio API key
+- "fake":   deterministic local model for tests and offline development
+"""
+
+import io
+import wave
+
+import numpy as np
+
+from backend.core.config import APIConfig
+from backend.core.circuit_breaker import circuit_breakers
+from utils.audio_preprocessing import AudioPreprocessor
+
+
+LIVE_PROMPT = """
+Transcribe this audio segment from an ongoing business meeting or
+requirements discussion. It continues directly from the previous segment.
+Return only the spoken words, without commentary, timestamps or speaker guesses.
+If the segment contains no speech, return an empty response.
+"""
+
+# Accepted PCM formats of the client stream
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+SUPPORTED_CHANNELS = (1, 2)
+
+
+class GeminiLiveModel:
+    """Window transcription with the audio model and audio API key"""
+
+    def __init__(self):
+        """Create a client bound to GEMINI_AUDIO_API_KEY"""
+        # A dedicated client, since genai.configure() holds the main key globally
+        from google.ai import generativelanguage as glm
+
+        self.glm = glm
+        self.model_name = APIConfig.GEMINI_LIVE_MODEL
+        if not self.model_name.startswith('models/'):
+            self.model_name = f"models/{self.model_name}"
+        self.client = glm.GenerativeServiceClient(
+            client_options={'api_key': APIConfig.GEMINI_AUDIO_API_KEY or APIConfig.GEMINI_API_KEY}
+        )
+
+    def transcribe(self, wav_bytes, context=""):
+        """
+        Transcribe one window
+
+        Args:
+            wav_bytes: 16 kHz mono WAV
+            context: Tail of the transcript so far, for continuity
+
+        Returns:
+            Transcript text of the window
+        """
+        prompt = LIVE_PROMPT
+        if context:
+            prompt += f"\nThe previous segment ended with: \"{context}\"\n"
+
+        request = self.glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=[self.glm.Content(role='user', parts=[
+                self.glm.Part(text=prompt),
+                self.glm.Part(inline_data=self.glm.Blob(mime_type='audio/wav', data=wav_bytes))
+            ])]
+        )
+        response = circuit_breakers['gemini_live'].call(self.client.generate_content, request=request)
+
+        if not response.candidates:
+            return ""
+        return ''.join(part.text for part in response.candidates[0].content.parts).strip()
+
+
+class FakeLiveModel:
+    """Local stand-in that describes each window instead of transcribing it"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, wav_bytes, context=""):
+        self.calls += 1
+        with wave.open(io.BytesIO(wav_bytes)) as wav:
+            seconds = wav.getnframes() / wav.getframerate()
+        return f"[segment {self.calls}: {seconds:.1f}s of speech]"
+
+
+class LiveTranscriptionSession:
+    """Buffer streamed PCM and split it into transcription windows"""
+
+    def __init__(self, sample_rate=16000, channels=1):
+        """
+        Args:
+            sample_rate: Sample rate of incoming frames
+            channels: Interleaved channels in incoming frames
+        """
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}")
+        if channels not in SUPPORTED_CHANNELS:
+            raise ValueError(f"channels must be one of {SUPPORTED_CHANNELS}")
+
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.window_samples = int(APIConfig.LIVE_WINDOW_SECONDS * sample_rate)
+        # A non-positive window would cut empty windows forever
+        if self.window_samples <= 0:
+            raise ValueError("LIVE_WINDOW_SECONDS must be positive")
+        # Window boundaries may move back by up to this much to find a pause
+        self.search_samples = int(min(2.0, APIConfig.LIVE_WINDOW_SECONDS / 4) * sample_rate)
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._remainder = b''
+        self.received_seconds = 0.0
+        self.segments = []
+
+
+    def add_frame(self, data):
+        """
+        Append raw little-endian int16 PCM
+
+        Args:
+            data: Frame bytes (may split samples across frames)
+
+        Returns:
+            List of completed windows (mono float32 arrays)
+        """
+        data = self._remainder + data
+        frame_bytes = 2 * self.channels
+        usable = len(data) - len(data) % frame_bytes
+        self._remainder = data[usable:]
+
+        samples = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768.0
+        samples = AudioPreprocessor.downmix(samples.reshape(-1, self.channels))
+        self.received_seconds += len(samples) / self.sample_rate
+        self._buffer = np.concatenate([self._buffer, samples])
+
+        windows = []
+        while len(self._buffer) >= self.window_samples:
+            cut = self._cut_point(self._buffer[:self.window_samples])
+            windows.append(self._buffer[:cut])
+            self._buffer = self._buffer[cut:]
+        return windows
+
+
+    def flush(self):
+        """Return whatever is left in the buffer as a final window"""
+        window = self._buffer
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._remainder = b''
+        return [window] if len(window) else []
+
+
+    def _cut_point(self, window):
+        """Index of the quietest 20 ms frame near the end of the window"""
+        frame = max(1, self.sample_rate // 50)
+        tail = window[-self.search_samples:]
+        n_frames = len(tail) // frame
+        if n_frames == 0:
+            return len(window)
+
+        energy = np.square(tail[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+        quietest = int(np.argmin(energy))
+        return len(window) - len(tail) + (quietest + 1) * frame
+
+
+    def encode_window(self, window):
+        """
+        Prepare a window for the model
+
+        Returns:
+            16 kHz mono WAV bytes, or None if the window is silent
+        """
+        target_rate = APIConfig.AUDIO_CONFIG['sample_rate']
+        threshold_db = APIConfig.AUDIO_SILENCE_THRESHOLD_DB
+        samples = AudioPreprocessor.resample(window, self.sample_rate, target_rate)
+
+        # Skip the model call when no 20 ms frame is above the silence threshold
+        frame = target_rate // 50
+        n_frames = len(samples) // frame
+        if n_frames == 0:
+            return None
+        rms = np.sqrt(np.square(samples[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1))
+        if 20 * np.log10(rms.max() + 1e-10) <= threshold_db:
+            return None
+
+        trimmed = AudioPreprocessor.trim_silence(samples, target_rate, threshold_db)
+        wav_bytes, _ = AudioPreprocessor.encode(trimmed, target_rate, 'wav')
+        return wav_bytes
+
+
+    def add_segment(self, text):
+        """Record a window's transcript; returns the full transcript so far"""
+        if text:
+            self.segments.append(text.strip())
+        return self.transcript()
+
+
+    def context(self, chars=200):
+        """Tail of the transcript, passed to the model for continuity"""
+        return self.transcript()[-chars:]
+
+
+    def transcript(self):
+        return ' '.join(self.segments)
+
+
+def get_live_model():
+    """Model selected by LIVE_TRANSCRIPTION_BACKEND"""
+    if APIConfig.LIVE_TRANSCRIPTION_BACKEND == 'fake':
+        return FakeLiveModel()
+    return GeminiLiveModel()
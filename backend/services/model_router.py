@@ -0,0 +1,243 @@
+"""
+Model Routing
+=============
+Chooses the Gemini model and generation config for each call.
+
+Tasks ("requirements", "stories", "criteria", "repair") are routed by
+APIConfig.MODEL_ROUTES to one of two tiers:
+- full:  GEMINI_MODEL, for long inputs and heavy extraction
+- light: GEMINI_LIGHT_MODEL, for small prompts and output repairs
+- auto:  light while the prompt fits MODEL_LIGHT_MAX_PROMPT_TOKENS and
+         the light model keeps up for that task (it rarely needs repair
+         and its average latency stays under the limit), full otherwise.
+         Both are recent (exponentially weighted) averages, and while a
+         task is on the full model every MODEL_LIGHT_PROBE_EVERY-th call
+         still goes to the light model, so a task moves back once the
+         light model recovers
+
+Each task also gets its own max_output_tokens, so large extractions are
+not cut off at 2048 tokens and small criteria requests don't reserve them.
+
+When a response parses to zero items, repair() asks the repair model to
+rewrite it into the strict output format and parses it again, instead of
+returning nothing.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+import google.generativeai as genai
+
+from backend.core.config import APIConfig
+from backend.core.circuit_breaker import CircuitOpen
+from backend.core.tracing import current_span
+from backend.services.context_cache import context_cache
+from utils.prompts import PromptTemplates
+from utils.text_compaction import TextCompactor
+
+
+# Output format each task's parser expects, for repair prompts
+REPAIR_FORMATS = {
+    'requirements': PromptTemplates.REQUIREMENTS_FORMAT,
+    'stories': PromptTemplates.USER_STORY_FORMAT,
+    'criteria': PromptTemplates.ACCEPTANCE_CRITERIA_FORMAT,
+}
+
+# Weight of the newest call in the running latency and empty-output averages
+LATENCY_SMOOTHING = 0.2
+
+
+@dataclass
+class Route:
+    """Model choice for one call"""
+    task: str
+    tier: str
+    model_name: str
+    generation_config: dict
+    model: object
+
+
+class ModelRouter:
+    """Pick a model per task and prompt size, and repair unparseable output"""
+
+    def __init__(self):
+        self.enabled = APIConfig.MODEL_ROUTING
+        self.model_names = {
+            'full': APIConfig.GEMINI_MODEL,
+            'light': APIConfig.GEMINI_LIGHT_MODEL,
+        }
+
+        self._lock = threading.Lock()
+        self._models = {}   # (model_name, max_output_tokens) -> GenerativeModel
+        self._stats = {}    # (task, tier) -> {'calls', 'latency', 'empty', 'empty_rate', 'repaired', 'bypassed'}
+
+
+    def route(self, task, prompt_tokens):
+        """
+        Choose the model for a call
+
+        Args:
+            task: Task name (a key of APIConfig.MODEL_ROUTES)
+            prompt_tokens: Estimated prompt size
+
+        Returns:
+            Route
+        """
+        if not self.enabled:
+            return self._route(task, 'full', APIConfig.GEMINI_CONFIG)
+
+        policy = APIConfig.MODEL_ROUTES.get(task, 'full')
+        tier = policy if policy in self.model_names else self._auto_tier(task, prompt_tokens)
+        generation_config = {
+            **APIConfig.GEMINI_CONFIG,
+            'max_output_tokens': APIConfig.MODEL_OUTPUT_TOKENS.get(task, APIConfig.GEMINI_CONFIG['max_output_tokens'])
+        }
+        return self._route(task, tier, generation_config)
+
+
+    def _auto_tier(self, task, prompt_tokens):
+        """
+        Light unless the prompt is large or the light model underperforms on
+        this task; underperforming tasks still send probe calls to light
+        """
+        if prompt_tokens > APIConfig.MODEL_LIGHT_MAX_PROMPT_TOKENS:
+            return 'full'
+
+        with self._lock:
+            stats = self._stats.get((task, 'light'))
+            if not stats or stats['calls'] < APIConfig.MODEL_ROUTING_MIN_SAMPLES:
+                return 'light'
+            if (stats['empty_rate'] <= APIConfig.MODEL_LIGHT_MAX_REPAIR_RATE
+                    and stats['latency'] <= APIConfig.MODEL_LIGHT_MAX_LATENCY_SECONDS):
+                return 'light'
+
+            # Probe calls refresh the averages, so recovery is noticed
+            stats['bypassed'] += 1
+            if APIConfig.MODEL_LIGHT_PROBE_EVERY > 0 and stats['bypassed'] % APIConfig.MODEL_LIGHT_PROBE_EVERY == 0:
+                return 'light'
+        return 'full'
+
+
+    def _route(self, task, tier, generation_config):
+        model_name = self.model_names[tier]
+        key = (model_name, generation_config['max_output_tokens'])
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=generation_config
+                )
+            model = self._models[key]
+        return Route(task, tier, model_name, generation_config, model)
+
+
+    def generate(self, task, prefix, suffix, stream=False):
+        """
+        Route and run one generate call through the context cache
+
+        Args:
+            task: Task name
+            prefix: Cacheable leading part of the prompt
+            suffix: Per-request remainder of the prompt
+            stream: Return a streaming response; its latency is not
+                    recorded here since the call returns at the first chunk
+
+        Returns:
+            (route, response)
+        """
+        route = self.route(task, TextCompactor.estimate_tokens(prefix + suffix))
+        current_span().set_attributes({'model.task': task, 'model.tier': route.tier})
+
+        started = time.monotonic()
+        response = context_cache.generate(route.model, prefix, suffix, route.generation_config, stream=stream)
+        if not stream:
+            self.record_latency(route, time.monotonic() - started)
+        return route, response
+
+
+    def record_result(self, route, items):
+        """Record how many items the parser found in a routed call's output"""
+        with self._lock:
+            stats = self._task_stats(route)
+            if not items:
+                stats['empty'] += 1
+            stats['empty_rate'] += LATENCY_SMOOTHING * ((0.0 if items else 1.0) - stats['empty_rate'])
+
+
+    def repair(self, task, raw_output, parse):
+        """
+        Rewrite output that parsed to zero items and parse it again
+
+        Args:
+            task: Task whose format the output should follow
+            raw_output: The unparseable model response
+            parse: Parser for the task's output
+
+        Returns:
+            (parsed, repaired_text), or (None, None) when repair is off,
+            fails or still yields nothing
+        """
+        if not APIConfig.MODEL_REPAIR_EMPTY_OUTPUT or not raw_output.strip() or task not in REPAIR_FORMATS:
+            return None, None
+
+        print(f"Parsing found no {task} items, asking the repair model to reformat the response...")
+        try:
+            route, response = self.generate('repair', PromptTemplates.output_repair(REPAIR_FORMATS[task]), raw_output)
+            repaired_text = response.text
+            parsed = parse(repaired_text)
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            print(f"Output repair failed: {str(e)}")
+            return None, None
+
+        found = parsed.get('total_count', 0) if isinstance(parsed, dict) else len(parsed)
+        with self._lock:
+            if found:
+                self._task_stats(route)['repaired'] += 1
+        print(f"Output repair recovered {found} {task} items")
+        return (parsed, repaired_text) if found else (None, None)
+
+
+    def record_latency(self, route, seconds):
+        """Add a call's duration to the running latency average of its route"""
+        with self._lock:
+            stats = self._task_stats(route)
+            stats['calls'] += 1
+            if stats['calls'] == 1:
+                stats['latency'] = seconds
+            else:
+                stats['latency'] += LATENCY_SMOOTHING * (seconds - stats['latency'])
+
+
+    def _task_stats(self, route):
+        """Stats entry for a route (caller holds the lock)"""
+        return self._stats.setdefault((route.task, route.tier),
+                                      {'calls': 0, 'latency': 0.0, 'empty': 0, 'empty_rate': 0.0,
+                                       'repaired': 0, 'bypassed': 0})
+
+
+    def status(self):
+        """Routing config and per-task/tier observations for health endpoints"""
+        with self._lock:
+            observed = {
+                f"{task}.{tier}": {
+                    'calls': stats['calls'],
+                    'avg_latency_seconds': round(stats['latency'], 2),
+                    'empty_rate': round(stats['empty_rate'], 2),
+                    'repaired': stats['repaired'],
+                    'bypassed': stats['bypassed'],
+                }
+                for (task, tier), stats in sorted(self._stats.items())
+            }
+        return {
+            'enabled': self.enabled,
+            'models': self.model_names,
+            'routes': APIConfig.MODEL_ROUTES if self.enabled else {},
+            'observed': observed,
+        }
+
+
+# Initialize router instance
+model_router = ModelRouter()
@@ -0,0 +1,321 @@
+"""
+Pipelined Workflow
+==================
+Runs extraction → user stories → acceptance criteria for one input with
+the stages overlapped instead of one after the other:
+
+    extraction (streamed) ──batches──▶ story workers ──stories──▶ criteria workers
+
+- Requirements are parsed from the streamed extraction response, saved,
+  and handed to story generation in batches (per type, at most
+  STORY_GROUP_MAX_REQUIREMENTS each) while extraction continues
+- Each finished story batch is saved and its stories are handed to
+  criteria generation one by one
+- Stages are connected by bounded asyncio queues (PIPELINE_QUEUE_SIZE):
+  a stage that gets ahead waits for the next one instead of piling up
+  model calls, so end-to-end latency approaches the slowest stage
+
+Progress is reported as a sequence of events (see WorkflowPipeline.run).
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from backend.core.config import APIConfig
+from backend.core.database import db
+from backend.core.executors import executors
+from backend.core.circuit_breaker import CircuitOpen
+from backend.services.requirements_extractor import extractor
+from backend.services.story_generator import story_gen
+from backend.services.criteria_generator import criteria_gen
+from backend.services.requirement_index import requirement_index
+
+
+class PipelineCancelled(Exception):
+    """The consumer went away; producer threads stop at their next hand-off"""
+
+
+class _PipelineRun:
+    """Queues, counters and timings of one pipelined run"""
+
+    def __init__(self, input_row, project_type, industry, prune):
+        self.input_row = input_row
+        self.project_type = project_type
+        self.industry = industry
+        self.prune = prune
+
+        self.loop = asyncio.get_running_loop()
+        self.events = asyncio.Queue()
+        self.batches = asyncio.Queue(maxsize=APIConfig.PIPELINE_QUEUE_SIZE)
+        self.stories = asyncio.Queue(maxsize=APIConfig.PIPELINE_QUEUE_SIZE)
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()   # story numbering across worker threads
+
+        self.started = time.monotonic()
+        self.finished = {}    # stage -> seconds since start when it completed
+        self.counts = {'requirements': 0, 'stories': 0, 'criteria': 0, 'errors': 0}
+        self.merged = {}
+        self.next_story_number = 1
+        self.saved_stories = []   # linked and saved, for the input's final story set
+        self.complete = True      # no extraction or story batch failed
+
+
+    def emit(self, event):
+        """Queue an event from the event loop"""
+        self.events.put_nowait(event)
+
+
+    def emit_threadsafe(self, event):
+        """Queue an event from a worker thread"""
+        self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+
+
+    def put_threadsafe(self, queue, item):
+        """
+        Put onto a pipeline queue from a worker thread, blocking while it is
+        full (backpressure) but giving up once the run is cancelled
+        """
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), self.loop)
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                if self.cancelled.is_set():
+                    future.cancel()
+                    raise PipelineCancelled()
+
+
+    def mark_finished(self, stage):
+        self.finished[stage] = round(time.monotonic() - self.started, 2)
+
+
+class WorkflowPipeline:
+    """Overlapped extraction, story and criteria generation with persistence"""
+
+    async def run(self, input_row, project_type="General", industry="General", prune=False):
+        """
+        Run the pipeline for an input
+
+        Args:
+            input_row: Input model (from db.get_input)
+            project_type: Type of project
+            industry: Industry domain
+            prune: Delete the input's saved requirements the extraction
+                didn't return (see Database.save_requirements)
+
+        Yields:
+            Event dicts, in completion order:
+            - {"type": "requirements", "requirements": [...]}  saved batch
+            - {"type": "stories", "req_codes": [...], "stories": [...]}
+            - {"type": "criteria", "story_id", "story_code", "criteria": [...]}
+            - {"type": "error", "stage", "detail"[, "retry_after"]}
+            - {"type": "done", "counts", "merged_requirements", "timings"}
+              (timings: seconds from start until each stage finished)
+        """
+        run = _PipelineRun(input_row, project_type, industry, prune)
+        stages = asyncio.create_task(self._run_stages(run))
+
+        try:
+            while True:
+                event = await run.events.get()
+                yield event
+                if event['type'] == 'done':
+                    break
+        finally:
+            # Client disconnected (or the run ended): stop all stages
+            run.cancelled.set()
+            if not stages.done():
+                stages.cancel()
+
+
+    async def _run_stages(self, run):
+        """Start every stage, wait for them in order and emit the final event"""
+        story_workers = [asyncio.create_task(self._story_worker(run))
+                         for _ in range(APIConfig.PIPELINE_STORY_WORKERS)]
+        criteria_workers = [asyncio.create_task(self._criteria_worker(run))
+                            for _ in range(APIConfig.PIPELINE_CRITERIA_WORKERS)]
+
+        try:
+            try:
+                await executors.run('blocking', self._extract, run)
+            except PipelineCancelled:
+                return
+            except Exception as e:
+                self._report(run, 'extraction', e)
+            run.mark_finished('extraction')
+
+            for _ in story_workers:
+                await run.batches.put(None)
+            await asyncio.gather(*story_workers)
+            if run.complete and run.saved_stories:
+                # Stories of requirements that got none this run would keep
+                # codes colliding with the new numbering; only done when no
+                # batch failed, so a failure doesn't cost saved stories
+                try:
+                    await executors.run('blocking', db.save_input_stories,
+                                        run.input_row.input_id, run.saved_stories, reject=False)
+                except Exception as e:
+                    self._report(run, 'stories', e)
+            run.mark_finished('stories')
+
+            for _ in criteria_workers:
+                await run.stories.put(None)
+            await asyncio.gather(*criteria_workers)
+            run.mark_finished('criteria')
+
+            run.emit({
+                'type': 'done',
+                'counts': run.counts,
+                'merged_requirements': run.merged,
+                'timings': {**run.finished, 'total': round(time.monotonic() - run.started, 2)}
+            })
+        finally:
+            for worker in story_workers + criteria_workers:
+                worker.cancel()
+
+
+    def _extract(self, run):
+        """Stage 1 (worker thread): stream requirements, save them, batch them for stories"""
+        input_id = run.input_row.input_id
+        batch = []
+        saved = []
+
+        try:
+            requirements_stream = extractor.extract_stream(
+                run.input_row.raw_text,
+                run.project_type,
+                run.industry,
+                transcript=run.input_row.input_type == 'voice'
+            )
+            for requirements in requirements_stream:
+                if run.cancelled.is_set():
+                    raise PipelineCancelled()
+
+                req_ids = db.save_requirements(input_id, requirements)
+                for req, req_id in zip(requirements, req_ids):
+                    req.req_id, req.input_id = req_id, input_id
+                requirement_index.sync(changed_ids=req_ids)
+                run.counts['requirements'] += len(requirements)
+                run.emit_threadsafe({'type': 'requirements', 'requirements': requirements})
+                saved.extend(requirements)
+
+                # Batches hold one requirement type, like story_gen.group_requirements
+                for req in requirements:
+                    if batch and (req.req_type != batch[0].req_type
+                                  or len(batch) >= APIConfig.STORY_GROUP_MAX_REQUIREMENTS):
+                        run.put_threadsafe(run.batches, batch)
+                        batch = []
+                    batch.append(req)
+        except PipelineCancelled:
+            raise
+        except Exception:
+            # Requirements saved before the failure still get their stories
+            if batch:
+                run.put_threadsafe(run.batches, batch)
+            raise
+
+        # Batches only add and update; other requirements go only when asked to
+        if run.prune and saved:
+            db.save_requirements(input_id, saved, prune=True)
+            requirement_index.sync()
+        if batch:
+            run.put_threadsafe(run.batches, batch)
+
+
+    async def _story_worker(self, run):
+        """Stage 2: generate, number and save stories for each requirement batch"""
+        while True:
+            batch = await run.batches.get()
+            if batch is None:
+                return
+
+            try:
+                batch, stories = await executors.run('fanout', self._generate_stories, run, batch, reject=False)
+            except Exception as e:
+                self._report(run, 'stories', e)
+                continue
+
+            run.counts['stories'] += len(stories)
+            run.saved_stories.extend(story for story in stories if story.story_id is not None)
+            run.emit({'type': 'stories', 'req_codes': [req.req_code for req in batch], 'stories': stories})
+            for story in stories:
+                await run.stories.put(story)
+
+
+    @staticmethod
+    def _generate_stories(run, batch):
+        """
+        Generate, number and save the stories of one batch (worker thread)
+
+        Generation and saving share one task so pipeline work never waits
+        on a pool that a blocked extraction thread may be holding.
+        """
+        if APIConfig.REQUIREMENT_DEDUPE:
+            batch, merged = requirement_index.dedupe(batch)
+            run.merged.update(merged)
+
+        result = story_gen.generate(story_gen.format_requirements(batch), run.project_type)
+        with run.lock:
+            first_number = run.next_story_number
+            run.next_story_number += result['total_count']
+        stories = story_gen.merge_results([result], first_number=first_number)['stories']
+
+        # Link each story to the requirement it implements
+        by_requirement = story_gen.link_requirements(stories, batch)
+
+        for req_id, group in by_requirement.items():
+            for story, story_id in zip(group, db.save_user_stories(req_id, group)):
+                story.story_id = story_id
+        return batch, stories
+
+
+    async def _criteria_worker(self, run):
+        """Stage 3: generate and save acceptance criteria for each story"""
+        while True:
+            story = await run.stories.get()
+            if story is None:
+                return
+
+            try:
+                criteria = await executors.run('fanout', self._generate_criteria, story, reject=False)
+            except Exception as e:
+                self._report(run, 'criteria', e)
+                continue
+
+            run.counts['criteria'] += len(criteria)
+            run.emit({
+                'type': 'criteria',
+                'story_id': story.story_id,
+                'story_code': story.story_code,
+                'criteria': criteria
+            })
+
+
+    @staticmethod
+    def _generate_criteria(story):
+        """Generate and save acceptance criteria for one story (worker thread)"""
+        criteria = criteria_gen.generate(criteria_gen.story_text(story))['criteria']
+        if criteria and story.story_id is not None:
+            for scenario in criteria:
+                scenario.story_id = story.story_id
+            db.save_acceptance_criteria(story.story_id, criteria)
+        return criteria
+
+
+    @staticmethod
+    def _report(run, stage, error):
+        """Emit a stage failure; the pipeline carries on with the remaining items"""
+        print(f"Pipeline {stage} error: {str(error)}")
+        run.counts['errors'] += 1
+        if stage != 'criteria':
+            run.complete = False
+        event = {'type': 'error', 'stage': stage, 'detail': str(error)}
+        if isinstance(error, CircuitOpen):
+            event['retry_after'] = error.retry_after
+        run.emit(event)
+
+
+# Initialize pipeline instance
+pipeline = WorkflowPipeline()
@@ -0,0 +1,158 @@
+"""
+Project Exporter Module
+=======================
+Streams whole-project exports straight from the database:
+- JIRA CSV (one row per user story)
+- Gherkin (.feature file per story, zipped on the fly)
+- XLSX (stories and acceptance criteria sheets)
+
+Rows are read in chunks and written out as they arrive, so memory use
+stays flat no matter how many stories a project has.
+"""
+
+import csv
+import io
+import re
+import zipfile
+import tempfile
+from itertools import groupby
+
+from backend.core.database import db
+from backend.services.story_generator import UserStoryGenerator, JIRA_CSV_HEADER
+from backend.services.criteria_generator import AcceptanceCriteriaGenerator
+
+
+class _ChunkBuffer:
+    """Write-only, unseekable file object that hands out what was written"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and forget everything written so far"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ProjectExporter:
+    """Stream project stories and criteria in export formats"""
+
+    def __init__(self, database, chunk_size=500):
+        """
+        Args:
+            database: Database instance to read from
+            chunk_size: Rows fetched per database round trip
+        """
+        self.database = database
+        self.chunk_size = chunk_size
+
+
+    def stream_jira_csv(self, project_id):
+        """
+        Stream a JIRA import CSV for every story in a project
+
+        Yields:
+            CSV text chunks (header first)
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(JIRA_CSV_HEADER)
+
+        stories = self.database.iter_project_stories(project_id, self.chunk_size)
+        for count, story in enumerate(stories, 1):
+            writer.writerow(UserStoryGenerator.jira_csv_row(story))
+
+            if count % self.chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+
+    def stream_gherkin_zip(self, project_id):
+        """
+        Stream a zip archive with one .feature file per story
+
+        Yields:
+            Zip archive byte chunks
+        """
+        buffer = _ChunkBuffer()
+
+        with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            rows = self.database.iter_project_criteria(project_id, self.chunk_size)
+            for _, story_rows in groupby(rows, key=lambda r: r[0].story_id):
+                story_rows = list(story_rows)
+                story = story_rows[0][0]
+
+                criteria = [scenario for _, scenario in story_rows if scenario is not None]
+                feature = AcceptanceCriteriaGenerator.gherkin_feature(
+                    f"{story.story_code}: {story.title}" if story.story_code else story.title,
+                    criteria,
+                    description=story.user_story
+                )
+
+                archive.writestr(self._feature_file_name(story.story_id, story.story_code, story.title), feature)
+                yield buffer.drain()
+
+        yield buffer.drain()
+
+
+    def stream_xlsx(self, project_id):
+        """
+        Stream an XLSX workbook with Stories and Acceptance Criteria sheets
+
+        openpyxl's write-only mode spools rows to disk as they are appended,
+        and the finished workbook is streamed from a temporary file.
+
+        Yields:
+            Workbook byte chunks
+        """
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise Exception("XLSX export requires openpyxl. Install it with: pip install openpyxl")
+
+        workbook = Workbook(write_only=True)
+
+        stories_sheet = workbook.create_sheet("Stories")
+        stories_sheet.append(["Story ID", "Requirement", "Title", "User Story", "Priority",
+                              "Story Points", "Dependencies", "Notes"])
+        for s in self.database.iter_project_stories(project_id, self.chunk_size):
+            stories_sheet.append([s.story_code, s.req_code, s.title, s.user_story, s.priority,
+                                  s.story_points, s.dependencies, s.notes])
+
+        criteria_sheet = workbook.create_sheet("Acceptance Criteria")
+        criteria_sheet.append(["Story ID", "Scenario", "Given", "When", "Then"])
+        for story, c in self.database.iter_project_criteria(project_id, self.chunk_size):
+            if c is not None:
+                criteria_sheet.append([story.story_code, c.scenario_name, c.given, c.when, c.then])
+
+        with tempfile.TemporaryFile() as temp_file:
+            workbook.save(temp_file)
+            temp_file.seek(0)
+            while True:
+                chunk = temp_file.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+
+
+    @staticmethod
+    def _feature_file_name(story_id, story_code, title):
+        """Build a safe, unique .feature file name for a story"""
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', title or '').strip('_').lower()[:50]
+        prefix = story_code or f"story_{story_id}"
+        return f"{prefix}_{story_id}_{slug or 'story'}.feature"
+
+
+# Initialize exporter instance
+project_exporter = ProjectExporter(db)
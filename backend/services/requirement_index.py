@@ -0,0 +1,421 @@
+"""
+Requirement Index Module
+========================
+Local TF-IDF vector index over requirements.description, used to detect
+near-duplicate requirements ("User shall log in with email" vs.
+"Users must be able to log in via email") and collapse them before
+story generation.
+
+The index lives in the database's local state directory as a compressed
+NumPy archive and is synced incrementally from the requirements table.
+Terms are hashed into a fixed feature space, so new requirements never
+force a refit; IDF weights are recomputed from stored document
+frequencies at query time.
+"""
+
+import re
+import os
+import zlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from backend.core.config import APIConfig
+from backend.core.database import db
+
+
+# Words that carry no meaning for requirement similarity
+STOP_WORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'with', 'via',
+    'by', 'from', 'at', 'as', 'into', 'be', 'is', 'are', 'was', 'been', 'being',
+    'shall', 'must', 'should', 'will', 'would', 'can', 'could', 'may', 'might',
+    'able', 'allow', 'allowed', 'need', 'needs', 'have', 'has', 'it', 'its',
+    'their', 'they', 'them', 'this', 'that', 'these', 'those', 'all', 'any',
+    'system', 'application', 'app'
+}
+
+
+class RequirementIndex:
+    """Hashed TF-IDF index over requirement descriptions"""
+
+    def __init__(self, database, n_features=2 ** 14):
+        """
+        Initialize index and load persisted vectors
+
+        Args:
+            database: Database instance the index mirrors
+            n_features: Size of the hashed feature space
+        """
+        self.database = database
+        self.n_features = n_features
+        self.index_path = Path(database.state_dir) / 'ba_copilot.req_index.npz'
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+
+    def _reset(self):
+        """Empty in-memory index (CSR layout of raw term frequencies)"""
+        self.req_ids = np.zeros(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.float32)
+        self.df = np.zeros(self.n_features, dtype=np.float64)
+
+
+    # ========================================
+    # PERSISTENCE
+    # ========================================
+
+    def _load(self):
+        """Load index from disk if present and compatible"""
+        if not self.index_path.exists():
+            return
+
+        try:
+            with np.load(self.index_path) as archive:
+                if int(archive['n_features']) != self.n_features:
+                    print("Requirement index feature size changed, rebuilding")
+                    return
+                self.req_ids = archive['req_ids']
+                self.indptr = archive['indptr']
+                self.indices = archive['indices']
+                self.data = archive['data']
+                self.df = archive['df']
+        except Exception as e:
+            print(f"Could not load requirement index, rebuilding: {str(e)}")
+            self._reset()
+
+
+    def _save(self):
+        """Atomically write index to the local state directory"""
+        tmp_path = self.index_path.with_suffix('.tmp.npz')
+        np.savez_compressed(
+            tmp_path,
+            n_features=np.int64(self.n_features),
+            req_ids=self.req_ids,
+            indptr=self.indptr,
+            indices=self.indices,
+            data=self.data,
+            df=self.df
+        )
+        os.replace(tmp_path, self.index_path)
+
+
+    # ========================================
+    # VECTORIZATION
+    # ========================================
+
+    @staticmethod
+    def _tokenize(text):
+        """
+        Normalize text into unigram and bigram terms
+
+        Args:
+            text: Requirement description
+
+        Returns:
+            List of terms
+        """
+        words = []
+        for word in re.findall(r'[a-z0-9]+', (text or '').lower()):
+            if word in STOP_WORDS:
+                continue
+            # Light stemming so "users"/"user" and "logging"/"log" collide
+            if len(word) > 5 and word.endswith('ing'):
+                word = RequirementIndex._undouble(word[:-3])
+            elif len(word) > 4 and word.endswith('ed'):
+                word = RequirementIndex._undouble(word[:-2])
+            elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+                word = word[:-1]
+            words.append(word)
+
+        bigrams = [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return words + bigrams
+
+
+    @staticmethod
+    def _undouble(stem):
+        """Drop the consonant doubled before -ing/-ed, e.g. "logg" -> "log" (but not "call" or "pass")"""
+        if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in 'aeiouylsz':
+            return stem[:-1]
+        return stem
+
+
+    def _vectorize(self, texts):
+        """
+        Hash texts into CSR term-frequency arrays
+
+        Args:
+            texts: List of strings
+
+        Returns:
+            (indptr, indices, data) with sublinear term frequencies
+        """
+        indptr = [0]
+        indices = []
+        data = []
+
+        for text in texts:
+            counts = {}
+            for term in self._tokenize(text):
+                bucket = zlib.crc32(term.encode('utf-8')) % self.n_features
+                counts[bucket] = counts.get(bucket, 0) + 1
+
+            for bucket in sorted(counts):
+                indices.append(bucket)
+                data.append(1.0 + np.log(counts[bucket]))
+            indptr.append(len(indices))
+
+        return (
+            np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(data, dtype=np.float32)
+        )
+
+
+    def _idf(self):
+        """Smoothed inverse document frequency for every hashed feature"""
+        n_docs = len(self.req_ids)
+        return (np.log((1.0 + n_docs) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+
+    def _dense(self, indptr, indices, data, idf):
+        """
+        Build L2-normalized dense TF-IDF rows for a small batch
+
+        Returns:
+            Matrix of shape (rows, n_features)
+        """
+        rows = len(indptr) - 1
+        matrix = np.zeros((rows, self.n_features), dtype=np.float32)
+        row_ids = np.repeat(np.arange(rows), np.diff(indptr))
+        matrix[row_ids, indices] = data * idf[indices]
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+    # ========================================
+    # SYNC WITH DATABASE
+    # ========================================
+
+    def sync(self, changed_ids=None):
+        """
+        Bring index in line with the requirements table
+
+        New rows are appended incrementally; rows deleted from the
+        database (e.g. by delete_project) are dropped from the index.
+
+        Args:
+            changed_ids: req_ids whose description may have been updated
+                in place (re-saved requirements) and must be re-indexed
+
+        Returns:
+            Number of rows added
+        """
+        with self._lock:
+            # Re-saved requirements are dropped here and re-read below
+            stale = np.isin(self.req_ids, np.asarray(changed_ids or [], dtype=np.int64))
+            if stale.any():
+                stale_ids = [int(i) for i in self.req_ids[stale]]
+                self._drop(stale)
+                refreshed = self.database.get_requirement_texts(req_ids=stale_ids)
+                if refreshed:
+                    self._append([r[0] for r in refreshed], [r[1] for r in refreshed])
+
+            last_id = int(self.req_ids.max()) if len(self.req_ids) else 0
+            new_rows = self.database.get_requirement_texts(after_id=last_id)
+            added = len(new_rows)
+
+            # Deleted rows, and rows below last_id that committed late (other
+            # instances sharing a PostgreSQL database), show up as a count mismatch
+            changed = False
+            if self.database.count_requirements(last_id) != len(self.req_ids):
+                live_ids = np.asarray(self.database.get_requirement_ids(last_id), dtype=np.int64)
+                self._drop(~np.isin(self.req_ids, live_ids))
+                missing = live_ids[~np.isin(live_ids, self.req_ids)]
+                if len(missing):
+                    late_rows = self.database.get_requirement_texts(req_ids=[int(i) for i in missing])
+                    self._append([r[0] for r in late_rows], [r[1] for r in late_rows])
+                    added += len(late_rows)
+                changed = True
+
+            if new_rows:
+                self._append([r[0] for r in new_rows], [r[1] for r in new_rows])
+
+            if new_rows or changed or stale.any():
+                self._save()
+
+            return added
+
+
+    def _append(self, req_ids, descriptions):
+        """Append vectors for new requirements"""
+        indptr, indices, data = self._vectorize(descriptions)
+
+        self.req_ids = np.concatenate([self.req_ids, np.asarray(req_ids, dtype=np.int64)])
+        self.indptr = np.concatenate([self.indptr, indptr[1:] + self.indptr[-1]])
+        self.indices = np.concatenate([self.indices, indices])
+        self.data = np.concatenate([self.data, data])
+        self.df += np.bincount(indices, minlength=self.n_features)
+
+
+    def _drop(self, mask):
+        """Remove rows where mask is True"""
+        lengths = np.diff(self.indptr)
+        entry_mask = np.repeat(mask, lengths)
+
+        self.df -= np.bincount(self.indices[entry_mask], minlength=self.n_features)
+        self.req_ids = self.req_ids[~mask]
+        self.indices = self.indices[~entry_mask]
+        self.data = self.data[~entry_mask]
+        self.indptr = np.concatenate([[0], np.cumsum(lengths[~mask])]).astype(np.int64)
+
+
+    # ========================================
+    # SIMILARITY QUERIES
+    # ========================================
+
+    def similarity_matrix(self, texts_a, texts_b=None):
+        """
+        Batch cosine similarity between two lists of texts
+
+        Args:
+            texts_a: List of strings
+            texts_b: List of strings (defaults to texts_a)
+
+        Returns:
+            NumPy array of shape (len(texts_a), len(texts_b))
+        """
+        idf = self._idf()
+        a = self._dense(*self._vectorize(texts_a), idf)
+        b = a if texts_b is None else self._dense(*self._vectorize(texts_b), idf)
+        return a @ b.T
+
+
+    def query(self, texts, top_k=5, threshold=None, candidate_ids=None, chunk_size=256):
+        """
+        Find indexed requirements most similar to each text
+
+        Args:
+            texts: List of query strings
+            top_k: Maximum matches per query
+            threshold: Minimum cosine similarity (defaults to config)
+            candidate_ids: Optional iterable of req_ids to restrict the search
+            chunk_size: Indexed rows scored per matrix multiply
+
+        Returns:
+            List (one per text) of [(req_id, score), ...] sorted by score
+        """
+        if threshold is None:
+            threshold = APIConfig.DEDUPE_SIMILARITY_THRESHOLD
+
+        with self._lock:
+            if not texts or not len(self.req_ids):
+                return [[] for _ in texts]
+
+            rows = np.arange(len(self.req_ids))
+            if candidate_ids is not None:
+                rows = rows[np.isin(self.req_ids, np.fromiter(candidate_ids, dtype=np.int64))]
+
+            idf = self._idf()
+            queries = self._dense(*self._vectorize(texts), idf)
+
+            best_scores = np.full((len(texts), 0), -1.0, dtype=np.float32)
+            best_rows = np.zeros((len(texts), 0), dtype=np.int64)
+
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+
+                # Slice CSR rows for this chunk and densify them
+                lengths = self.indptr[chunk + 1] - self.indptr[chunk]
+                offsets = np.repeat(self.indptr[chunk] - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+                positions = np.arange(lengths.sum()) + offsets
+                chunk_indptr = np.concatenate([[0], np.cumsum(lengths)])
+                matrix = self._dense(chunk_indptr, self.indices[positions], self.data[positions], idf)
+
+                scores = queries @ matrix.T
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, np.broadcast_to(chunk, scores.shape)], axis=1)
+
+                # Keep only the running top_k per query
+                if best_scores.shape[1] > top_k:
+                    keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            results = []
+            for scores, row_ids in zip(best_scores, best_rows):
+                order = np.argsort(-scores)
+                results.append([
+                    (int(self.req_ids[row_ids[i]]), float(scores[i]))
+                    for i in order if scores[i] >= threshold
+                ])
+
+            return results
+
+
+    # ========================================
+    # DEDUPLICATION
+    # ========================================
+
+    def dedupe(self, requirements, threshold=None):
+        """
+        Collapse clusters of near-duplicate requirements
+
+        Requirements are only merged with others of the same type. Each
+        cluster is represented by its first member in input order.
+
+        Args:
+            requirements: Requirement models as returned by
+                Database.get_requirements
+            threshold: Minimum cosine similarity (defaults to config)
+
+        Returns:
+            (kept_requirements, merged) where merged maps each kept
+            req_code to the list of req_codes collapsed into it
+        """
+        if threshold is None:
+            threshold = APIConfig.DEDUPE_SIMILARITY_THRESHOLD
+
+        if len(requirements) < 2:
+            return list(requirements), {}
+
+        similarity = self.similarity_matrix([r.description for r in requirements])
+        types = np.array([r.req_type for r in requirements])
+
+        pairs = np.argwhere(
+            np.triu(similarity >= threshold, k=1) & (types[:, None] == types[None, :])
+        )
+
+        # Union-find so transitive near-duplicates end up in one cluster
+        parent = list(range(len(requirements)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in pairs:
+            root_i, root_j = find(int(i)), find(int(j))
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        kept = []
+        merged = {}
+        for idx, req in enumerate(requirements):
+            root = find(idx)
+            if root == idx:
+                kept.append(req)
+            else:
+                merged.setdefault(requirements[root].req_code, []).append(req.req_code)
+
+        return kept, merged
+
+
+# Initialize index instance
+requirement_index = RequirementIndex(db)
@@ -11,7 +11,100 @@ Input Text → Extract Requirements
 import google.generativeai as genai
 from backend.core.config import APIConfig
 from utils.prompts import PromptTemplates
+from utils.text_compaction import TextCompactor
+from backend.services.model_router import model_router
+from backend.core.circuit_breaker import gemini_breaker, CircuitOpen
+from backend.core.models import Requirement
+from backend.core.tracing import span, traced, current_span
+from dataclasses import replace
 import re
+import time
+
+
+# One requirement line as the extraction prompt asks for it:
+# "- FR-001: ...", "FR-001: ..." or "**FR-001**: ..."
+STREAM_ITEM_PATTERN = re.compile(r'^(?:[-*•]\s*)?(?:\*\*)?(NFR|FR)-?\d+(?:\*\*)?\s*:\s*(.*)$')
+
+
+class RequirementStreamParser:
+    """
+    Incremental parser for a streamed extraction response
+    
+    Text is fed as it arrives; a requirement is emitted once it is known
+    to be complete, i.e. when the next item, a heading or a blank line
+    starts (continuation lines are joined). Codes are renumbered
+    sequentially so they stay unique across input chunks.
+    """
+    
+    def __init__(self):
+        self.buffer = ''
+        self.pending = None   # [prefix, description] of the item being read
+        self.counts = {'FR': 0, 'NFR': 0}
+    
+    
+    def feed(self, text):
+        """Add streamed text; returns the requirements completed by it"""
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split('\n')
+        completed = []
+        for line in lines:
+            completed.extend(self._line(line.strip()))
+        return completed
+    
+    
+    def close(self):
+        """End of a response; returns the requirements still pending"""
+        completed = self._line(self.buffer.strip())
+        self.buffer = ''
+        return completed + self._flush()
+    
+    
+    def discard(self):
+        """Drop partial text of a response that failed midway"""
+        self.buffer = ''
+        self.pending = None
+    
+    
+    def renumber(self, requirements):
+        """Requirements parsed by the regular path, numbered to follow the streamed ones"""
+        renumbered = []
+        for req in requirements['functional'] + requirements['non_functional']:
+            renumbered.append(self._requirement('FR' if req.req_type == 'Functional' else 'NFR', req.description))
+        return renumbered
+    
+    
+    def _line(self, line):
+        match = STREAM_ITEM_PATTERN.match(line)
+        if match:
+            completed = self._flush()
+            self.pending = [match.group(1), match.group(2)]
+            return completed
+        if not line or line.startswith('#'):
+            return self._flush()
+        if self.pending:
+            self.pending[1] += ' ' + line
+        return []
+    
+    
+    def _flush(self):
+        if self.pending is None:
+            return []
+        prefix, description = self.pending
+        self.pending = None
+        description = ' '.join(description.split())
+        # Same minimum as _extract_requirement_items
+        if len(description) <= 10:
+            return []
+        return [self._requirement(prefix, description)]
+    
+    
+    def _requirement(self, prefix, description):
+        self.counts[prefix] += 1
+        return Requirement(
+            req_code=f"{prefix}-{self.counts[prefix]:03d}",
+            req_type='Functional' if prefix == 'FR' else 'Non-Functional',
+            description=description
+        )
 
 
 class RequirementsExtractor:
@@ -22,22 +115,17 @@ class RequirementsExtractor:
         self.api_configured = False
         
         try:
-            # Configure Gemini API
+            # Configure Gemini API (models are chosen per call by model_router)
             genai.configure(api_key=APIConfig.GEMINI_API_KEY)
             
-            # Initialize model
-            self.model = genai.GenerativeModel(
-                model_name=APIConfig.GEMINI_MODEL,
-                generation_config=APIConfig.GEMINI_CONFIG
-            )
-            
             self.api_configured = True
         
         except Exception as e:
             print(f"Gemini API configuration error: {str(e)}")
     
     
-    def extract(self, raw_text, project_type="General", industry="General"):
+    @traced('requirements.extract')
+    def extract(self, raw_text, project_type="General", industry="General", transcript=False):
         """
         Extract requirements from raw text
     
@@ -45,48 +133,86 @@ class RequirementsExtractor:
             raw_text: Meeting transcript or document text
             project_type: Type of project (Web, Mobile, Desktop, etc.)
             industry: Industry domain (Finance, Healthcare, etc.)
+            transcript: True for speech transcripts (fillers are stripped)
         
         Returns:
             Dictionary with extracted requirements
         """
         if not self.api_configured:
             raise Exception("Gemini API not configured. Please add API key to api_config.py")
+        
+        # Compact input and keep each request within the token budget
+        text, stats = TextCompactor.compact(raw_text, transcript)
+        chunks = TextCompactor.split_to_budget(text, APIConfig.PROMPT_TOKEN_BUDGET)
+        
+        if len(chunks) > APIConfig.PROMPT_MAX_CHUNKS:
+            print(f"Input needs {len(chunks)} chunks, trimming to {APIConfig.PROMPT_MAX_CHUNKS}")
+            chunks = chunks[:APIConfig.PROMPT_MAX_CHUNKS]
+            stats['trimmed'] = True
+        
+        print(f"Input compacted: {stats['original_tokens']} -> {stats['compacted_tokens']} estimated tokens "
+              f"({len(chunks)} chunk{'s' if len(chunks) != 1 else ''})")
+        
+        results = []
+        prompt_tokens = []
+        for chunk in chunks:
+            prefix, suffix = PromptTemplates.requirements_extractor_parts(
+                chunk, project_type, industry,
+                include_example=APIConfig.PROMPT_INCLUDE_EXAMPLES
+            )
+            prompt_tokens.append(TextCompactor.estimate_tokens(prefix + suffix))
+            results.append(self._extract_chunk(prefix, suffix))
+        
+        requirements = results[0] if len(results) == 1 else self._merge_results(results)
+        requirements['token_usage'] = {
+            **stats,
+            'chunks': len(chunks),
+            'estimated_prompt_tokens': prompt_tokens
+        }
+        
+        return requirements
     
-        import time
+    
+    @traced('requirements.extract_chunk')
+    def _extract_chunk(self, prefix, suffix):
+        """
+        Call Gemini for one prompt and parse the response, retrying on overload
+        
+        Args:
+            prefix: Cacheable leading part of the extraction prompt
+            suffix: Per-request remainder of the prompt
+            
+        Returns:
+            Dictionary with extracted requirements
+        """
         max_retries = 3
         retry_delay = 2  # seconds
     
         for attempt in range(max_retries):
+            current_span().set_attribute('gemini.attempts', attempt + 1)
             try:
-                # Generate prompt
-                prompt = PromptTemplates.requirements_extractor(raw_text, project_type, industry)
-            
                 # Call Gemini API
                 print(f"Calling Gemini API (attempt {attempt + 1}/{max_retries})...")
-                response = self.model.generate_content(prompt)
+                route, response = model_router.generate('requirements', prefix, suffix)
                 raw_output = response.text
-                print(f"Got response from Gemini: {len(raw_output)} characters")
+                print(f"Got response from {route.model_name}: {len(raw_output)} characters")
             
-                # Parse the response
-                requirements = self._parse_requirements(raw_output)
-                requirements['raw_output'] = raw_output
-            
-                # If parsing failed, try alternative parsing
-                if requirements['total_count'] == 0:
-                    print("Warning: Standard parsing found no requirements. Trying alternative parsing...")
-                    requirements = self._alternative_parse(raw_output)
-            
-                return requirements
+                return self._parse_response(route, raw_output)
         
+            except CircuitOpen:
+                raise
             except Exception as e:
                 error_msg = str(e)
             
                 # Check if it's a 503 overload error
                 if "503" in error_msg or "overloaded" in error_msg.lower():
                     if attempt < max_retries - 1:
+                        # Give up now if this failure tripped the breaker
+                        gemini_breaker.check()
                         wait_time = retry_delay * (attempt + 1)  # Exponential backoff
                         print(f"Model overloaded. Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
+                        with span('gemini.retry_sleep', seconds=wait_time):
+                            time.sleep(wait_time)
                         continue
                     else:
                         print("Max retries reached. Model is still overloaded.")
@@ -98,6 +224,134 @@ class RequirementsExtractor:
     
         raise Exception("Failed to extract requirements after multiple retries")
     
+    
+    def _parse_response(self, route, raw_output):
+        """
+        Parse a complete extraction response, falling back to alternative
+        parsing and then to a repair call when nothing is found
+        
+        Args:
+            route: Route the response came from
+            raw_output: Raw AI response text
+            
+        Returns:
+            Dictionary with extracted requirements
+        """
+        # Parse the response
+        requirements = self._parse_requirements(raw_output)
+        requirements['raw_output'] = raw_output
+    
+        # If parsing failed, try alternative parsing
+        if requirements['total_count'] == 0:
+            print("Warning: Standard parsing found no requirements. Trying alternative parsing...")
+            requirements = self._alternative_parse(raw_output)
+            requirements['raw_output'] = raw_output
+        
+        model_router.record_result(route, requirements['total_count'])
+        
+        # Still nothing: have the repair model reformat the response
+        if requirements['total_count'] == 0:
+            repaired, repaired_text = model_router.repair('requirements', raw_output, self._parse_requirements)
+            if repaired:
+                requirements = {**repaired, 'raw_output': repaired_text, 'repaired': True}
+        
+        return requirements
+    
+    
+    def extract_stream(self, raw_text, project_type="General", industry="General", transcript=False):
+        """
+        Extract requirements, yielding each batch as soon as it is parsed
+        from the streamed model response
+        
+        Codes are numbered across chunks like extract(). When streaming
+        fails before any requirement arrived, or the stream holds nothing
+        parseable line by line, the chunk goes through the regular
+        (retrying, repairing) path instead.
+        
+        Args:
+            raw_text: Meeting transcript or document text
+            project_type: Type of project (Web, Mobile, Desktop, etc.)
+            industry: Industry domain (Finance, Healthcare, etc.)
+            transcript: True for speech transcripts (fillers are stripped)
+            
+        Yields:
+            Lists of Requirement models
+        """
+        if not self.api_configured:
+            raise Exception("Gemini API not configured. Please add API key to api_config.py")
+        
+        text, stats = TextCompactor.compact(raw_text, transcript)
+        chunks = TextCompactor.split_to_budget(text, APIConfig.PROMPT_TOKEN_BUDGET)[:APIConfig.PROMPT_MAX_CHUNKS]
+        parser = RequirementStreamParser()
+        
+        for chunk in chunks:
+            prefix, suffix = PromptTemplates.requirements_extractor_parts(
+                chunk, project_type, industry,
+                include_example=APIConfig.PROMPT_INCLUDE_EXAMPLES
+            )
+            found = 0
+            try:
+                with span('requirements.extract_stream', **{'input.characters': len(chunk)}) as current:
+                    started = time.monotonic()
+                    route, response = model_router.generate('requirements', prefix, suffix, stream=True)
+                    raw_parts = []
+                    for part in response:
+                        raw_parts.append(part.text)
+                        batch = parser.feed(part.text)
+                        found += len(batch)
+                        if batch:
+                            yield batch
+                    batch = parser.close()
+                    found += len(batch)
+                    if batch:
+                        yield batch
+                    model_router.record_latency(route, time.monotonic() - started)
+                    current.set_attribute('output.items', found)
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                if found:
+                    raise Exception(f"Requirements extraction error: {str(e)}")
+                print(f"Streaming extraction failed before any requirement ({str(e)}), retrying without streaming")
+                parser.discard()
+                yield parser.renumber(self._extract_chunk(prefix, suffix))
+                continue
+            
+            if not found:
+                # _parse_response records the route's result itself
+                yield parser.renumber(self._parse_response(route, ''.join(raw_parts)))
+            else:
+                model_router.record_result(route, found)
+    
+    
+    def _merge_results(self, results):
+        """
+        Merge per-chunk extraction results, renumbering requirement codes
+        
+        Args:
+            results: List of dictionaries from _extract_chunk
+            
+        Returns:
+            Single requirements dictionary
+        """
+        functional = []
+        non_functional = []
+        
+        for result in results:
+            for req in result['functional']:
+                functional.append(replace(req, req_code=f"FR-{len(functional) + 1:03d}"))
+            for req in result['non_functional']:
+                non_functional.append(replace(req, req_code=f"NFR-{len(non_functional) + 1:03d}"))
+        
+        return {
+            'functional': functional,
+            'non_functional': non_functional,
+            'total_count': len(functional) + len(non_functional),
+            'raw_output': '\n\n'.join(r.get('raw_output', '') for r in results)
+        }
+    
+
+    @traced('requirements.parse_output')
     def _parse_requirements(self, text):
         """
         Parse AI output into structured requirements
@@ -141,7 +395,7 @@ class RequirementsExtractor:
             req_prefix: Requirement prefix (FR or NFR)
             
         Returns:
-            List of requirement dictionaries
+            List of Requirement models
         """
         requirements = []
         
@@ -190,11 +444,11 @@ class RequirementsExtractor:
                     
                     # Only add if description is meaningful
                     if description and len(description) > 10:
-                        requirements.append({
-                            'req_code': req_code,
-                            'req_type': 'Functional' if req_prefix == 'FR' else 'Non-Functional',
-                            'description': description
-                        })
+                        requirements.append(Requirement(
+                            req_code=req_code,
+                            req_type='Functional' if req_prefix == 'FR' else 'Non-Functional',
+                            description=description
+                        ))
             except (IndexError, AttributeError) as e:
                 print(f"Error processing match {idx}: {e}")
                 continue
@@ -245,18 +499,18 @@ class RequirementsExtractor:
                 description = line.lstrip('-*•').strip()
                 
                 if in_functional_section:
-                    functional.append({
-                        'req_code': f'FR-{fr_count:03d}',
-                        'req_type': 'Functional',
-                        'description': description
-                    })
+                    functional.append(Requirement(
+                        req_code=f'FR-{fr_count:03d}',
+                        req_type='Functional',
+                        description=description
+                    ))
                     fr_count += 1
                 elif in_nonfunctional_section:
-                    non_functional.append({
-                        'req_code': f'NFR-{nfr_count:03d}',
-                        'req_type': 'Non-Functional',
-                        'description': description
-                    })
+                    non_functional.append(Requirement(
+                        req_code=f'NFR-{nfr_count:03d}',
+                        req_type='Non-Functional',
+                        description=description
+                    ))
                     nfr_count += 1
         
         return {
@@ -282,13 +536,13 @@ class RequirementsExtractor:
         if requirements['functional']:
             output.append("## 📋 Functional Requirements\n")
             for req in requirements['functional']:
-                output.append(f"**{req['req_code']}**: {req['description']}\n")
+                output.append(f"**{req.req_code}**: {req.description}\n")
         
         # Non-functional requirements
         if requirements['non_functional']:
             output.append("\n## ⚙️ Non-Functional Requirements\n")
             for req in requirements['non_functional']:
-                output.append(f"**{req['req_code']}**: {req['description']}\n")
+                output.append(f"**{req.req_code}**: {req.description}\n")
         
         # Summary
         output.append(f"\n---\n**Total Requirements**: {requirements['total_count']} ")
@@ -0,0 +1,511 @@
+"""
+Scratch Space
+=============
+Bounded lifecycle management for the local temp files and Gemini File
+API uploads made while transcribing audio.
+
+Cleanup used to live only in finally blocks, so a crashed or killed
+worker leaked both. Now:
+
+- Local files are written to a per-process directory under SCRATCH_DIR
+  (default: "scratch" in the database's local state directory). The
+  directories of all processes on the node together are limited to
+  SCRATCH_MAX_MB; writes beyond that are refused with 503 + Retry-After.
+- Each process holds an OS lock on an owner file in its directory for
+  its lifetime. A directory whose lock can be taken belongs to a dead
+  process, and is an orphan.
+- Every upload is recorded in a SQLite ledger (next to the scratch
+  directories) under a generated display name before it starts. Remote
+  storage is limited to REMOTE_FILES_MAX_MB; over it, uploads are refused
+  and the transcriber falls back to sending audio inline.
+- A sweeper thread (every SCRATCH_SWEEP_INTERVAL_SECONDS, and once at
+  startup) deletes orphaned directories and their remote files, files
+  older than SCRATCH_MAX_AGE_SECONDS, and remote deletions that failed
+  earlier. Uploads whose remote name was never learned (the process died
+  mid-upload) are found by display name through list_files.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import google.generativeai as genai
+
+from backend.core.config import APIConfig
+from backend.core.database import db
+from backend.core.executors import ExecutorSaturated
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+OWNER_LOCK = 'owner.lock'
+
+# Gemini deletes uploaded files by itself after 48 hours
+REMOTE_FILE_LIFETIME_SECONDS = 48 * 3600
+
+# Display name prefix of our uploads
+DISPLAY_NAME_PREFIX = 'ba-copilot-'
+
+
+class ScratchSpaceFull(ExecutorSaturated):
+    """
+    The local scratch quota is used up
+
+    Subclasses ExecutorSaturated so the API answers 503 + Retry-After.
+    """
+
+    def __init__(self, retry_after):
+        self.pool_name = 'scratch'
+        self.retry_after = retry_after
+        Exception.__init__(self, f"Temporary storage is full. Retry in {retry_after}s.")
+
+
+class RemoteQuotaExceeded(Exception):
+    """Uploading would exceed REMOTE_FILES_MAX_MB"""
+
+
+def _lock(handle):
+    """Take an exclusive lock without blocking; False if another process holds it"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(handle):
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+
+
+class ScratchSpace:
+    """Quota-limited temp directory plus a ledger of remote uploads"""
+
+    def __init__(self, root, max_bytes, remote_max_bytes):
+        """
+        Args:
+            root: Directory holding one scratch directory per process
+            max_bytes: Local limit across all processes on the node
+            remote_max_bytes: Limit on ledgered remote uploads
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.remote_max_bytes = remote_max_bytes
+        self.max_age = APIConfig.SCRATCH_MAX_AGE_SECONDS
+        self.sweep_interval = APIConfig.SCRATCH_SWEEP_INTERVAL_SECONDS
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.dir = self.root / self.owner
+        self.ledger_path = self.root / 'remote_files.db'
+
+        self._lock = threading.Lock()
+        self._owner_handle = None
+        self._stop = None
+        self._thread = None
+        self.stats = {'written': 0, 'rejected': 0, 'uploaded': 0, 'remote_rejected': 0,
+                      'swept_files': 0, 'swept_dirs': 0, 'swept_remote': 0}
+
+
+    # ----------------------------------------
+    # Ownership
+    # ----------------------------------------
+
+    def _ensure_dir(self):
+        """Create this process's directory and take its owner lock"""
+        if self._owner_handle is not None:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        handle = open(self.dir / OWNER_LOCK, 'a+')
+        if not _lock(handle):
+            handle.close()
+            raise OSError(f"Scratch directory {self.dir} is locked by another process")
+        self._owner_handle = handle
+        self._init_ledger()
+
+
+    def _orphaned(self, directory):
+        """
+        True if no live process owns directory (lock acquirable, or no lock
+        file at all); the lock is released again right away
+        """
+        lock_path = directory / OWNER_LOCK
+        if not lock_path.exists():
+            return True
+        try:
+            with open(lock_path, 'a+') as handle:
+                if not _lock(handle):
+                    return False
+                _unlock(handle)
+                return True
+        except OSError:
+            return False
+
+
+    # ----------------------------------------
+    # Ledger
+    # ----------------------------------------
+
+    def _connect(self):
+        conn = sqlite3.connect(self.ledger_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+
+    def _init_ledger(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS remote_files (
+                    display_name TEXT PRIMARY KEY,
+                    name TEXT,
+                    owner TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    delete_pending INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+        conn.close()
+
+
+    # ----------------------------------------
+    # Local files
+    # ----------------------------------------
+
+    def write(self, data, suffix=''):
+        """
+        Write data to a new scratch file
+
+        Args:
+            data: Bytes to write
+            suffix: File name suffix (e.g. ".wav")
+
+        Returns:
+            Path of the file (str); pass it to release() when done
+
+        Raises:
+            ScratchSpaceFull: If the node's scratch quota would be exceeded
+        """
+        with self._lock:
+            self._ensure_dir()
+            if self.used_bytes() + len(data) > self.max_bytes:
+                # Expired files may be all that stands in the way
+                self._sweep_own_files()
+                if self.used_bytes() + len(data) > self.max_bytes:
+                    self.stats['rejected'] += 1
+                    raise ScratchSpaceFull(retry_after=max(1, int(self.sweep_interval // 10)))
+
+            path = self.dir / f"{uuid.uuid4().hex}{suffix}"
+            path.write_bytes(data)
+            self.stats['written'] += 1
+        return str(path)
+
+
+    def release(self, path):
+        """Delete a scratch file (missing files are fine)"""
+        if not path:
+            return
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # The sweeper removes it once it expires
+            print(f"⚠️ Could not delete scratch file: {str(e)}")
+
+
+    def used_bytes(self):
+        """Size of all scratch files on the node"""
+        total = 0
+        for directory in self._owner_dirs():
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name != OWNER_LOCK:
+                    try:
+                        total += entry.stat().st_size
+                    except OSError:
+                        continue
+        return total
+
+
+    def _owner_dirs(self):
+        try:
+            return [p for p in self.root.iterdir() if p.is_dir()]
+        except OSError:
+            return []
+
+
+    # ----------------------------------------
+    # Remote files
+    # ----------------------------------------
+
+    def upload(self, path, mime_type, upload_file):
+        """
+        Upload a scratch file with a ledger entry around it
+
+        Args:
+            path: Local file
+            mime_type: MIME type of the file
+            upload_file: Callable with genai.upload_file's keyword arguments
+
+        Returns:
+            The uploaded file (pass it to delete_remote() when done)
+
+        Raises:
+            RemoteQuotaExceeded: If the upload would exceed REMOTE_FILES_MAX_MB
+        """
+        with self._lock:
+            self._ensure_dir()
+        size = os.path.getsize(path)
+        display_name = f"{DISPLAY_NAME_PREFIX}{uuid.uuid4().hex}"
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                used = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM remote_files").fetchone()[0]
+                if used + size > self.remote_max_bytes:
+                    self.stats['remote_rejected'] += 1
+                    raise RemoteQuotaExceeded(
+                        f"Remote file storage limit reached ({used // (1024 * 1024)} MB in use)"
+                    )
+                conn.execute(
+                    "INSERT INTO remote_files (display_name, owner, size_bytes, created_at) VALUES (?, ?, ?, ?)",
+                    (display_name, self.owner, size, time.time())
+                )
+
+            try:
+                remote = upload_file(path=path, mime_type=mime_type, display_name=display_name)
+            except Exception:
+                # It may exist remotely without us knowing its name; the
+                # sweeper finds it by display name
+                with conn:
+                    conn.execute("UPDATE remote_files SET delete_pending = 1 WHERE display_name = ?", (display_name,))
+                raise
+
+            with conn:
+                conn.execute("UPDATE remote_files SET name = ? WHERE display_name = ?", (remote.name, display_name))
+        finally:
+            conn.close()
+
+        self.stats['uploaded'] += 1
+        return remote
+
+
+    def delete_remote(self, remote_file):
+        """Delete an uploaded file; failures are left to the sweeper"""
+        if remote_file is None:
+            return
+        if self._delete_remote_name(remote_file.name):
+            print("🧹 Audio file cleaned up from Gemini")
+            self._forget(name=remote_file.name)
+        else:
+            conn = self._connect()
+            with conn:
+                conn.execute("UPDATE remote_files SET delete_pending = 1 WHERE name = ?", (remote_file.name,))
+            conn.close()
+
+
+    @staticmethod
+    def _delete_remote_name(name):
+        """Delete a remote file by name; True when it is gone"""
+        if not hasattr(genai, 'delete_file'):
+            return False
+        try:
+            genai.delete_file(name)
+            return True
+        except Exception as e:
+            if 'not found' in str(e).lower() or '404' in str(e) or 'NotFound' in type(e).__name__:
+                return True
+            print(f"⚠️ Could not cleanup remote file {name}: {str(e)}")
+            return False
+
+
+    def _forget(self, name=None, display_name=None):
+        conn = self._connect()
+        with conn:
+            if name is not None:
+                conn.execute("DELETE FROM remote_files WHERE name = ?", (name,))
+            else:
+                conn.execute("DELETE FROM remote_files WHERE display_name = ?", (display_name,))
+        conn.close()
+
+
+    # ----------------------------------------
+    # Sweeping
+    # ----------------------------------------
+
+    def start(self):
+        """Reconcile orphans now and start the periodic sweeper (called on startup)"""
+        try:
+            with self._lock:
+                self._ensure_dir()
+        except OSError as e:
+            print(f"Scratch space unavailable: {str(e)}")
+            return
+        self.sweep()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                        name='scratch-sweeper', daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        """Stop the sweeper and remove this process's directory (called on shutdown)"""
+        if self._stop is not None:
+            self._stop.set()
+            self._thread = None
+        if self._owner_handle is not None:
+            _unlock(self._owner_handle)
+            self._owner_handle.close()
+            self._owner_handle = None
+            # Files still in it are orphans now; remote entries stay in the
+            # ledger for the next sweep of any process on this node
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+
+    def _run(self, stop):
+        while not stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Scratch sweep failed: {str(e)}")
+
+
+    def sweep(self):
+        """
+        Delete orphaned and expired local files and remote uploads
+
+        Returns:
+            Counts of what was deleted in this pass
+        """
+        swept = {'files': 0, 'dirs': 0, 'remote': 0}
+        dead_owners = set()
+
+        for directory in self._owner_dirs():
+            if directory == self.dir:
+                continue
+            if self._orphaned(directory):
+                dead_owners.add(directory.name)
+                shutil.rmtree(directory, ignore_errors=True)
+                swept['dirs'] += 1
+
+        with self._lock:
+            swept['files'] = self._sweep_own_files()
+
+        swept['remote'] = self._sweep_remote(dead_owners)
+
+        self.stats['swept_files'] += swept['files']
+        self.stats['swept_dirs'] += swept['dirs']
+        self.stats['swept_remote'] += swept['remote']
+        if any(swept.values()):
+            print(f"🧹 Scratch sweep: {swept['files']} expired files, {swept['dirs']} orphaned directories, "
+                  f"{swept['remote']} remote files deleted")
+        return swept
+
+
+    def _sweep_own_files(self):
+        """Delete this process's files older than the max age (caller holds the lock)"""
+        cutoff = time.time() - self.max_age
+        removed = 0
+        try:
+            entries = list(os.scandir(self.dir))
+        except OSError:
+            return 0
+        for entry in entries:
+            if entry.name == OWNER_LOCK:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+    def _sweep_remote(self, dead_owners):
+        """Delete remote files of dead owners, expired uploads and failed deletions"""
+        now = time.time()
+        live_owners = {d.name for d in self._owner_dirs()} - dead_owners
+        conn = self._connect()
+        rows = conn.execute("SELECT display_name, name, owner, created_at, delete_pending FROM remote_files").fetchall()
+        conn.close()
+
+        due = [row for row in rows
+               if row['owner'] not in live_owners
+               or row['delete_pending']
+               or row['created_at'] < now - self.max_age]
+        if not due:
+            return 0
+
+        # Names of uploads that never reported back, looked up by display name
+        unnamed = {row['display_name'] for row in due if row['name'] is None}
+        found = self._remote_names(unnamed) if unnamed else {}
+
+        deleted = 0
+        for row in due:
+            name = row['name'] or (found or {}).get(row['display_name'])
+            if name is None:
+                # Not among the remote files: the upload never completed
+                gone = found is not None
+            else:
+                gone = self._delete_remote_name(name)
+                deleted += gone
+            # Gemini expires files itself after 48h, so old entries can go regardless
+            if gone or row['created_at'] < now - REMOTE_FILE_LIFETIME_SECONDS:
+                self._forget(display_name=row['display_name'])
+        return deleted
+
+
+    @staticmethod
+    def _remote_names(display_names):
+        """Map display names to remote file names via list_files (None if listing fails)"""
+        if not hasattr(genai, 'list_files'):
+            return None
+        try:
+            return {f.display_name: f.name for f in genai.list_files() if f.display_name in display_names}
+        except Exception as e:
+            print(f"⚠️ Could not list remote files: {str(e)}")
+            return None
+
+
+    def status(self):
+        """Usage statistics for health endpoints"""
+        remote_files, remote_bytes = 0, 0
+        if self.ledger_path.exists():
+            conn = self._connect()
+            remote_files, remote_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM remote_files"
+            ).fetchone()
+            conn.close()
+        return {
+            'local_bytes': self.used_bytes(),
+            'local_max_bytes': self.max_bytes,
+            'remote_files': remote_files,
+            'remote_bytes': remote_bytes,
+            'remote_max_bytes': self.remote_max_bytes,
+            **self.stats
+        }
+
+
+# Initialize scratch space instance
+scratch_space = ScratchSpace(
+    APIConfig.SCRATCH_DIR or db.state_dir / 'scratch',
+    APIConfig.SCRATCH_MAX_MB * 1024 * 1024,
+    APIConfig.REMOTE_FILES_MAX_MB * 1024 * 1024
+)
@@ -6,14 +6,36 @@ using Google Gemini API.
 
 This is STEP 2 in the BA workflow:
 Requirements → Generate User Stories
+
+Large requirement sets are split into groups that are generated
+concurrently, so no single response runs into max_output_tokens and
+wall time stays close to one call.
 """
 
 import google.generativeai as genai
 from backend.core.config import APIConfig
 from utils.prompts import PromptTemplates
+from utils.text_compaction import TextCompactor
+from backend.services.model_router import model_router
+from backend.core.executors import executors
+from backend.core.circuit_breaker import CircuitOpen
+from backend.core.models import UserStory
+from backend.core.tracing import traced
+from dataclasses import replace
+import csv
+import io
 import re
 
 
+JIRA_CSV_HEADER = ["Summary", "Description", "Priority", "Story Points", "Issue Type"]
+
+STORY_CODE_PATTERN = re.compile(r'US-\d+', re.IGNORECASE)
+
+# A story reference with the list separator that follows it ("US-003, ")
+DEPENDENCY_PATTERN = re.compile(r'(?P<code>US-\d+)(?P<sep>\s*(?:[,;&/]|\band\b)\s*)?', re.IGNORECASE)
+DEPENDENCY_TRAILING_SEPARATOR = re.compile(r'\s*(?:[,;&/]|\band\b)\s*$', re.IGNORECASE)
+
+
 class UserStoryGenerator:
     """Generate Agile user stories from requirements"""
     
@@ -22,21 +44,16 @@ class UserStoryGenerator:
         self.api_configured = False
         
         try:
-            # Configure Gemini API
+            # Configure Gemini API (models are chosen per call by model_router)
             genai.configure(api_key=APIConfig.GEMINI_API_KEY)
             
-            # Initialize model
-            self.model = genai.GenerativeModel(
-                model_name=APIConfig.GEMINI_MODEL,
-                generation_config=APIConfig.GEMINI_CONFIG
-            )
-            
             self.api_configured = True
         
         except Exception as e:
             print(f"Gemini API configuration error: {str(e)}")
     
     
+    @traced('stories.generate')
     def generate(self, requirements_text, project_type="General"):
         """
         Generate user stories from requirements
@@ -49,15 +66,16 @@ class UserStoryGenerator:
             Dictionary with user stories:
             {
                 'stories': [
-                    {
-                        'story_code': 'US-001',
-                        'title': '...',
-                        'user_story': 'As a... I want... so that...',
-                        'priority': 'High',
-                        'story_points': 3,
-                        'dependencies': 'US-002',
-                        'notes': '...'
-                    }
+                    UserStory(
+                        story_code='US-001',
+                        title='...',
+                        user_story='As a... I want... so that...',
+                        priority='High',
+                        story_points=3,
+                        dependencies='US-002',
+                        notes='...',
+                        req_code='FR-001'
+                    )
                 ],
                 'raw_output': 'Full AI response'
             }
@@ -66,26 +84,219 @@ class UserStoryGenerator:
             raise Exception("Gemini API not configured. Please add API key to api_config.py")
         
         try:
-            # Generate prompt
-            prompt = PromptTemplates.user_story_generator(requirements_text, project_type)
+            # Generate prompt (fixed prefix is served from context cache when possible)
+            prefix = PromptTemplates.user_story_generator_prefix()
+            suffix = PromptTemplates.user_story_generator_suffix(requirements_text, project_type)
             
             # Call Gemini API
-            response = self.model.generate_content(prompt)
+            route, response = model_router.generate('stories', prefix, suffix)
             raw_output = response.text
             
             # Parse the response
             stories = self._parse_user_stories(raw_output)
+            model_router.record_result(route, len(stories))
             
-            return {
+            result = {
                 'stories': stories,
                 'raw_output': raw_output,
                 'total_count': len(stories)
             }
+            
+            # Nothing parsed: have the repair model reformat the response
+            if not stories:
+                repaired, repaired_text = model_router.repair('stories', raw_output, self._parse_user_stories)
+                if repaired:
+                    result = {
+                        'stories': repaired,
+                        'raw_output': repaired_text,
+                        'total_count': len(repaired),
+                        'repaired': True
+                    }
+            
+            return result
         
+        except CircuitOpen:
+            raise
         except Exception as e:
             raise Exception(f"User story generation error: {str(e)}")
     
     
+    def generate_for_requirements(self, requirements, project_type="General"):
+        """
+        Generate user stories for a list of requirements, one Gemini call
+        per requirement group, run concurrently
+        
+        Args:
+            requirements: List of Requirement models
+            project_type: Type of project
+            
+        Returns:
+            Dictionary like generate(), with story codes numbered across
+            all groups and 'groups' set to the number of calls made
+        """
+        groups = self.group_requirements(requirements)
+        
+        if len(groups) == 1:
+            result = self.generate(self.format_requirements(groups[0]), project_type)
+            result['groups'] = 1
+            return result
+        
+        print(f"Generating stories for {len(requirements)} requirements in {len(groups)} concurrent groups")
+        results = executors.map_sync(
+            'fanout',
+            lambda group: self.generate(self.format_requirements(group), project_type),
+            groups
+        )
+        
+        merged = self.merge_results(results)
+        merged['groups'] = len(groups)
+        return merged
+    
+    
+    @staticmethod
+    def group_requirements(requirements, max_requirements=None, token_budget=None):
+        """
+        Split requirements into generation groups
+        
+        Requirements of the same type stay together (in their original
+        order); a group is closed once it holds max_requirements or its
+        descriptions exceed token_budget estimated tokens.
+        
+        Args:
+            requirements: List of Requirement models
+            max_requirements: Defaults to APIConfig.STORY_GROUP_MAX_REQUIREMENTS
+            token_budget: Defaults to APIConfig.STORY_GROUP_TOKEN_BUDGET
+            
+        Returns:
+            List of non-empty lists of Requirement models
+        """
+        max_requirements = max(1, max_requirements or APIConfig.STORY_GROUP_MAX_REQUIREMENTS)
+        token_budget = token_budget or APIConfig.STORY_GROUP_TOKEN_BUDGET
+        
+        by_type = {}
+        for req in requirements:
+            by_type.setdefault(req.req_type, []).append(req)
+        
+        groups = []
+        for same_type in by_type.values():
+            group, tokens = [], 0
+            for req in same_type:
+                req_tokens = TextCompactor.estimate_tokens(req.description)
+                if group and (len(group) >= max_requirements or tokens + req_tokens > token_budget):
+                    groups.append(group)
+                    group, tokens = [], 0
+                group.append(req)
+                tokens += req_tokens
+            if group:
+                groups.append(group)
+        
+        return groups
+    
+    
+    @staticmethod
+    def format_requirements(requirements):
+        """Requirements block for the story prompt"""
+        req_text = "## Requirements\n"
+        for req in requirements:
+            req_text += f"- {req.req_code}: {req.description}\n"
+        return req_text
+    
+    
+    def merge_results(self, results, first_number=1):
+        """
+        Merge per-group generation results in group order
+        
+        Every group numbers its stories from US-001, so codes are
+        renumbered globally and each story's dependencies are rewritten
+        through its own group's mapping. References a group's output
+        doesn't define are dropped; other dependency text is kept.
+        
+        Args:
+            results: List of dictionaries from generate()
+            first_number: Number of the first story code (the pipeline
+                          merges groups one at a time as they finish)
+            
+        Returns:
+            Single stories dictionary
+        """
+        stories = []
+        
+        for result in results:
+            codes = [f"US-{first_number + len(stories) + i:03d}" for i in range(len(result['stories']))]
+            # A code repeated within a group resolves to its first story
+            renumbered = {}
+            for story, code in zip(result['stories'], codes):
+                renumbered.setdefault(story.story_code.upper(), code)
+            
+            for story, code in zip(result['stories'], codes):
+                stories.append(replace(
+                    story,
+                    story_code=code,
+                    dependencies=self._remap_dependencies(story.dependencies, renumbered)
+                ))
+        
+        return {
+            'stories': stories,
+            'raw_output': '\n\n'.join(r.get('raw_output', '') for r in results),
+            'total_count': len(stories)
+        }
+    
+    
+    @staticmethod
+    def link_requirements(stories, requirements):
+        """
+        Set each story's req_id from its req_code
+
+        Stories naming no requirement of the list are left unlinked
+        (req_id None) and aren't saved, rather than being credited to an
+        unrelated requirement.
+
+        Args:
+            stories: UserStory models from generate()/merge_results()
+            requirements: Requirement models the stories were generated for
+
+        Returns:
+            {req_id: [UserStory]} of the linked stories, in story order
+        """
+        req_ids = {req.req_code.upper(): req.req_id for req in requirements if req.req_code}
+        by_requirement = {}
+        for story in stories:
+            story.req_id = req_ids.get((story.req_code or '').upper())
+            if story.req_id is None:
+                print(f"Story {story.story_code} names unknown requirement {story.req_code!r}, not saved")
+                continue
+            by_requirement.setdefault(story.req_id, []).append(story)
+        return by_requirement
+    
+    
+    @staticmethod
+    def _remap_dependencies(dependencies, renumbered):
+        """
+        Rewrite US-xxx references in a dependencies field, keeping any other text
+
+        References to stories outside the group are dropped with their list
+        separator; a field whose references were all dropped becomes 'None'.
+        """
+        text = (dependencies or '').strip()
+        if not STORY_CODE_PATTERN.search(text):
+            return text or 'None'
+
+        kept = []
+
+        def remap(match):
+            new_code = renumbered.get(match.group('code').upper())
+            if not new_code:
+                return ''
+            kept.append(new_code)
+            return new_code + (match.group('sep') or '')
+
+        text = DEPENDENCY_PATTERN.sub(remap, text)
+        if not kept:
+            return 'None'
+        return DEPENDENCY_TRAILING_SEPARATOR.sub('', text)
+    
+    
+    @traced('stories.parse_output')
     def _parse_user_stories(self, text):
         """
         Parse AI output into structured user stories
@@ -94,7 +305,7 @@ class UserStoryGenerator:
             text: Raw AI response text
             
         Returns:
-            List of user story dictionaries
+            List of UserStory models
         """
         stories = []
         
@@ -107,7 +318,7 @@ class UserStoryGenerator:
                 continue
             
             story = self._extract_story_fields(block)
-            if story and story.get('story_code'):
+            if story and story.story_code:
                 stories.append(story)
         
         return stories
@@ -121,52 +332,49 @@ class UserStoryGenerator:
             block: Text containing one user story
             
         Returns:
-            Dictionary with story fields
-        """
-        story = {
-            'story_code': '',
-            'title': '',
-            'user_story': '',
-            'priority': 'Medium',
-            'story_points': 0,
-            'dependencies': 'None',
-            'notes': ''
-        }
+            UserStory model
+        """
+        story = UserStory()
         
         # Extract Story ID
         story_id_match = re.search(r'\*\*Story ID\*\*:\s*(US-\d+)', block, re.IGNORECASE)
         if story_id_match:
-            story['story_code'] = story_id_match.group(1)
+            story.story_code = story_id_match.group(1)
+        
+        # Extract source requirement
+        req_match = re.search(r'\*\*Requirement\*\*:\s*(N?FR-\d+)', block, re.IGNORECASE)
+        if req_match:
+            story.req_code = req_match.group(1).upper()
         
         # Extract Title
         title_match = re.search(r'\*\*Title\*\*:\s*(.+?)(?=\n\*\*|\n|$)', block, re.IGNORECASE)
         if title_match:
-            story['title'] = title_match.group(1).strip()
+            story.title = title_match.group(1).strip()
         
         # Extract User Story
         user_story_match = re.search(r'\*\*User Story\*\*:\s*(.+?)(?=\n\*\*|\n---|\Z)', block, re.IGNORECASE | re.DOTALL)
         if user_story_match:
-            story['user_story'] = ' '.join(user_story_match.group(1).strip().split())
+            story.user_story = ' '.join(user_story_match.group(1).strip().split())
         
         # Extract Priority
         priority_match = re.search(r'\*\*Priority\*\*:\s*(High|Medium|Low)', block, re.IGNORECASE)
         if priority_match:
-            story['priority'] = priority_match.group(1).capitalize()
+            story.priority = priority_match.group(1).capitalize()
         
         # Extract Story Points
         points_match = re.search(r'\*\*Story Points\*\*:\s*(\d+)', block, re.IGNORECASE)
         if points_match:
-            story['story_points'] = int(points_match.group(1))
+            story.story_points = int(points_match.group(1))
         
         # Extract Dependencies
         deps_match = re.search(r'\*\*Dependencies\*\*:\s*(.+?)(?=\n\*\*|\n|$)', block, re.IGNORECASE)
         if deps_match:
-            story['dependencies'] = deps_match.group(1).strip()
+            story.dependencies = deps_match.group(1).strip()
         
         # Extract Notes
         notes_match = re.search(r'\*\*Notes\*\*:\s*(.+?)(?=\n\*\*|\n---|\Z)', block, re.IGNORECASE | re.DOTALL)
         if notes_match:
-            story['notes'] = ' '.join(notes_match.group(1).strip().split())
+            story.notes = ' '.join(notes_match.group(1).strip().split())
         
         return story
     
@@ -186,12 +394,12 @@ class UserStoryGenerator:
         output.append("## 📖 User Stories\n")
         
         for story in stories_data['stories']:
-            output.append(f"### {story['story_code']}: {story['title']}\n")
-            output.append(f"**User Story**: {story['user_story']}\n")
-            output.append(f"**Priority**: {story['priority']} | **Story Points**: {story['story_points']} | **Dependencies**: {story['dependencies']}\n")
+            output.append(f"### {story.story_code}: {story.title}\n")
+            output.append(f"**User Story**: {story.user_story}\n")
+            output.append(f"**Priority**: {story.priority} | **Story Points**: {story.story_points} | **Dependencies**: {story.dependencies}\n")
             
-            if story['notes']:
-                output.append(f"**Notes**: {story['notes']}\n")
+            if story.notes:
+                output.append(f"**Notes**: {story.notes}\n")
             
             output.append("\n---\n")
         
@@ -206,22 +414,39 @@ class UserStoryGenerator:
         Format user stories for JIRA import (CSV format)
         
         Args:
-            stories_data: Dictionary from generate() method
+            stories_data: Dictionary from generate() method (UserStory models)
             
         Returns:
             CSV formatted string
         """
-        csv_lines = ["Summary,Description,Priority,Story Points,Issue Type"]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(JIRA_CSV_HEADER)
         
         for story in stories_data['stories']:
-            summary = story['title']
-            description = story['user_story']
-            priority = story['priority']
-            points = story['story_points']
-            
-            csv_lines.append(f'"{summary}","{description}",{priority},{points},Story')
+            writer.writerow(self.jira_csv_row(story))
+        
+        return buffer.getvalue()
+    
+    
+    @staticmethod
+    def jira_csv_row(story):
+        """
+        Build one JIRA CSV row for a story (escaping is left to csv.writer)
         
-        return '\n'.join(csv_lines)
+        Args:
+            story: UserStory model
+            
+        Returns:
+            List of column values matching JIRA_CSV_HEADER
+        """
+        return [
+            story.title,
+            story.user_story,
+            story.priority,
+            story.story_points,
+            'Story'
+        ]
     
     
     def is_configured(self):
@@ -0,0 +1,171 @@
+"""
+Transcript Cache
+================
+On-disk cache of finished transcriptions, so re-uploading the same
+recording (after a failed later step, or into another project) skips the
+upload, processing and transcription round trips entirely.
+
+Entries are keyed by a SHA-256 of the decoded audio bytes plus the model
+and transcription prompt version, so changing either invalidates old
+transcripts. Each entry is a small text file in the database's local
+state directory (next to the SQLite file, or LOCAL_STATE_DIR); when the
+directory grows past its size limit the least recently used entries are
+evicted.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from backend.core.config import APIConfig
+from backend.core.database import db
+
+
+class TranscriptCache:
+    """Size-bounded LRU cache of transcripts on disk"""
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        Initialize cache and measure existing entries
+
+        Args:
+            cache_dir: Directory holding one file per transcript
+            max_bytes: Total size above which old entries are evicted
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = APIConfig.TRANSCRIPT_CACHE
+
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+        if self.enabled:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                self.total_bytes = sum(p.stat().st_size for p in self.cache_dir.glob('*.txt'))
+            except OSError as e:
+                print(f"Transcript cache disabled: {str(e)}")
+                self.enabled = False
+
+
+    @staticmethod
+    def key(audio_bytes, model_name, prompt_version):
+        """
+        Build the cache key for a recording
+
+        Args:
+            audio_bytes: Decoded audio file bytes
+            model_name: Transcription model
+            prompt_version: Version tag of the transcription prompt
+
+        Returns:
+            Hex digest
+        """
+        digest = hashlib.sha256(audio_bytes).hexdigest()
+        return hashlib.sha256(f"{digest}\0{model_name}\0{prompt_version}".encode('utf-8')).hexdigest()
+
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.txt"
+
+
+    def get(self, key):
+        """
+        Look up a transcript
+
+        Args:
+            key: Key from key()
+
+        Returns:
+            Transcript text, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            transcript = path.read_text(encoding='utf-8')
+            # Refresh mtime so eviction is least-recently-used
+            os.utime(path)
+        except OSError:
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['hits'] += 1
+        return transcript
+
+
+    def put(self, key, transcript):
+        """
+        Store a transcript and evict old entries if over the size limit
+
+        Args:
+            key: Key from key()
+            transcript: Transcript text
+        """
+        if not self.enabled or not transcript:
+            return
+
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+
+        with self._lock:
+            try:
+                previous = path.stat().st_size if path.exists() else 0
+                tmp_path.write_text(transcript, encoding='utf-8')
+                # Atomic, so concurrent readers never see a partial file
+                os.replace(tmp_path, path)
+                self.total_bytes += path.stat().st_size - previous
+                self.stats['stored'] += 1
+            except OSError as e:
+                print(f"Could not cache transcript: {str(e)}")
+                return
+
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+
+    def _evict(self):
+        """Delete least recently used entries down to 90% of the limit"""
+        entries = []
+        for p in self.cache_dir.glob('*.txt'):
+            try:
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+            except OSError:
+                continue
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+                self.stats['evicted'] += 1
+            except OSError:
+                continue
+
+        self.total_bytes = total
+
+
+    def status(self):
+        """Cache statistics for health endpoints"""
+        return {
+            'enabled': self.enabled,
+            'size_bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            **self.stats
+        }
+
+
+# Initialize cache instance
+transcript_cache = TranscriptCache(
+    APIConfig.TRANSCRIPT_CACHE_DIR or db.state_dir / 'transcript_cache',
+    APIConfig.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024
+)
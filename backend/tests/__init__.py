@@ -0,0 +1,5 @@
+"""
+Tests
+=====
+Run with python -m pytest backend/tests (needs: pip install pytest httpx)
+"""
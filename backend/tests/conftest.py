@@ -0,0 +1,72 @@
+"""
+Test configuration: every test session gets a throwaway database and
+state directory, local stand-ins for Gemini, and no network calls.
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "backend"))
+
+# APIConfig reads the environment at import time, so this runs first
+_state_dir = tempfile.mkdtemp(prefix="ba_copilot_tests_")
+os.environ.update({
+    "DATABASE_PATH": os.path.join(_state_dir, "test.db"),
+    "LOCAL_STATE_DIR": _state_dir,
+    "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "test",
+    "GEMINI_CONTEXT_CACHE": "local",
+    "LIVE_TRANSCRIPTION_BACKEND": "fake",
+    "LIVE_WINDOW_SECONDS": "1",
+    "TRACING_EXPORTER": "off",
+})
+# PostgreSQL tests use TEST_DATABASE_URL (never a real DATABASE_URL); the app stays on SQLite
+os.environ.pop("DATABASE_URL", None)
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    """Fresh SQLite database"""
+    from backend.core.database import Database
+    return Database(str(tmp_path / "storage.db"))
+
+
+@pytest.fixture
+def postgres_store():
+    """
+    Fresh PostgreSQL database in a throwaway schema of TEST_DATABASE_URL
+
+    Skipped unless TEST_DATABASE_URL points at a server (e.g. a local
+    container) and psycopg is installed.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+    psycopg = pytest.importorskip("psycopg")
+    pytest.importorskip("psycopg_pool")
+    from psycopg.conninfo import make_conninfo
+    from backend.core.postgres import PostgresDatabase
+
+    schema = f"ba_copilot_test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+
+    store = PostgresDatabase(make_conninfo(url, options=f"-c search_path={schema}"))
+    try:
+        yield store
+    finally:
+        store.close()
+        with psycopg.connect(url, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def store(request):
+    """Each storage backend in turn"""
+    return request.getfixturevalue(f"{request.param}_store")
@@ -0,0 +1,182 @@
+"""Context caching through the local backend"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.services import context_cache as context_cache_module
+from backend.services.context_cache import ContextCacheManager, LocalCacheBackend
+
+
+PREFIX = "Fixed instructions. " * 20
+SUFFIX = "Per-request part"
+
+
+class RecordingModel:
+    """GenerativeModel stand-in that records the contents it was sent"""
+
+    sent = []
+
+    def __init__(self, model_name=None, generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, contents, **kwargs):
+        RecordingModel.sent.append(contents)
+        return "response"
+
+
+@pytest.fixture(autouse=True)
+def recording_model(monkeypatch):
+    RecordingModel.sent = []
+    monkeypatch.setattr(context_cache_module.genai, 'GenerativeModel', RecordingModel)
+
+
+@pytest.fixture
+def manager():
+    cache = ContextCacheManager(mode='local')
+    cache.min_tokens = 50
+    return cache
+
+
+def generate(manager, prefix=PREFIX):
+    return manager.generate(RecordingModel('gemini-test'), prefix, SUFFIX)
+
+
+def test_prefix_is_cached_once_reused(manager):
+    generate(manager)
+    assert manager.stats['created'] == 0
+    assert RecordingModel.sent[-1] == PREFIX + SUFFIX
+
+    generate(manager)
+    generate(manager)
+
+    assert manager.stats == {'hits': 1, 'misses': 2, 'created': 1, 'errors': 0}
+    # The cached model prepends the cached prefix itself
+    assert RecordingModel.sent[-1] == [PREFIX, SUFFIX]
+    assert manager.status()['active_caches'] == 1
+
+
+def test_short_prefixes_are_sent_in_full(manager):
+    for _ in range(3):
+        generate(manager, prefix="Short prefix. ")
+    assert manager.stats['created'] == 0
+    assert manager.stats['misses'] == 0
+
+
+def test_failed_creation_is_not_retried(manager, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("quota")
+
+    monkeypatch.setattr(manager.backend, 'create', fail)
+    for _ in range(3):
+        generate(manager)
+
+    assert manager.stats['errors'] == 1
+    assert RecordingModel.sent[-1] == PREFIX + SUFFIX
+
+
+def test_concurrent_misses_create_one_cache_outside_the_lock(manager):
+    release = threading.Event()
+    started = threading.Event()
+    create = manager.backend.create
+
+    def slow_create(*args):
+        started.set()
+        assert release.wait(5)
+        return create(*args)
+
+    manager.backend.create = slow_create
+    generate(manager)
+
+    callers = [threading.Thread(target=generate, args=(manager,)) for _ in range(4)]
+    for caller in callers:
+        caller.start()
+    assert started.wait(5)
+
+    # Other prefixes aren't blocked while the creation is in flight
+    other = threading.Thread(target=generate, args=(manager, "Another fixed prefix. " * 20))
+    other.start()
+    other.join(2)
+    assert not other.is_alive()
+
+    release.set()
+    for caller in callers:
+        caller.join(5)
+
+    assert manager.stats['created'] == 1
+    assert RecordingModel.sent[-4:] == [[PREFIX, SUFFIX]] * 4
+
+
+def test_handles_close_to_expiry_are_extended(manager):
+    for _ in range(2):
+        generate(manager)
+    entry = next(iter(manager._entries.values()))
+    entry['expire_time'] = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+    generate(manager)
+
+    assert entry['expire_time'] - datetime.now(timezone.utc) > manager.ttl / 2
+    assert entry['extending'] is False
+
+
+def test_clear_deletes_handles(manager):
+    for _ in range(2):
+        generate(manager)
+    assert len(manager.backend.handles) == 1
+
+    manager.clear()
+
+    assert manager.backend.handles == {}
+    assert manager.status()['active_caches'] == 0
+
+
+def test_local_backend_mirrors_the_api():
+    backend = LocalCacheBackend()
+    handle, expire_time = backend.create('gemini-test', PREFIX, timedelta(minutes=10))
+
+    assert handle.name.startswith('cachedContents/local-')
+    assert expire_time > datetime.now(timezone.utc)
+    backend.model_for(handle, None).generate_content(SUFFIX)
+    assert handle.hits == 1
+
+
+def test_rejected_handle_falls_back_to_the_full_prompt(manager, monkeypatch):
+    class NotFound(Exception):
+        pass
+
+    for _ in range(2):
+        generate(manager)
+
+    def expired(self, contents, **kwargs):
+        raise NotFound("CachedContent not found")
+
+    monkeypatch.setattr(LocalCacheBackend.Model, 'generate_content', expired)
+    assert generate(manager) == "response"
+
+    assert RecordingModel.sent[-1] == PREFIX + SUFFIX
+    assert manager.stats['errors'] == 1
+    assert manager.status()['active_caches'] == 0
+
+
+def test_other_errors_of_cached_calls_are_raised(manager, monkeypatch):
+    for _ in range(2):
+        generate(manager)
+
+    def fail(self, contents, **kwargs):
+        raise ValueError("blocked")
+
+    monkeypatch.setattr(LocalCacheBackend.Model, 'generate_content', fail)
+    with pytest.raises(ValueError):
+        generate(manager)
+    assert manager.status()['active_caches'] == 1
+
+
+def test_expired_handles_are_pruned(manager):
+    for _ in range(2):
+        generate(manager)
+    entry = next(iter(manager._entries.values()))
+    entry['expire_time'] = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    assert manager.status()['active_caches'] == 0
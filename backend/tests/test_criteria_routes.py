@@ -0,0 +1,64 @@
+"""Saving generated acceptance criteria through /api/criteria/generate"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.api.main import app
+from backend.core.database import db
+from backend.core.models import Requirement, UserStory, Scenario
+from backend.services.criteria_generator import criteria_gen
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def fake_generation(monkeypatch):
+    def generate(user_story_text):
+        return {'criteria': [Scenario(scenario_name="New", given="g", when="w", then="t")],
+                'raw_output': '', 'total_scenarios': 1}
+    monkeypatch.setattr(criteria_gen, 'generate', generate)
+
+
+@pytest.fixture
+def story():
+    project_id = db.create_project("Criteria test", "Web", "Retail", "")
+    input_id = db.save_input(project_id, "text", "Raw text")
+    req_id = db.save_requirements(input_id, [Requirement(req_code="FR-001", description="Sign in")])[0]
+    story_id = db.save_user_stories(req_id, [UserStory(story_code="US-001", title="Sign in",
+                                                       user_story="As a user, I want to sign in")])[0]
+    db.save_acceptance_criteria(story_id, [Scenario(scenario_name="Existing", given="g", when="w", then="t")])
+    return db.get_user_story(story_id)
+
+
+def scenario_names(story_id):
+    return [c.scenario_name for c in db.get_acceptance_criteria(story_id)]
+
+
+def test_criteria_are_saved_to_the_matching_story(client, story):
+    response = client.post("/api/criteria/generate",
+                           json={"story_id": story.story_id, "user_story": criteria_gen.story_text(story)})
+    assert response.status_code == 200
+    assert scenario_names(story.story_id) == ["New"]
+
+
+def test_criteria_for_other_text_are_not_saved(client, story):
+    response = client.post("/api/criteria/generate",
+                           json={"story_id": story.story_id, "user_story": "US-009: Something else\nAs an admin..."})
+    assert response.status_code == 200
+    assert response.json()['criteria'][0]['scenario_name'] == "New"
+    assert scenario_names(story.story_id) == ["Existing"]
+
+
+def test_unsaved_stories_get_criteria_without_saving(client, story):
+    response = client.post("/api/criteria/generate", json={"user_story": "US-001: Draft\nAs a user..."})
+    assert response.status_code == 200
+    assert scenario_names(story.story_id) == ["Existing"]
+
+
+def test_unknown_story_id_is_rejected(client):
+    response = client.post("/api/criteria/generate", json={"story_id": 10 ** 9, "user_story": "text"})
+    assert response.status_code == 404
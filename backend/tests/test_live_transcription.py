@@ -0,0 +1,115 @@
+"""Live transcription over /api/audio/live, driven through FakeLiveModel"""
+
+import math
+import struct
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from backend.api.main import app
+from backend.core.database import db
+from backend.services import live_transcriber
+
+
+def tone(seconds, sample_rate=16000, channels=1, frequency=440):
+    """Little-endian int16 PCM of a sine tone"""
+    frames = []
+    for n in range(int(seconds * sample_rate)):
+        value = int(12000 * math.sin(2 * math.pi * frequency * n / sample_rate))
+        frames.append(struct.pack('<' + 'h' * channels, *([value] * channels)))
+    return b''.join(frames)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def project_id():
+    return db.create_project("Live test", "Web", "Retail", "")
+
+
+def receive_until_final(websocket):
+    messages = []
+    while True:
+        message = websocket.receive_json()
+        messages.append(message)
+        if message["type"] == "final":
+            return messages
+
+
+def test_windows_are_transcribed_and_saved(client, project_id):
+    audio = tone(2.5)
+    with client.websocket_connect(f"/api/audio/live?project_id={project_id}") as websocket:
+        # Frame boundaries that split samples must not shift the stream
+        for start in range(0, len(audio), 3001):
+            websocket.send_bytes(audio[start:start + 3001])
+        websocket.send_json({"type": "stop"})
+        messages = receive_until_final(websocket)
+
+    partials = [m for m in messages if m["type"] == "partial"]
+    final = messages[-1]
+    assert len(partials) == 3
+    assert [m["window"] for m in partials] == [1, 2, 3]
+    assert final["transcript"] == partials[-1]["transcript"]
+    assert final["seconds"] == pytest.approx(2.5, abs=0.1)
+    assert db.get_input(final["input_id"]).raw_text == final["transcript"]
+
+
+def test_stereo_is_downmixed(client, project_id):
+    with client.websocket_connect(
+        f"/api/audio/live?project_id={project_id}&sample_rate=48000&channels=2"
+    ) as websocket:
+        websocket.send_bytes(tone(1.5, sample_rate=48000, channels=2))
+        websocket.send_json({"type": "stop"})
+        final = receive_until_final(websocket)[-1]
+
+    assert final["seconds"] == pytest.approx(1.5, abs=0.1)
+    assert final["input_id"] is not None
+
+
+def test_silence_is_not_sent_to_the_model(client, project_id):
+    with client.websocket_connect(f"/api/audio/live?project_id={project_id}") as websocket:
+        websocket.send_bytes(b'\x00\x00' * 16000 * 2)
+        websocket.send_json({"type": "stop"})
+        messages = receive_until_final(websocket)
+
+    assert [m["type"] for m in messages] == ["final"]
+    assert messages[0]["input_id"] is None
+
+
+def test_failed_window_keeps_the_rest_of_the_transcript(client, project_id, monkeypatch):
+    real_encode = live_transcriber.LiveTranscriptionSession.encode_window
+    calls = []
+
+    def flaky_encode(self, window):
+        calls.append(len(window))
+        if len(calls) == 2:
+            raise RuntimeError("encoder failed")
+        return real_encode(self, window)
+
+    monkeypatch.setattr(live_transcriber.LiveTranscriptionSession, "encode_window", flaky_encode)
+
+    with client.websocket_connect(f"/api/audio/live?project_id={project_id}") as websocket:
+        websocket.send_bytes(tone(2.5))
+        websocket.send_json({"type": "stop"})
+        messages = receive_until_final(websocket)
+
+    errors = [m for m in messages if m["type"] == "error"]
+    final = messages[-1]
+    assert [m["window"] for m in errors] == [2]
+    assert len([m for m in messages if m["type"] == "partial"]) == 2
+    assert final["input_id"] is not None
+    assert db.get_input(final["input_id"]).raw_text == final["transcript"]
+
+
+@pytest.mark.parametrize("query", ["sample_rate=0", "sample_rate=-16000", "sample_rate=96000",
+                                   "channels=0", "channels=3"])
+def test_invalid_stream_format_is_rejected(client, project_id, query):
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect(f"/api/audio/live?project_id={project_id}&{query}") as websocket:
+            websocket.receive_json()
+    assert error.value.code == 1008
@@ -0,0 +1,51 @@
+"""Automatic routing between the light and full models"""
+
+from backend.services.model_router import ModelRouter, Route
+
+
+LIGHT = Route('stories', 'light', 'light-model', {}, None)
+
+
+def record(router, calls, items=3, seconds=1.0):
+    for _ in range(calls):
+        router.record_latency(LIGHT, seconds)
+        router.record_result(LIGHT, items)
+
+
+def tiers(router, calls):
+    return [router._auto_tier('stories', 100) for _ in range(calls)]
+
+
+def test_large_prompts_go_to_the_full_model():
+    assert ModelRouter()._auto_tier('stories', 10 ** 6) == 'full'
+
+
+def test_light_model_is_used_while_it_keeps_up():
+    router = ModelRouter()
+    record(router, 20)
+    assert set(tiers(router, 5)) == {'light'}
+
+
+def test_underperforming_light_model_only_gets_probes():
+    router = ModelRouter()
+    record(router, 20, items=0)
+
+    routed = tiers(router, 30)
+
+    assert routed.count('light') == 3
+    assert routed[9] == routed[19] == routed[29] == 'light'
+
+
+def test_light_model_returns_after_it_recovers():
+    router = ModelRouter()
+    record(router, 20, seconds=60)
+
+    # Probe calls find the light model fast again
+    routed = []
+    for _ in range(100):
+        routed.append(router._auto_tier('stories', 100))
+        if routed[-1] == 'light':
+            record(router, 1, seconds=1.0)
+
+    assert routed[0] == 'full'
+    assert routed[-10:] == ['light'] * 10
@@ -0,0 +1,21 @@
+"""Profiling admin token checks"""
+
+from backend.core.config import APIConfig
+from backend.core.profiling import request_profiler
+
+
+def test_token_matches_only_the_configured_token(monkeypatch):
+    monkeypatch.setattr(APIConfig, 'PROFILING_ADMIN_TOKEN', 's3cret-tökén')
+
+    assert request_profiler.token_matches('s3cret-tökén')
+    assert not request_profiler.token_matches('s3cret-token')
+    assert not request_profiler.token_matches('s3cret')
+    assert not request_profiler.token_matches('')
+    assert not request_profiler.token_matches(None)
+
+
+def test_no_token_matches_when_none_is_configured(monkeypatch):
+    monkeypatch.setattr(APIConfig, 'PROFILING_ADMIN_TOKEN', '')
+
+    assert not request_profiler.token_matches('')
+    assert not request_profiler.token_matches(None)
@@ -0,0 +1,267 @@
+"""
+Storage backend behaviour shared by SQLite and PostgreSQL
+
+Every test runs against both backends; the PostgreSQL runs are skipped
+unless TEST_DATABASE_URL is set (see conftest.postgres_store).
+"""
+
+import pytest
+
+from backend.core.models import Requirement, UserStory, Scenario
+
+
+@pytest.fixture
+def input_id(store):
+    project_id = store.create_project("Storage test", "Web", "Retail", "")
+    return store.save_input(project_id, "document", "Raw text", "spec.docx")
+
+
+def requirement(code, description="The system shall do it", req_type="Functional"):
+    return Requirement(req_code=code, req_type=req_type, description=description)
+
+
+def story(code, title="Story", priority="Medium", points=3):
+    return UserStory(story_code=code, title=title, user_story=f"As a user, I want {title}",
+                     priority=priority, story_points=points)
+
+
+def scenario(name, then="it works"):
+    return Scenario(scenario_name=name, given="a user", when="they act", then=then)
+
+
+def test_project_and_input_crud(store):
+    project_id = store.create_project("CRUD test", "Mobile", "Finance", "Banking app")
+    input_id = store.save_input(project_id, "voice", "We need a login screen", "meeting.wav")
+
+    project = store.get_project(project_id)
+    assert (project.project_name, project.project_type, project.industry) == ("CRUD test", "Mobile", "Finance")
+    assert project_id in [p.project_id for p in store.get_all_projects()]
+
+    saved = store.get_input(input_id)
+    assert (saved.project_id, saved.input_type, saved.raw_text, saved.file_name) == \
+        (project_id, "voice", "We need a login screen", "meeting.wav")
+    assert store.get_input_project_id(input_id) == project_id
+
+
+def test_requirement_story_criteria_crud(store, input_id):
+    req_ids = store.save_requirements(input_id, [requirement("FR-002"), requirement("FR-001")])
+    story_ids = store.save_user_stories(req_ids[0], [story("US-001", "Sign in")])
+    store.save_acceptance_criteria(story_ids[0], [scenario("Happy path")])
+
+    assert [r.req_code for r in store.get_requirements(input_id)] == ["FR-001", "FR-002"]
+    project_id = store.get_input_project_id(input_id)
+    assert [r.req_id for r in store.get_project_requirements(project_id)] == req_ids[::-1]
+
+    saved_story = store.get_user_story(story_ids[0])
+    assert (saved_story.req_id, saved_story.story_code, saved_story.title) == (req_ids[0], "US-001", "Sign in")
+    assert [s.story_id for s in store.get_user_stories(req_ids[0])] == story_ids
+
+    criteria = store.get_acceptance_criteria(story_ids[0])
+    assert [(c.scenario_name, c.given, c.when, c.then) for c in criteria] == \
+        [("Happy path", "a user", "they act", "it works")]
+
+
+def test_delete_project_removes_everything(store, input_id):
+    project_id = store.get_input_project_id(input_id)
+    req_id = store.save_requirements(input_id, [requirement("FR-001")])[0]
+    story_id = store.save_user_stories(req_id, [story("US-001")])[0]
+    store.save_acceptance_criteria(story_id, [scenario("Happy path")])
+
+    store.delete_project(project_id)
+
+    assert store.get_project(project_id) is None
+    assert store.get_input(input_id) is None
+    assert store.get_user_story(story_id) is None
+    assert store.get_acceptance_criteria(story_id) == []
+    assert store.get_project_version(project_id) is None
+
+
+def test_upserts_keep_ids(store, input_id):
+    req_id = store.save_requirements(input_id, [requirement("FR-001")])[0]
+    story_id = store.save_user_stories(req_id, [story("US-001")])[0]
+    store.save_acceptance_criteria(story_id, [scenario("Happy path")])
+    criteria_id = store.get_acceptance_criteria(story_id)[0].criteria_id
+
+    assert store.save_requirements(input_id, [requirement("FR-001")]) == [req_id]
+    assert store.save_user_stories(req_id, [story("US-001", "Changed")]) == [story_id]
+    store.save_acceptance_criteria(story_id, [scenario("Happy path", "changed")])
+
+    assert store.get_user_story(story_id).title == "Changed"
+    assert [(c.criteria_id, c.then) for c in store.get_acceptance_criteria(story_id)] == [(criteria_id, "changed")]
+
+
+def test_changed_requirement_text_drops_its_stories(store, input_id):
+    first = store.save_requirements(input_id, [requirement("FR-001"), requirement("FR-002")])
+    story_ids = store.save_user_stories(first[0], [story("US-001")])
+    kept_ids = store.save_user_stories(first[1], [story("US-002")])
+    store.save_acceptance_criteria(story_ids[0], [scenario("Happy path")])
+
+    second = store.save_requirements(input_id, [requirement("FR-001", "Updated"), requirement("FR-002")])
+
+    assert second == first
+    assert [(r.req_code, r.description) for r in store.get_requirements(input_id)] == \
+        [("FR-001", "Updated"), ("FR-002", "The system shall do it")]
+    # Stories written for the old text no longer describe the requirement
+    assert store.get_user_stories(first[0]) == []
+    assert store.get_acceptance_criteria(story_ids[0]) == []
+    assert [s.story_id for s in store.get_user_stories(first[1])] == kept_ids
+
+
+def test_missing_requirements_are_kept_unless_pruned(store, input_id):
+    first = store.save_requirements(input_id, [requirement("FR-001"), requirement("FR-002")])
+    story_ids = store.save_user_stories(first[1], [story("US-001")])
+    store.save_acceptance_criteria(story_ids[0], [scenario("Happy path")])
+
+    assert store.save_requirements(input_id, [requirement("FR-001")]) == first[:1]
+    assert [r.req_code for r in store.get_requirements(input_id)] == ["FR-001", "FR-002"]
+    assert [s.story_id for s in store.get_user_stories(first[1])] == story_ids
+
+    assert store.save_requirements(input_id, [requirement("FR-001")], prune=True) == first[:1]
+    assert [r.req_code for r in store.get_requirements(input_id)] == ["FR-001"]
+    # Children of the pruned requirement go with it
+    assert store.get_user_stories(first[1]) == []
+    assert store.get_acceptance_criteria(story_ids[0]) == []
+
+
+def test_resaving_stories_replaces_the_set(store, input_id):
+    req_id = store.save_requirements(input_id, [requirement("FR-001")])[0]
+    first = store.save_user_stories(req_id, [story("US-001"), story("US-002")])
+    store.save_acceptance_criteria(first[1], [scenario("Happy path")])
+
+    second = store.save_user_stories(req_id, [story("US-001", "Renamed")])
+
+    assert second == first[:1]
+    assert [(s.story_code, s.title) for s in store.get_user_stories(req_id)] == [("US-001", "Renamed")]
+    assert store.get_acceptance_criteria(first[1]) == []
+
+
+def test_input_stories_replace_every_requirements_stories(store, input_id):
+    req_ids = store.save_requirements(input_id, [requirement("FR-001"), requirement("FR-002")])
+    old_ids = store.save_user_stories(req_ids[0], [story("US-001")])
+    old_ids += store.save_user_stories(req_ids[1], [story("US-002")])
+    store.save_acceptance_criteria(old_ids[0], [scenario("Happy path")])
+
+    new = [story("US-001", "Renamed"), story("US-002", "Moved")]
+    new[0].req_id = new[1].req_id = req_ids[0]
+    new_ids = store.save_input_stories(input_id, new)
+
+    assert new_ids[0] == old_ids[0]
+    assert [(s.story_code, s.title) for s in store.get_user_stories(req_ids[0])] == \
+        [("US-001", "Renamed"), ("US-002", "Moved")]
+    # FR-002 got no stories this time; its old US-002 must not linger
+    assert store.get_user_stories(req_ids[1]) == []
+    assert [c.scenario_name for c in store.get_acceptance_criteria(old_ids[0])] == ["Happy path"]
+
+
+def test_resaving_criteria_replaces_the_set(store, input_id):
+    req_id = store.save_requirements(input_id, [requirement("FR-001")])[0]
+    story_id = store.save_user_stories(req_id, [story("US-001")])[0]
+    store.save_acceptance_criteria(story_id, [scenario("Happy path"), scenario("Old edge case")])
+
+    store.save_acceptance_criteria(story_id, [scenario("Happy path", "it still works")])
+
+    criteria = store.get_acceptance_criteria(story_id)
+    assert [(c.scenario_name, c.then) for c in criteria] == [("Happy path", "it still works")]
+
+
+def test_repeated_scenario_names_are_kept(store, input_id):
+    req_id = store.save_requirements(input_id, [requirement("FR-001")])[0]
+    story_id = store.save_user_stories(req_id, [story("US-001")])[0]
+
+    store.save_acceptance_criteria(story_id, [
+        scenario("Invalid input", "an error is shown"),
+        scenario("Invalid input", "the form keeps its values"),
+    ])
+
+    criteria = store.get_acceptance_criteria(story_id)
+    assert [(c.scenario_name, c.then) for c in criteria] == [
+        ("Invalid input", "an error is shown"),
+        ("Invalid input (2)", "the form keeps its values"),
+    ]
+
+
+def test_stats_follow_replacements(store, input_id):
+    project_id = store.get_input(input_id).project_id
+    store.save_requirements(input_id, [requirement("FR-001"), requirement("NFR-001", req_type="Non-Functional")])
+    store.save_requirements(input_id, [requirement("FR-001")], prune=True)
+
+    stats = store._get_stats(project_id)
+    assert stats['requirements'] == 1
+    assert stats['non_functional_requirements'] == 0
+
+
+def test_stats_track_inserts_updates_and_deletes(store, input_id):
+    project_id = store.get_input_project_id(input_id)
+    version = store.get_project_version(project_id)[0]
+
+    req_ids = store.save_requirements(input_id, [
+        requirement("FR-001"), requirement("NFR-001", req_type="Non-Functional")
+    ])
+    story_ids = store.save_user_stories(req_ids[0], [story("US-001", priority="High", points=5),
+                                                     story("US-002", priority="Low", points=2)])
+    store.save_acceptance_criteria(story_ids[0], [scenario("One"), scenario("Two")])
+
+    summary = store.get_project_summary(project_id)
+    assert summary['inputs'] == 1
+    assert summary['requirements'] == 2
+    assert summary['requirement_types'] == {'functional': 1, 'non_functional': 1}
+    assert summary['user_stories'] == 2
+    assert summary['story_points'] == 7
+    assert summary['priorities'] == {'high': 1, 'medium': 0, 'low': 1}
+    assert summary['acceptance_criteria'] == 2
+    assert summary['version'] > version
+
+    # Upserts move counters between buckets instead of adding rows
+    store.save_user_stories(req_ids[0], [story("US-001", priority="Medium", points=8)])
+    summary = store.get_project_summary(project_id)
+    assert summary['user_stories'] == 1
+    assert summary['story_points'] == 8
+    assert summary['priorities'] == {'high': 0, 'medium': 1, 'low': 0}
+    assert summary['acceptance_criteria'] == 2
+
+
+def test_search_ranks_and_filters(store, input_id):
+    project_id = store.get_input_project_id(input_id)
+    other_project = store.create_project("Other", "Web", "Retail", "")
+    other_input = store.save_input(other_project, "text", "Unrelated notes", None)
+
+    store.save_requirements(input_id, [
+        requirement("FR-001", "Users shall reset their password by email"),
+        requirement("FR-002", "Admins shall export invoices"),
+    ])
+    store.save_requirements(other_input, [requirement("FR-001", "Password rules follow the security policy")])
+
+    results, has_more = store.search("passw")
+    assert not has_more
+    assert {(r['kind'], r['project_id']) for r in results} == {('requirement', project_id), ('requirement', other_project)}
+
+    results, _ = store.search("reset password", project_id=project_id)
+    assert [(r['kind'], r['title']) for r in results] == [('requirement', 'FR-001')]
+    assert 'mark' in results[0]['snippet']
+
+    results, has_more = store.search("shall", kinds=['requirement'], limit=1)
+    assert len(results) == 1 and has_more
+
+    assert store.search("!!!") == ([], False)
+
+
+def test_export_iterators_stream_every_row_in_order(store, input_id):
+    project_id = store.get_input_project_id(input_id)
+    req_ids = store.save_requirements(input_id, [requirement("FR-001"), requirement("FR-002")])
+    story_ids = store.save_user_stories(req_ids[0], [story(f"US-00{n}") for n in range(1, 4)])
+    story_ids += store.save_user_stories(req_ids[1], [story("US-004")])
+    store.save_acceptance_criteria(story_ids[0], [scenario("One"), scenario("Two"), scenario("Three")])
+    store.save_acceptance_criteria(story_ids[2], [scenario("Only")])
+
+    stories = list(store.iter_project_stories(project_id, chunk_size=2))
+    assert [s.story_id for s in stories] == story_ids
+    assert [s.req_code for s in stories] == ["FR-001"] * 3 + ["FR-002"]
+
+    pairs = [(s.story_id, c.scenario_name if c else None)
+             for s, c in store.iter_project_criteria(project_id, chunk_size=2)]
+    assert pairs == [
+        (story_ids[0], "One"), (story_ids[0], "Two"), (story_ids[0], "Three"),
+        (story_ids[1], None),
+        (story_ids[2], "Only"),
+        (story_ids[3], None),
+    ]
@@ -0,0 +1,50 @@
+"""Merging per-group story generation results"""
+
+from backend.core.models import UserStory
+from backend.services.story_generator import story_gen
+
+
+def group(*stories):
+    return {'stories': [UserStory(story_code=code, title=code, dependencies=deps) for code, deps in stories],
+            'raw_output': ''}
+
+
+def test_codes_are_renumbered_across_groups():
+    merged = story_gen.merge_results([
+        group(("US-001", "None"), ("US-002", "US-001")),
+        group(("US-001", "None"), ("US-002", "US-001, US-009")),
+    ])
+    assert [(s.story_code, s.dependencies) for s in merged['stories']] == [
+        ("US-001", "None"), ("US-002", "US-001"),
+        ("US-003", "None"), ("US-004", "US-003"),
+    ]
+
+
+def test_dependency_text_around_codes_is_kept():
+    merged = story_gen.merge_results([
+        group(("US-001", "None")),
+        group(("US-001", "Payment gateway sandbox account"),
+              ("US-002", "Depends on US-001 (checkout) and the SSO rollout")),
+    ])
+    assert [s.dependencies for s in merged['stories']] == [
+        "None",
+        "Payment gateway sandbox account",
+        "Depends on US-002 (checkout) and the SSO rollout",
+    ]
+
+
+def test_fields_referencing_only_unknown_stories_become_none():
+    merged = story_gen.merge_results([group(("US-001", "US-007"), ("US-002", "US-009 and US-001"))], first_number=5)
+    assert [(s.story_code, s.dependencies) for s in merged['stories']] == [("US-005", "None"), ("US-006", "US-005")]
+
+
+def test_stories_of_unknown_requirements_stay_unlinked():
+    from backend.core.models import Requirement
+
+    requirements = [Requirement(req_id=7, req_code="FR-001"), Requirement(req_id=8, req_code="FR-002")]
+    stories = [UserStory(story_code="US-001", req_code="fr-002"),
+               UserStory(story_code="US-002", req_code="FR-099"),
+               UserStory(story_code="US-003", req_code="")]
+
+    assert story_gen.link_requirements(stories, requirements) == {8: [stories[0]]}
+    assert [s.req_id for s in stories] == [8, None, None]
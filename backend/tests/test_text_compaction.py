@@ -0,0 +1,27 @@
+"""Prompt input compaction"""
+
+from utils.text_compaction import TextCompactor
+
+
+DOCUMENT = "Order qty: 10 10 UM per pallet.\nWe had had issues with the the supplier."
+
+
+def test_documents_keep_fillers_and_repeats():
+    compacted, _ = TextCompactor.compact(DOCUMENT)
+    assert compacted == DOCUMENT
+
+
+def test_transcripts_drop_fillers_and_stutters():
+    compacted, _ = TextCompactor.compact("So um we we need, uh, the the export by Friday.", transcript=True)
+    assert compacted == "So we need, the export by Friday."
+
+
+def test_repeated_numbers_are_not_stutters():
+    assert TextCompactor.strip_fillers("Order qty: 10 10 boxes") == "Order qty: 10 10 boxes"
+    assert TextCompactor.strip_fillers("version 2 2") == "version 2 2"
+
+
+def test_stats_count_tokens_before_and_after():
+    _, stats = TextCompactor.compact("a  b   c", transcript=True)
+    assert stats['original_chars'] == 8
+    assert stats['compacted_chars'] == 5
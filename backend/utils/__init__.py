@@ -7,5 +7,7 @@ Helper functions and templates
 """
 
 from .prompts import PromptTemplates
+from .text_compaction import TextCompactor
+from .audio_preprocessing import AudioPreprocessor
 
-__all__ = ['PromptTemplates']
\ No newline at end of file
+__all__ = ['PromptTemplates', 'TextCompactor', 'AudioPreprocessor']
\ No newline at end of file
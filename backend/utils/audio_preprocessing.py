@@ -0,0 +1,256 @@
+"""
+Audio Preprocessing
+===================
+Shrinks recordings locally before they are uploaded for transcription.
+
+- WAV decoding (8/16/24/32-bit PCM and 32/64-bit float)
+- Downmix to mono
+- Vectorized windowed-sinc resampling to 16 kHz (APIConfig.AUDIO_CONFIG)
+- Leading/trailing silence trimming
+- Re-encoding to 16-bit PCM WAV, or FLAC when soundfile is installed
+
+Compressed browser formats (webm/ogg/mp3/m4a) are already compact and
+are passed through untouched.
+"""
+
+import io
+import struct
+import wave
+
+import numpy as np
+
+
+# RIFF format tags
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Silence detection frame length
+FRAME_MS = 20
+
+
+class AudioPreprocessor:
+    """Decode, normalize and re-encode audio for transcription"""
+
+    @staticmethod
+    def decode_wav(data):
+        """
+        Decode a WAV file
+
+        Args:
+            data: WAV file bytes
+
+        Returns:
+            (samples, sample_rate) with samples as float32 in [-1, 1],
+            shaped (frames, channels)
+        """
+        if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+            raise ValueError("Not a RIFF/WAVE file")
+
+        fmt = None
+        pcm = None
+        pos = 12
+        while pos + 8 <= len(data):
+            chunk_id = data[pos:pos + 4]
+            chunk_size = struct.unpack('<I', data[pos + 4:pos + 8])[0]
+            body = data[pos + 8:pos + 8 + chunk_size]
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', body[:16])
+                if fmt[0] == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    # Real format tag is the first two bytes of the SubFormat GUID
+                    fmt = (struct.unpack('<H', body[24:26])[0],) + fmt[1:]
+            elif chunk_id == b'data':
+                pcm = body
+                break
+            # Chunks are word aligned
+            pos += 8 + chunk_size + (chunk_size & 1)
+
+        if fmt is None or pcm is None:
+            raise ValueError("WAV file has no fmt or data chunk")
+
+        format_tag, channels, sample_rate, _, _, bits = fmt
+        width = bits // 8
+        usable = len(pcm) - len(pcm) % (width * channels)
+        pcm = pcm[:usable]
+
+        if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+            samples = np.frombuffer(pcm, dtype='<f4' if bits == 32 else '<f8').astype(np.float32)
+        elif format_tag == WAVE_FORMAT_PCM and bits == 8:
+            samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+        elif format_tag == WAVE_FORMAT_PCM and bits == 16:
+            samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+        elif format_tag == WAVE_FORMAT_PCM and bits == 24:
+            raw = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+            samples = ints.astype(np.float32) / 8388608.0
+        elif format_tag == WAVE_FORMAT_PCM and bits == 32:
+            samples = np.frombuffer(pcm, dtype='<i4').astype(np.float32) / 2147483648.0
+        else:
+            raise ValueError(f"Unsupported WAV encoding (format {format_tag}, {bits}-bit)")
+
+        return samples.reshape(-1, channels), sample_rate
+
+
+    @staticmethod
+    def downmix(samples):
+        """
+        Average all channels into one
+
+        Args:
+            samples: Array shaped (frames, channels)
+
+        Returns:
+            1-D mono array
+        """
+        if samples.ndim == 1:
+            return samples
+        return samples.mean(axis=1, dtype=np.float32)
+
+
+    @staticmethod
+    def resample(samples, source_rate, target_rate, taps=64):
+        """
+        Resample mono audio with a windowed-sinc low-pass filter
+
+        Downsampling filters at the target Nyquist frequency first to avoid
+        aliasing. Integer ratios (48k -> 16k) decimate directly; other
+        ratios interpolate linearly between filtered samples.
+
+        Args:
+            samples: 1-D float array
+            source_rate: Input sample rate
+            target_rate: Output sample rate
+            taps: Filter half-length in samples
+
+        Returns:
+            Resampled 1-D float32 array
+        """
+        if source_rate == target_rate or len(samples) == 0:
+            return samples.astype(np.float32, copy=False)
+
+        if target_rate < source_rate:
+            cutoff = 0.5 * target_rate / source_rate
+            n = np.arange(-taps, taps + 1)
+            kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(len(n))
+            kernel /= kernel.sum()
+            samples = np.convolve(samples, kernel.astype(np.float32), mode='same')
+
+            if source_rate % target_rate == 0:
+                return samples[::source_rate // target_rate].astype(np.float32, copy=False)
+
+        duration = len(samples) / source_rate
+        positions = np.arange(int(duration * target_rate)) * (source_rate / target_rate)
+        return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+    @staticmethod
+    def trim_silence(samples, sample_rate, threshold_db=-45.0, padding_ms=250):
+        """
+        Remove leading and trailing silence
+
+        Args:
+            samples: 1-D float array
+            sample_rate: Sample rate
+            threshold_db: Frame RMS (dBFS) below which a frame is silent
+            padding_ms: Audio kept around the first/last loud frame
+
+        Returns:
+            Trimmed array (unchanged if the whole clip is silent)
+        """
+        frame = max(1, sample_rate * FRAME_MS // 1000)
+        n_frames = len(samples) // frame
+        if n_frames == 0:
+            return samples
+
+        frames = samples[:n_frames * frame].reshape(n_frames, frame)
+        rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+        loud = np.flatnonzero(20 * np.log10(rms + 1e-10) > threshold_db)
+        if len(loud) == 0:
+            return samples
+
+        padding = sample_rate * padding_ms // 1000
+        start = max(0, loud[0] * frame - padding)
+        end = min(len(samples), (loud[-1] + 1) * frame + padding)
+        return samples[start:end]
+
+
+    @staticmethod
+    def encode(samples, sample_rate, codec='wav'):
+        """
+        Encode mono audio
+
+        Args:
+            samples: 1-D float array in [-1, 1]
+            sample_rate: Sample rate
+            codec: "wav" (16-bit PCM) or "flac" (needs soundfile)
+
+        Returns:
+            (bytes, format)
+        """
+        if codec == 'flac':
+            try:
+                import soundfile
+                buffer = io.BytesIO()
+                soundfile.write(buffer, samples, sample_rate, format='FLAC', subtype='PCM_16')
+                return buffer.getvalue(), 'flac'
+            except ImportError:
+                print("soundfile not installed, encoding audio as WAV instead of FLAC")
+
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm.tobytes())
+        return buffer.getvalue(), 'wav'
+
+
+    @staticmethod
+    def preprocess(data, audio_format, target_rate=16000, codec='wav', threshold_db=-45.0):
+        """
+        Run the full preprocessing pipeline
+
+        Args:
+            data: Raw audio bytes
+            audio_format: File extension sent by the client
+            target_rate: Output sample rate
+            codec: Output codec ("wav" or "flac")
+            threshold_db: Silence threshold for trimming
+
+        Returns:
+            (bytes, format, stats) where stats reports the size reduction;
+            non-WAV or undecodable input is returned unchanged
+        """
+        stats = {'original_bytes': len(data), 'processed': False}
+
+        if audio_format.lower() != 'wav':
+            stats['skipped'] = f"{audio_format} is already compressed"
+            return data, audio_format, stats
+
+        try:
+            samples, source_rate = AudioPreprocessor.decode_wav(data)
+        except Exception as e:
+            stats['skipped'] = f"could not decode WAV: {str(e)}"
+            return data, audio_format, stats
+
+        channels = samples.shape[1]
+        mono = AudioPreprocessor.downmix(samples)
+        mono = AudioPreprocessor.resample(mono, source_rate, target_rate)
+        trimmed = AudioPreprocessor.trim_silence(mono, target_rate, threshold_db)
+        output, output_format = AudioPreprocessor.encode(trimmed, target_rate, codec)
+
+        stats.update({
+            'processed': True,
+            'processed_bytes': len(output),
+            'reduction_percent': round(100 * (1 - len(output) / max(1, len(data))), 1),
+            'source_rate': source_rate,
+            'source_channels': channels,
+            'sample_rate': target_rate,
+            'format': output_format,
+            'original_seconds': round(len(samples) / source_rate, 2),
+            'processed_seconds': round(len(trimmed) / target_rate, 2)
+        })
+
+        return output, output_format, stats
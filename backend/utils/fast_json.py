@@ -0,0 +1,66 @@
+"""
+Fast JSON Responses
+===================
+orjson-backed rendering for API responses.
+
+FastAPI runs every plain return value through jsonable_encoder, which
+walks the whole payload (and copies dataclasses via asdict) before the
+stdlib json module encodes it again. Routes with large payloads return a
+FastJSONResponse instead: orjson encodes dicts, lists, dataclass models,
+datetimes and numpy values natively in a single pass.
+
+orjson is optional; without it the stdlib encoder is used with the same
+type handling.
+"""
+
+import dataclasses
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    """Encode types the JSON library doesn't handle natively"""
+    if dataclasses.is_dataclass(obj):
+        # Shallow: nested values go back through the encoder
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """
+    Serialize content to UTF-8 JSON bytes
+
+    Args:
+        content: Dicts, lists, dataclass models, numpy values, ...
+
+    Returns:
+        Compact JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson"""
+
+    def render(self, content):
+        return dumps(content)
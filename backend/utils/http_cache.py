@@ -0,0 +1,68 @@
+"""
+HTTP Caching Helpers
+====================
+Strong ETags and conditional GETs for read endpoints that the frontend
+polls.
+
+ETags are derived from version counters the database bumps on every
+write (project_stats.version, resource_versions), never from the
+payload, so a matching If-None-Match is answered with 304 after a single
+primary-key lookup and without building the response.
+"""
+
+import hashlib
+
+from fastapi.responses import Response
+
+from backend.core.config import Settings
+from backend.utils.fast_json import FastJSONResponse
+
+
+# Always revalidate: polled resources must reflect new writes immediately
+REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag from version components
+
+    Args:
+        *parts: Resource name, id, version, updated_at, ...
+
+    Returns:
+        Quoted ETag string
+    """
+    key = ':'.join(str(p) for p in (Settings.VERSION, *parts))
+    return '"' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+def etag_matches(request, etag):
+    """
+    Check If-None-Match against an ETag
+
+    Args:
+        request: Incoming request
+        etag: Current ETag of the resource
+
+    Returns:
+        True if the client's copy is current
+    """
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+
+    # GET uses weak comparison, so W/ prefixes added by proxies still match
+    tags = [t.strip() for t in header.split(',')]
+    return etag in (t[2:] if t.startswith('W/') else t for t in tags)
+
+
+def not_modified(etag, cache_control=REVALIDATE):
+    """304 response for a client that already has the current version"""
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control})
+
+
+def cached_json(content, etag, cache_control=REVALIDATE):
+    """JSON response carrying caching headers"""
+    return FastJSONResponse(content=content, headers={'ETag': etag, 'Cache-Control': cache_control})
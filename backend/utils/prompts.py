@@ -9,28 +9,85 @@ These prompts are optimized for Gemini API.
 class PromptTemplates:
     """Collection of all AI prompt templates"""
     
+    # Output formats the response parsers expect (also used by output_repair)
+    REQUIREMENTS_FORMAT = """## Functional Requirements
+- FR-001: [Clear, actionable requirement description]
+- FR-002: [Clear, actionable requirement description]
+- FR-003: [Clear, actionable requirement description]
+
+## Non-Functional Requirements
+- NFR-001: [Performance/Security/Usability requirement]
+- NFR-002: [Performance/Security/Usability requirement]
+"""
+    
+    USER_STORY_FORMAT = """**Story ID**: US-001
+**Requirement**: [FR-XXX or NFR-XXX]
+**Title**: [Concise title - max 6 words]
+**User Story**: As a [role], I want [feature], so that [business value]
+**Priority**: High / Medium / Low
+**Story Points**: [1, 2, 3, 5, 8, 13]
+**Dependencies**: [US-XXX or None]
+**Notes**: [Any additional context]
+
+---
+"""
+    
+    ACCEPTANCE_CRITERIA_FORMAT = """**Scenario 1: [Scenario Name - Happy Path]**
+- GIVEN [initial context/state]
+- AND [additional context if needed]
+- WHEN [user action or event trigger]
+- AND [additional action if needed]
+- THEN [expected outcome]
+- AND [additional outcome if needed]
+
+**Scenario 2: [Scenario Name - Alternative Path]**
+- GIVEN [different context]
+- WHEN [different action]
+- THEN [different outcome]
+
+**Scenario 3: [Scenario Name - Error Handling]**
+- GIVEN [error condition]
+- WHEN [action attempted]
+- THEN [error message or behavior]
+"""
+    
+    
     @staticmethod
-    def requirements_extractor(raw_text, project_type="General", industry="General"):
+    def requirements_extractor_parts(raw_text, project_type="General", industry="General", include_example=True):
         """
-        Prompt for extracting requirements from raw text
+        Prompt for extracting requirements, split for context caching
+        
+        The prefix holds the fixed instructions followed by the text, so
+        repeated runs over the same transcript share one cacheable prefix.
+        The suffix holds the per-request project context.
         
         Args:
             raw_text: Meeting transcript or document text
             project_type: Type of project (Web, Mobile, Desktop, etc.)
             industry: Industry domain (Finance, Healthcare, E-commerce, etc.)
+            include_example: Append the worked example output block
+            
+        Returns:
+            (prefix, suffix)
         """
-        return f"""You are an expert Business Analyst with 15+ years of experience in requirements engineering.
+        example = """
+EXAMPLE OUTPUT:
+## Functional Requirements
+- FR-001: User shall be able to log in using email and password
+- FR-002: System shall send password reset link to registered email within 5 minutes
+- FR-003: Dashboard shall display user's last 30 days of activity
 
-CONTEXT:
-Project Type: {project_type}
-Industry: {industry}
+## Non-Functional Requirements
+- NFR-001: Login response time shall not exceed 2 seconds under normal load
+- NFR-002: System shall support at least 1000 concurrent users
+- NFR-003: All passwords shall be encrypted using bcrypt with minimum 12 character length
+""" if include_example else ""
+        
+        prefix = f"""You are an expert Business Analyst with 15+ years of experience in requirements engineering.
 
 TASK:
 Analyze the following text and extract ALL requirements. Be thorough and identify both explicit and implicit requirements.
 
-TEXT TO ANALYZE:
-{raw_text}
-
 INSTRUCTIONS:
 1. Extract every requirement mentioned or implied
 2. Classify each as Functional (FR) or Non-Functional (NFR)
@@ -42,45 +99,38 @@ INSTRUCTIONS:
 5. Include both what's explicitly stated and logically implied
 
 OUTPUT FORMAT (Strict):
-## Functional Requirements
-- FR-001: [Clear, actionable requirement description]
-- FR-002: [Clear, actionable requirement description]
-- FR-003: [Clear, actionable requirement description]
-
-## Non-Functional Requirements
-- NFR-001: [Performance/Security/Usability requirement]
-- NFR-002: [Performance/Security/Usability requirement]
-
-EXAMPLE OUTPUT:
-## Functional Requirements
-- FR-001: User shall be able to log in using email and password
-- FR-002: System shall send password reset link to registered email within 5 minutes
-- FR-003: Dashboard shall display user's last 30 days of activity
+{PromptTemplates.REQUIREMENTS_FORMAT}{example}
+TEXT TO ANALYZE:
+{raw_text}
 
-## Non-Functional Requirements
-- NFR-001: Login response time shall not exceed 2 seconds under normal load
-- NFR-002: System shall support at least 1000 concurrent users
-- NFR-003: All passwords shall be encrypted using bcrypt with minimum 12 character length
+"""
+        suffix = f"""CONTEXT:
+Project Type: {project_type}
+Industry: {industry}
 
 Now analyze the provided text and extract requirements:"""
-
-
+        
+        return prefix, suffix
+    
+    
     @staticmethod
-    def user_story_generator(requirements, project_type="General"):
+    def requirements_extractor(raw_text, project_type="General", industry="General", include_example=True):
         """
-        Prompt for generating Agile user stories from requirements
+        Prompt for extracting requirements from raw text
         
         Args:
-            requirements: List of extracted requirements
-            project_type: Type of project
+            raw_text: Meeting transcript or document text
+            project_type: Type of project (Web, Mobile, Desktop, etc.)
+            industry: Industry domain (Finance, Healthcare, E-commerce, etc.)
+            include_example: Append the worked example output block
         """
-        return f"""You are an expert Scrum Master and Agile Coach specializing in writing perfect user stories.
+        return ''.join(PromptTemplates.requirements_extractor_parts(raw_text, project_type, industry, include_example))
 
-CONTEXT:
-Project Type: {project_type}
 
-REQUIREMENTS:
-{requirements}
+    @staticmethod
+    def user_story_generator_prefix():
+        """Fixed, cacheable part of the user story prompt"""
+        return """You are an expert Scrum Master and Agile Coach specializing in writing perfect user stories.
 
 TASK:
 Convert each requirement into a well-structured Agile User Story following Scrum best practices.
@@ -92,20 +142,13 @@ INSTRUCTIONS:
 4. Use appropriate personas: End User, Admin, Business Analyst, System, Guest
 5. Estimate story points (1, 2, 3, 5, 8, 13)
 6. Identify dependencies between stories
+7. Reference the requirement ID each story implements
 
 OUTPUT FORMAT (Strict):
-**Story ID**: US-001
-**Title**: [Concise title - max 6 words]
-**User Story**: As a [role], I want [feature], so that [business value]
-**Priority**: High / Medium / Low
-**Story Points**: [1, 2, 3, 5, 8, 13]
-**Dependencies**: [US-XXX or None]
-**Notes**: [Any additional context]
-
----
-
+""" + PromptTemplates.USER_STORY_FORMAT + """
 EXAMPLE OUTPUT:
 **Story ID**: US-001
+**Requirement**: FR-001
 **Title**: User Login Functionality
 **User Story**: As an end user, I want to log in using my email and password, so that I can securely access my personalized dashboard and account information.
 **Priority**: High
@@ -116,6 +159,7 @@ EXAMPLE OUTPUT:
 ---
 
 **Story ID**: US-002
+**Requirement**: FR-002
 **Title**: Password Reset via Email
 **User Story**: As an end user, I want to receive a password reset link via email, so that I can regain access to my account if I forget my password.
 **Priority**: High
@@ -125,21 +169,44 @@ EXAMPLE OUTPUT:
 
 ---
 
-Now generate user stories for all requirements:"""
+"""
+    
+    
+    @staticmethod
+    def user_story_generator_suffix(requirements, project_type="General"):
+        """
+        Per-request part of the user story prompt
+        
+        Args:
+            requirements: List of extracted requirements
+            project_type: Type of project
+        """
+        return f"""CONTEXT:
+Project Type: {project_type}
 
+REQUIREMENTS:
+{requirements}
 
+Now generate user stories for all requirements:"""
+    
+    
     @staticmethod
-    def acceptance_criteria_generator(user_story):
+    def user_story_generator(requirements, project_type="General"):
         """
-        Prompt for generating acceptance criteria from user story
+        Prompt for generating Agile user stories from requirements
         
         Args:
-            user_story: Single user story text
+            requirements: List of extracted requirements
+            project_type: Type of project
         """
-        return f"""You are an expert QA Engineer and Test Analyst specializing in behavior-driven development (BDD).
+        return (PromptTemplates.user_story_generator_prefix()
+                + PromptTemplates.user_story_generator_suffix(requirements, project_type))
 
-USER STORY:
-{user_story}
+
+    @staticmethod
+    def acceptance_criteria_generator_prefix():
+        """Fixed, cacheable part of the acceptance criteria prompt"""
+        return """You are an expert QA Engineer and Test Analyst specializing in behavior-driven development (BDD).
 
 TASK:
 Generate comprehensive acceptance criteria using Given-When-Then (Gherkin) format.
@@ -158,24 +225,7 @@ INSTRUCTIONS:
 4. Specify validation rules and error messages
 
 OUTPUT FORMAT (Strict):
-**Scenario 1: [Scenario Name - Happy Path]**
-- GIVEN [initial context/state]
-- AND [additional context if needed]
-- WHEN [user action or event trigger]
-- AND [additional action if needed]
-- THEN [expected outcome]
-- AND [additional outcome if needed]
-
-**Scenario 2: [Scenario Name - Alternative Path]**
-- GIVEN [different context]
-- WHEN [different action]
-- THEN [different outcome]
-
-**Scenario 3: [Scenario Name - Error Handling]**
-- GIVEN [error condition]
-- WHEN [action attempted]
-- THEN [error message or behavior]
-
+""" + PromptTemplates.ACCEPTANCE_CRITERIA_FORMAT + """
 EXAMPLE OUTPUT:
 **Scenario 1: Successful Login with Valid Credentials**
 - GIVEN the user is on the login page
@@ -225,7 +275,54 @@ EXAMPLE OUTPUT:
 - AND prevents form submission
 - AND highlights the empty fields in red
 
+"""
+    
+    
+    @staticmethod
+    def acceptance_criteria_generator_suffix(user_story):
+        """
+        Per-request part of the acceptance criteria prompt
+        
+        Args:
+            user_story: Single user story text
+        """
+        return f"""USER STORY:
+{user_story}
+
 Now generate acceptance criteria for the provided user story:"""
+    
+    
+    @staticmethod
+    def acceptance_criteria_generator(user_story):
+        """
+        Prompt for generating acceptance criteria from user story
+        
+        Args:
+            user_story: Single user story text
+        """
+        return (PromptTemplates.acceptance_criteria_generator_prefix()
+                + PromptTemplates.acceptance_criteria_generator_suffix(user_story))
+
+
+    @staticmethod
+    def output_repair(output_format):
+        """
+        Fixed part of the prompt that rewrites a response the parser could
+        not read into the strict output format; the unparseable response
+        follows as the suffix
+        
+        Args:
+            output_format: One of the *_FORMAT templates
+        """
+        return f"""You are a text formatter. The response below was meant to follow a strict output format but could not be parsed.
+
+TASK:
+Rewrite the response into the exact format shown. Keep every item and all of its content; do not add, drop or invent items. Output only the reformatted text.
+
+OUTPUT FORMAT (Strict):
+{output_format}
+RESPONSE TO REFORMAT:
+"""
 
 
     @staticmethod
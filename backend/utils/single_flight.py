@@ -0,0 +1,77 @@
+"""
+Single-Flight Request Coalescing
+================================
+Concurrent identical requests (same endpoint, input and parameters) share
+one in-flight computation instead of each starting its own Gemini call.
+
+The first caller for a key starts the work; callers arriving while it is
+still running await the same result (or exception). Once it finishes the
+key is released, so later requests compute afresh.
+"""
+
+import asyncio
+import functools
+
+from backend.core.executors import executors
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key"""
+
+    def __init__(self):
+        """Initialize in-flight registry"""
+        self._in_flight = {}
+        self.stats = {'started': 0, 'coalesced': 0}
+
+
+    async def do(self, key, func, *args, **kwargs):
+        """
+        Run func once per key among concurrent callers
+
+        Synchronous functions run in the managed "blocking" pool so the
+        event loop stays free while they wait on Gemini or SQLite.
+
+        Args:
+            key: Hashable key, e.g. (endpoint, input_id, parameters...)
+            func: Sync function or coroutine function producing the result
+            *args, **kwargs: Passed to func
+
+        Returns:
+            The shared result
+
+        Raises:
+            ExecutorSaturated: If the blocking pool is full (new keys only)
+        """
+        task = self._in_flight.get(key)
+
+        if task is None:
+            task = self._start(func, args, kwargs)
+            self.stats['started'] += 1
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats['coalesced'] += 1
+            print(f"Coalescing request with in-flight computation: {key}")
+
+        # Shield so one caller disconnecting doesn't cancel the shared work
+        return await asyncio.shield(task)
+
+
+    @staticmethod
+    def _start(func, args, kwargs):
+        """Start func as a future, off the event loop when it is synchronous"""
+        if asyncio.iscoroutinefunction(func):
+            return asyncio.ensure_future(func(*args, **kwargs))
+
+        # Submitted eagerly so saturation surfaces to the caller as a 503
+        future = executors.pools['blocking'].submit(functools.partial(func, *args, **kwargs))
+        return asyncio.wrap_future(future)
+
+
+    def in_flight(self):
+        """Number of computations currently running"""
+        return len(self._in_flight)
+
+
+# Initialize shared instance
+single_flight = SingleFlight()
@@ -0,0 +1,217 @@
+"""
+Prompt Input Compaction
+=======================
+Shrinks raw transcripts and documents before they are interpolated into
+prompts, and estimates how many tokens a prompt will cost.
+
+- Whitespace and page-break marker normalization
+- Removal of header/footer lines repeated across PDF pages
+- Removal of transcript fillers ("um", "uh", stutters), for voice input only
+- Token estimation and splitting of over-budget text into chunks
+"""
+
+import re
+from collections import Counter
+
+
+# Separator inserted between pages by DocumentParser.parse_pdf
+PAGE_BREAK = '--- Page Break ---'
+
+# Spoken fillers that carry no requirement information
+FILLER_PATTERN = re.compile(
+    r'(?<![\w-])(?:u+m+|u+h+|e+r+m+|uh-huh|mm-?hmm|hmm+)(?![\w-])[,.]?\s*',
+    re.IGNORECASE
+)
+
+# Immediately repeated words ("the the", "we we we"); numbers ("10 10") are kept
+STUTTER_PATTERN = re.compile(r'\b([^\W\d]\w*)(?:\s+\1\b)+', re.IGNORECASE)
+
+# Standalone page numbering lines ("Page 3 of 12", "- 4 -", "7")
+PAGE_NUMBER_PATTERN = re.compile(r'^\s*(?:page\s+\d+(?:\s+of\s+\d+)?|-?\s*\d+\s*-?)\s*$', re.IGNORECASE)
+
+# Average characters per token for Gemini models on English text
+CHARS_PER_TOKEN = 4
+
+
+class TextCompactor:
+    """Normalize raw input text and keep prompts within a token budget"""
+
+    @staticmethod
+    def estimate_tokens(text):
+        """
+        Estimate token count without a network round trip
+
+        Args:
+            text: Any string
+
+        Returns:
+            Estimated number of tokens
+        """
+        if not text:
+            return 0
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+    @staticmethod
+    def remove_repeated_headers(text, edge_lines=3, min_pages=3):
+        """
+        Drop header/footer lines that repeat across PDF pages
+
+        A line near the top or bottom of a page is treated as boilerplate
+        when (ignoring digits, so "Page 2"/"Page 3" match) it appears on at
+        least half of the pages. Page-break markers are removed as well.
+
+        Args:
+            text: Text with PAGE_BREAK separators between pages
+            edge_lines: Lines at each end of a page to consider
+            min_pages: Minimum pages before detection kicks in
+
+        Returns:
+            Text with pages joined by blank lines
+        """
+        pages = [p.strip('\n') for p in text.split(PAGE_BREAK)]
+        if len(pages) < min_pages:
+            return '\n\n'.join(pages)
+
+        def key(line):
+            return re.sub(r'\d+', '#', ' '.join(line.split()).lower())
+
+        def edge_indices(lines):
+            non_empty = [i for i, l in enumerate(lines) if l.strip()]
+            # Short pages only contribute their first and last line
+            n = edge_lines if len(non_empty) > 2 * edge_lines else 1
+            return set(non_empty[:n] + non_empty[-n:])
+
+        counts = Counter()
+        for page in pages:
+            lines = page.split('\n')
+            counts.update({key(lines[i]) for i in edge_indices(lines)})
+
+        threshold = max(2, len(pages) // 2)
+        boilerplate = {k for k, n in counts.items() if n >= threshold}
+
+        cleaned = []
+        for page in pages:
+            lines = page.split('\n')
+            edge_idx = edge_indices(lines)
+            kept = [
+                l for i, l in enumerate(lines)
+                if not (i in edge_idx and (key(l) in boilerplate or PAGE_NUMBER_PATTERN.match(l)))
+            ]
+            cleaned.append('\n'.join(kept))
+
+        return '\n\n'.join(cleaned)
+
+
+    @staticmethod
+    def strip_fillers(text):
+        """
+        Remove spoken fillers and stutters from transcripts
+
+        Args:
+            text: Transcript text
+
+        Returns:
+            Text without fillers
+        """
+        text = FILLER_PATTERN.sub('', text)
+        return STUTTER_PATTERN.sub(r'\1', text)
+
+
+    @staticmethod
+    def normalize_whitespace(text):
+        """
+        Collapse runs of spaces/tabs, strip line ends and limit blank lines
+
+        Args:
+            text: Any string
+
+        Returns:
+            Normalized text
+        """
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        lines = [' '.join(line.split()) for line in text.split('\n')]
+        text = '\n'.join(lines)
+        return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+    @staticmethod
+    def compact(text, transcript=False):
+        """
+        Run the full compaction pipeline
+
+        Fillers and stutters are only stripped from transcripts; in typed
+        text and documents they can be meaningful ("UM" as unit of measure,
+        "had had").
+
+        Args:
+            text: Raw transcript or document text
+            transcript: True for speech transcripts (voice inputs)
+
+        Returns:
+            (compacted_text, stats) where stats holds character and
+            estimated token counts before and after
+        """
+        original = text or ''
+
+        compacted = TextCompactor.remove_repeated_headers(original)
+        if transcript:
+            compacted = TextCompactor.strip_fillers(compacted)
+        compacted = TextCompactor.normalize_whitespace(compacted)
+
+        stats = {
+            'original_chars': len(original),
+            'compacted_chars': len(compacted),
+            'original_tokens': TextCompactor.estimate_tokens(original),
+            'compacted_tokens': TextCompactor.estimate_tokens(compacted)
+        }
+
+        return compacted, stats
+
+
+    @staticmethod
+    def split_to_budget(text, max_tokens):
+        """
+        Split text into chunks of at most max_tokens each
+
+        Splits on paragraph boundaries first, then sentences, and only
+        hard-cuts text that has no boundaries at all.
+
+        Args:
+            text: Text to split
+            max_tokens: Token budget per chunk
+
+        Returns:
+            List of chunks (a single chunk if already within budget)
+        """
+        if TextCompactor.estimate_tokens(text) <= max_tokens:
+            return [text]
+
+        max_chars = max_tokens * CHARS_PER_TOKEN
+
+        # Break into pieces that each fit into one chunk
+        pieces = []
+        for paragraph in text.split('\n\n'):
+            if len(paragraph) <= max_chars:
+                pieces.append(paragraph)
+                continue
+            for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+                while len(sentence) > max_chars:
+                    pieces.append(sentence[:max_chars])
+                    sentence = sentence[max_chars:]
+                pieces.append(sentence)
+
+        # Greedily pack pieces into chunks
+        chunks = []
+        current = ''
+        for piece in pieces:
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if len(candidate) > max_chars and current:
+                chunks.append(current)
+                current = piece
+            else:
+                current = candidate
+        if current:
+            chunks.append(current)
+
+        return chunks
@@ -14,7 +14,7 @@ const CriteriaSection = ({ userStories, onComplete }) => {
     setLoading(true);
     try {
       const storyText = `${selectedStory.story_code}: ${selectedStory.title}\n${selectedStory.user_story}`;
-      const data = await criteriaApi.generate(selectedStory.story_id || 1, storyText);
+      const data = await criteriaApi.generate(selectedStory.story_id ?? null, storyText);
       setCriteria(data);
       onComplete(data);
     } catch (error) {